@@ -0,0 +1,51 @@
+"""reward emission daily rollup
+
+Revision ID: 0003_reward_emission_daily
+Revises: 0002_reward_outbox
+Create Date: 2026-10-17 00:00:00
+
+The rollup starts empty. Emission is read from ``user_rewards`` until
+``scripts/backfill_emission.py`` has reconciled the two and recorded that in
+``reward_emission_backfill``; run it once the rollout has replaced every instance
+that records rewards without updating the rollup.
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0003_reward_emission_daily"
+down_revision = "0002_reward_outbox"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "reward_emission_daily",
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("action_id", sa.String(), nullable=False),
+        sa.Column("shard", sa.SmallInteger(), nullable=False),
+        sa.Column("total_mind", sa.BigInteger(), server_default=sa.text("0"), nullable=False),
+        sa.Column("reward_count", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column(
+            "updated_at", sa.DateTime(), server_default=sa.func.now(), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("date", "action_id", "shard"),
+    )
+    op.create_table(
+        "reward_emission_backfill",
+        sa.Column("id", sa.SmallInteger(), nullable=False),
+        sa.Column("cutover", sa.DateTime(), nullable=False),
+        sa.Column(
+            "completed_at", sa.DateTime(), server_default=sa.func.now(), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("reward_emission_backfill")
+    op.drop_table("reward_emission_daily")
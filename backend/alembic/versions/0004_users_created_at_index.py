@@ -0,0 +1,40 @@
+"""users (created_at, id) index for keyset pagination
+
+Revision ID: 0004_users_created_at_index
+Revises: 0003_reward_emission_daily
+Create Date: 2026-10-17 00:00:00
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0004_users_created_at_index"
+down_revision = "0003_reward_emission_daily"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps the users table writable while the index builds; it cannot
+    # run inside the migration transaction.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "users_created_at_id_idx",
+            "users",
+            ["created_at", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "users_created_at_id_idx",
+            table_name="users",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,41 @@
+"""transactions (user_id, created_at, id) covering index
+
+Revision ID: 0005_transactions_user_index
+Revises: 0004_users_created_at_index
+Create Date: 2026-10-17 00:00:00
+"""
+
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0005_transactions_user_index"
+down_revision = "0004_users_created_at_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Serves the newest-first history pages of one user, and (through the
+    # included columns) the per-type totals as an index-only scan.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "transactions_user_created_at_idx",
+            "transactions",
+            ["user_id", "created_at", "id"],
+            unique=False,
+            postgresql_include=["type", "amount"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "transactions_user_created_at_idx",
+            table_name="transactions",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
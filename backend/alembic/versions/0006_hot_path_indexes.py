@@ -0,0 +1,103 @@
+"""indexes for hot lookup paths; unique enrollments and book purchases
+
+Run this before deploying the code that needs it: enroll_user and purchase_book
+rely on the unique constraints for ON CONFLICT. Instances still on the old code
+may insert duplicates while it runs; a unique build that fails on one is retried
+after deleting them again. Re-running after a failure is safe: indexes left
+INVALID by a failed or cancelled concurrent build are dropped and rebuilt.
+
+Revision ID: 0006_hot_path_indexes
+Revises: 0005_transactions_user_index
+Create Date: 2026-10-17 00:00:00
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0006_hot_path_indexes"
+down_revision = "0005_transactions_user_index"
+branch_labels = None
+depends_on = None
+
+# (constraint name, table, columns): one row per user and item.
+UNIQUE_PAIRS = [
+    ("enrollments_user_course_key", "enrollments", ["user_id", "course_id"]),
+    ("book_purchases_user_book_key", "book_purchases", ["user_id", "book_id"]),
+]
+
+INDEXES = [
+    ("test_attempts_user_test_idx", "test_attempts", ["user_id", "test_type", "test_id", "attempted_at"]),
+    ("course_lessons_course_order_idx", "course_lessons", ["course_id", "order_index"]),
+    ("book_chapters_book_order_idx", "book_chapters", ["book_id", "order_index"]),
+    ("channel_subscriptions_user_idx", "channel_subscriptions", ["user_id"]),
+    ("text_content_category_idx", "text_content", ["category"]),
+    ("chapter_tests_chapter_idx", "chapter_tests", ["chapter_id"]),
+    ("lesson_tests_lesson_idx", "lesson_tests", ["lesson_id"]),
+]
+
+
+UNIQUE_BUILD_ATTEMPTS = 5
+
+
+def _index_state(name: str) -> bool | None:
+    """``indisvalid`` of index ``name``, or ``None`` if it does not exist."""
+    return op.get_bind().execute(
+        text("SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"),
+        {"name": name},
+    ).scalar()
+
+
+def _create_index(name: str, table: str, columns: list[str], unique: bool) -> None:
+    # A failed or cancelled CONCURRENTLY build leaves an INVALID index behind, which
+    # IF NOT EXISTS would otherwise accept as done.
+    if _index_state(name) is False:
+        op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True, if_not_exists=True)
+
+
+def _delete_duplicates(table: str, user_column: str, item_column: str) -> None:
+    # Keep the earliest row of each pair.
+    op.execute(
+        f"DELETE FROM {table} AS later USING {table} AS earlier "
+        f"WHERE later.{user_column} = earlier.{user_column} "
+        f"AND later.{item_column} = earlier.{item_column} AND later.id > earlier.id"
+    )
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps the tables writable while the indexes build; it cannot run
+    # inside the migration transaction, so every statement here commits on its own.
+    with op.get_context().autocommit_block():
+        for name, table, columns in UNIQUE_PAIRS:
+            # Concurrent enroll/purchase requests could insert duplicates, and old app
+            # instances still can until the index is valid: dedupe, build, and retry.
+            for attempt in range(1, UNIQUE_BUILD_ATTEMPTS + 1):
+                _delete_duplicates(table, *columns)
+                try:
+                    _create_index(name, table, columns, unique=True)
+                    break
+                except IntegrityError:
+                    if attempt == UNIQUE_BUILD_ATTEMPTS:
+                        raise
+        for name, table, columns in INDEXES:
+            _create_index(name, table, columns, unique=False)
+
+    # Promote the unique indexes to constraints (instant: the index already exists).
+    bind = op.get_bind()
+    for name, table, _ in UNIQUE_PAIRS:
+        exists = bind.execute(text("SELECT 1 FROM pg_constraint WHERE conname = :name"), {"name": name}).scalar()
+        if not exists:
+            op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE USING INDEX {name}")
+
+
+def downgrade() -> None:
+    for name, table, _ in UNIQUE_PAIRS:
+        op.drop_constraint(name, table, type_="unique")
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
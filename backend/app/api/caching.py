@@ -0,0 +1,67 @@
+"""Pre-encoded, ETag-validated responses for catalog endpoints.
+
+Response bodies are rendered once per catalog version and query and kept in the
+catalog cache as bytes together with a strong ETag (a hash of the body, so every
+worker derives the same tag). A cached entry answers ``If-None-Match`` with 304
+and any other request with the stored bytes, skipping the database and Pydantic.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass
+from typing import Any
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from app.core.config import settings
+from app.services.catalog_cache import get_catalog_cache
+
+
+@dataclass(frozen=True, slots=True)
+class EncodedResponse:
+    body: bytes
+    etag: str
+
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/"x" matches "x".
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in header.split(","))
+
+
+def _respond(request: Request, encoded: EncodedResponse) -> Response:
+    headers = {
+        "ETag": encoded.etag,
+        "Cache-Control": f"public, max-age={settings.catalog_http_max_age}, must-revalidate",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), encoded.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(encoded.body, media_type="application/json", headers=headers)
+
+
+async def cached_json_response(
+    request: Request,
+    key: Hashable,
+    adapter: TypeAdapter[Any],
+    render: Callable[[], Awaitable[Any]],
+) -> Response:
+    """Serve ``render()`` encoded with ``adapter`` from the catalog cache.
+
+    ``render`` may raise ``HTTPException`` (for a 404, say); nothing is cached then.
+    """
+    cache = get_catalog_cache()
+    key = ("response", key)
+    encoded = cache.get(key) if cache.enabled else None
+    if encoded is None:
+        version = cache.version
+        body = adapter.dump_json(await render(), by_alias=True)
+        encoded = EncodedResponse(body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+        if cache.enabled:
+            cache.put(key, version, encoded)
+    return _respond(request, encoded)
@@ -1,19 +1,44 @@
 """Common FastAPI dependencies."""
 
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from typing import Annotated
 
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_session
+from app.db.replica import get_read_session
+from app.db.session import ReadSessionLocal, SessionLocal, get_session
 from app.services import StorageService, get_reward_engine, RewardEngine
+from app.services.memory_storage import make_storage
+from app.services.reward_queue import RewardQueue, get_reward_queue
 
 AsyncSessionDep = Annotated[AsyncSession, Depends(get_session)]
+ReadSessionDep = Annotated[AsyncSession, Depends(get_read_session)]
 
 
 async def get_storage_service(session: AsyncSessionDep) -> StorageService:
-    return StorageService(session)
+    return make_storage(session)
+
+
+async def get_read_storage_service(session: ReadSessionDep) -> StorageService:
+    """Storage for GET endpoints that only read; may be served by the replica."""
+    return make_storage(session)
+
+
+@asynccontextmanager
+async def open_read_storage(replica: bool) -> AsyncIterator[StorageService]:
+    """Read storage with its own session, for streamed bodies that outlive the endpoint.
+
+    Sessions from dependencies are closed before a ``StreamingResponse`` body is
+    sent, so a streaming endpoint opens this inside its body generator instead.
+    """
+    factory = ReadSessionLocal if replica and ReadSessionLocal is not None else SessionLocal
+    async with factory() as session:
+        yield make_storage(session)
 
 
 StorageServiceDep = Annotated[StorageService, Depends(get_storage_service)]
+ReadStorageServiceDep = Annotated[StorageService, Depends(get_read_storage_service)]
 RewardEngineDep = Annotated[RewardEngine, Depends(get_reward_engine)]
+RewardQueueDep = Annotated[RewardQueue, Depends(get_reward_queue)]
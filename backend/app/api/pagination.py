@@ -0,0 +1,45 @@
+"""Opaque keyset cursors for newest-first listings.
+
+A cursor encodes the ``(created_at, id)`` of the last row of a page; the next page
+is everything strictly older in that order, which an index on the same columns
+answers without scanning the rows that were skipped (unlike ``OFFSET``).
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any
+
+from fastapi import HTTPException
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: Any) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, id_type: type) -> tuple[datetime, Any]:
+    """``(created_at, id)`` from a cursor made by ``encode_cursor``; 400 if it is malformed.
+
+    ``id_type`` is the listing's primary key type: a cursor from another listing
+    (or a tampered one) must fail here, not as a driver error in the keyset query.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != 2:
+            raise ValueError("cursor is not a [created_at, id] pair")
+        created_at, row_id = payload
+        if type(row_id) is not id_type:
+            raise TypeError(f"cursor id is not {id_type.__name__}")
+        created_at = datetime.fromisoformat(created_at)
+        if created_at.tzinfo is not None:
+            raise ValueError("cursor timestamp is not naive UTC")
+        return created_at, row_id
+    except (binascii.Error, ValueError, TypeError) as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
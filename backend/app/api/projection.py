@@ -0,0 +1,42 @@
+"""Column projections for list endpoints (``?fields=``)."""
+
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+from fastapi import HTTPException
+from pydantic import BaseModel, TypeAdapter
+
+ALL_FIELDS = "all"
+
+rows_adapter: TypeAdapter[list[dict[str, Any]]] = TypeAdapter(list[dict[str, Any]])
+
+
+def selected_fields(fields: str | None, summary: type[BaseModel], full: type[BaseModel]) -> tuple[str, ...]:
+    """Attribute names to load: ``summary``'s fields plus extras named in ``fields``.
+
+    ``fields`` is a comma-separated list of ``full`` field names (snake_case or their
+    camelCase aliases), or ``all`` for every field of ``full``.
+    """
+    names = list(summary.model_fields)
+    if not fields:
+        return tuple(names)
+    by_alias = {info.alias or name: name for name, info in full.model_fields.items()}
+    for raw in fields.split(","):
+        requested = raw.strip()
+        if not requested:
+            continue
+        if requested == ALL_FIELDS:
+            return tuple(full.model_fields)
+        name = requested if requested in full.model_fields else by_alias.get(requested)
+        if name is None:
+            raise HTTPException(status_code=400, detail=f"Unknown field {requested!r}")
+        if name not in names:
+            names.append(name)
+    return tuple(names)
+
+
+def project(rows: Iterable[Any], names: tuple[str, ...], full: type[BaseModel]) -> list[dict[str, Any]]:
+    """Rows as dicts keyed by the API (alias) names of ``names``."""
+    keys = [(name, full.model_fields[name].alias or name) for name in names]
+    return [{key: getattr(row, name) for name, key in keys} for row in rows]
@@ -2,47 +2,105 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter
+import csv
+import io
+from collections.abc import AsyncIterator, Iterable
+from typing import Any, Literal
+
+from fastapi import APIRouter, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from app.api.deps import StorageServiceDep
+from app.api.deps import ReadStorageServiceDep, StorageServiceDep, open_read_storage
+from app.api.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.db.replica import use_replica
 from app.schemas import BookBase, CourseBase, UserBase
 
 router = APIRouter()
 
+EXPORT_BATCH_SIZE = 1000
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
 
 class VisibilityUpdate(BaseModel):
     is_visible: bool = True
 
 
 @router.get("/stats", summary="Get admin statistics")
-async def get_stats(storage: StorageServiceDep) -> dict:
+async def get_stats(storage: ReadStorageServiceDep) -> dict:
     return await storage.get_admin_stats()
 
 
 @router.get("/courses", response_model=list[CourseBase], summary="List all courses")
-async def admin_courses(storage: StorageServiceDep) -> list[CourseBase]:
+async def admin_courses(storage: ReadStorageServiceDep) -> list[CourseBase]:
     courses = await storage.get_all_courses_admin()
     return [CourseBase.model_validate(course) for course in courses]
 
 
-@router.patch("/courses/{course_id}/visibility", status_code=204, summary="Update course visibility")
+@router.patch("/courses/{course_id}/visibility", status_code=204, response_model=None, summary="Update course visibility")
 async def set_course_visibility(storage: StorageServiceDep, course_id: int, payload: VisibilityUpdate) -> None:
     await storage.update_course_visibility(course_id, payload.is_visible)
 
 
 @router.get("/books", response_model=list[BookBase], summary="List all books")
-async def admin_books(storage: StorageServiceDep) -> list[BookBase]:
+async def admin_books(storage: ReadStorageServiceDep) -> list[BookBase]:
     books = await storage.get_all_books_admin()
     return [BookBase.model_validate(book) for book in books]
 
 
-@router.patch("/books/{book_id}/visibility", status_code=204, summary="Update book visibility")
+@router.patch("/books/{book_id}/visibility", status_code=204, response_model=None, summary="Update book visibility")
 async def set_book_visibility(storage: StorageServiceDep, book_id: int, payload: VisibilityUpdate) -> None:
     await storage.update_book_visibility(book_id, payload.is_visible)
 
 
-@router.get("/users", response_model=list[UserBase], summary="List all users")
-async def admin_users(storage: StorageServiceDep) -> list[UserBase]:
-    users = await storage.get_all_users()
+@router.get("/users", response_model=list[UserBase], summary="List users, newest first")
+async def admin_users(
+    storage: ReadStorageServiceDep,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = Query(None, description="Value of the previous page's X-Next-Cursor header"),
+) -> list[UserBase]:
+    after = decode_cursor(cursor, str) if cursor else None
+    users = await storage.get_users_page(limit, after)
+    if len(users) == limit:
+        last = users[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
     return [UserBase.model_validate(user) for user in users]
+
+
+def _ndjson_lines(rows: Iterable[Any]) -> bytes:
+    return b"".join(UserBase.model_validate(row).model_dump_json(by_alias=True).encode() + b"\n" for row in rows)
+
+
+def _csv_lines(rows: Iterable[Any], header: bool = False) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(info.alias or name for name, info in UserBase.model_fields.items())
+    for row in rows:
+        writer.writerow(UserBase.model_validate(row).model_dump(mode="json", by_alias=True).values())
+    return buffer.getvalue().encode()
+
+
+@router.get("/users/export", summary="Stream every user as NDJSON or CSV")
+async def export_users(
+    request: Request, format: Literal["ndjson", "csv"] = "ndjson"
+) -> StreamingResponse:
+    """Newest first, written batch by batch so memory use does not grow with the user count.
+
+    Holds one database connection for as long as the client takes to read the export.
+    """
+    replica = await use_replica(request)
+
+    async def body() -> AsyncIterator[bytes]:
+        if format == "csv":
+            yield _csv_lines((), header=True)
+        async with open_read_storage(replica) as storage:
+            async for batch in storage.stream_users(EXPORT_BATCH_SIZE):
+                yield _csv_lines(batch) if format == "csv" else _ndjson_lines(batch)
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'},
+    )
@@ -2,30 +2,51 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException, Path
+from fastapi import APIRouter, HTTPException, Path, Query, Request, Response
+from pydantic import TypeAdapter
 from sqlalchemy.exc import NoResultFound
 
-from app.api.deps import StorageServiceDep
+from app.api.caching import cached_json_response
+from app.api.deps import ReadStorageServiceDep, StorageServiceDep
+from app.api.projection import project, rows_adapter, selected_fields
 from app.schemas import (
     BookBase,
     BookChapterCreate,
     BookChapterRead,
     BookChapterUpdate,
     BookCreate,
+    BookSummary,
     BookUpdate,
 )
 
 router = APIRouter()
 
+_summaries_adapter = TypeAdapter(list[BookSummary])
+_book_adapter = TypeAdapter(BookBase)
+_chapters_adapter = TypeAdapter(list[BookChapterRead])
 
-@router.get("/", response_model=list[BookBase], summary="List books")
+
+@router.get("/", response_model=list[BookSummary], summary="List books")
 async def list_books(
-    storage: StorageServiceDep,
+    request: Request,
+    storage: ReadStorageServiceDep,
     category: str | None = None,
     search: str | None = None,
-) -> list[BookBase]:
-    books = await storage.get_books(category=category, search=search)
-    return [BookBase.model_validate(book) for book in books]
+    fields: str | None = Query(
+        default=None, description="Extra BookBase fields to include, comma-separated, or 'all'."
+    ),
+) -> Response:
+    names = selected_fields(fields, BookSummary, BookBase)
+    extended = names != tuple(BookSummary.model_fields)
+
+    async def render() -> list:
+        books = await storage.get_books(category=category, search=search, columns=names)
+        if extended:
+            return project(books, names, BookBase)
+        return [BookSummary.model_validate(book) for book in books]
+
+    adapter = rows_adapter if extended else _summaries_adapter
+    return await cached_json_response(request, ("books", category, search, names), adapter, render)
 
 
 @router.post("/", response_model=BookBase, status_code=201, summary="Create book")
@@ -35,11 +56,14 @@ async def create_book(storage: StorageServiceDep, payload: BookCreate) -> BookBa
 
 
 @router.get("/{book_id}", response_model=BookBase, summary="Get book")
-async def get_book(storage: StorageServiceDep, book_id: int = Path(...)) -> BookBase:
-    book = await storage.get_book(book_id)
-    if not book:
-        raise HTTPException(status_code=404, detail="Book not found")
-    return BookBase.model_validate(book)
+async def get_book(request: Request, storage: ReadStorageServiceDep, book_id: int = Path(...)) -> Response:
+    async def render() -> BookBase:
+        book = await storage.get_book(book_id)
+        if not book:
+            raise HTTPException(status_code=404, detail="Book not found")
+        return BookBase.model_validate(book)
+
+    return await cached_json_response(request, ("book", book_id), _book_adapter, render)
 
 
 @router.put("/{book_id}", response_model=BookBase, summary="Update book")
@@ -51,20 +75,23 @@ async def update_book(storage: StorageServiceDep, book_id: int, payload: BookUpd
     return BookBase.model_validate(book)
 
 
-@router.delete("/{book_id}", status_code=204, summary="Soft delete book")
+@router.delete("/{book_id}", status_code=204, response_model=None, summary="Soft delete book")
 async def delete_book(storage: StorageServiceDep, book_id: int) -> None:
     await storage.delete_book(book_id, permanent=False)
 
 
-@router.delete("/{book_id}/permanent", status_code=204, summary="Hard delete book")
+@router.delete("/{book_id}/permanent", status_code=204, response_model=None, summary="Hard delete book")
 async def delete_book_permanent(storage: StorageServiceDep, book_id: int) -> None:
     await storage.delete_book(book_id, permanent=True)
 
 
 @router.get("/{book_id}/chapters", response_model=list[BookChapterRead], summary="List chapters")
-async def get_book_chapters(storage: StorageServiceDep, book_id: int) -> list[BookChapterRead]:
-    chapters = await storage.get_book_chapters(book_id)
-    return [BookChapterRead.model_validate(chapter) for chapter in chapters]
+async def get_book_chapters(request: Request, storage: ReadStorageServiceDep, book_id: int) -> Response:
+    async def render() -> list[BookChapterRead]:
+        chapters = await storage.get_book_chapters(book_id)
+        return [BookChapterRead.model_validate(chapter) for chapter in chapters]
+
+    return await cached_json_response(request, ("chapters", book_id), _chapters_adapter, render)
 
 
 @router.post(
@@ -94,7 +121,7 @@ async def update_book_chapter(
     return BookChapterRead.model_validate(chapter)
 
 
-@router.delete("/chapters/{chapter_id}", status_code=204, summary="Delete chapter")
+@router.delete("/chapters/{chapter_id}", status_code=204, response_model=None, summary="Delete chapter")
 async def delete_book_chapter(storage: StorageServiceDep, chapter_id: int) -> None:
     await storage.delete_book_chapter(chapter_id)
 
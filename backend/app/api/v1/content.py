@@ -4,14 +4,14 @@ from __future__ import annotations
 
 from fastapi import APIRouter, HTTPException
 
-from app.api.deps import StorageServiceDep
+from app.api.deps import ReadStorageServiceDep, StorageServiceDep
 from app.schemas import TextContentRead
 
 router = APIRouter()
 
 
 @router.get("/", response_model=list[TextContentRead], summary="List text content")
-async def list_text_content(storage: StorageServiceDep, category: str | None = None) -> list[TextContentRead]:
+async def list_text_content(storage: ReadStorageServiceDep, category: str | None = None) -> list[TextContentRead]:
     if category:
         content = await storage.get_text_content_by_category(category)
     else:
@@ -20,7 +20,7 @@ async def list_text_content(storage: StorageServiceDep, category: str | None = N
 
 
 @router.get("/{key}", response_model=TextContentRead, summary="Get text content by key")
-async def get_text_content(storage: StorageServiceDep, key: str) -> TextContentRead:
+async def get_text_content(storage: ReadStorageServiceDep, key: str) -> TextContentRead:
     content = await storage.get_text_content_by_key(key)
     if not content:
         raise HTTPException(status_code=404, detail="Text content not found")
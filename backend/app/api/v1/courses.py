@@ -2,34 +2,54 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException, Path
+from fastapi import APIRouter, HTTPException, Path, Query, Request, Response
 from sqlalchemy.exc import NoResultFound
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 
-from app.api.deps import StorageServiceDep
+from app.api.caching import cached_json_response
+from app.api.deps import ReadStorageServiceDep, StorageServiceDep
+from app.api.projection import project, rows_adapter, selected_fields
 from app.schemas import (
     CourseBase,
     CourseCreate,
     CourseLessonCreate,
     CourseLessonRead,
     CourseLessonUpdate,
+    CourseSummary,
     CourseUpdate,
 )
 
 router = APIRouter()
 
+_summaries_adapter = TypeAdapter(list[CourseSummary])
+_course_adapter = TypeAdapter(CourseBase)
+_lessons_adapter = TypeAdapter(list[CourseLessonRead])
+
 
 class GenerateLessonsRequest(BaseModel):
     number_of_lessons: int = Field(gt=0, le=50, alias="numberOfLessons")
 
 
-@router.get("/", response_model=list[CourseBase], summary="List courses")
+@router.get("/", response_model=list[CourseSummary], summary="List courses")
 async def list_courses(
-    storage: StorageServiceDep,
+    request: Request,
+    storage: ReadStorageServiceDep,
     category: str | None = None,
-) -> list[CourseBase]:
-    courses = await storage.get_courses(category=category)
-    return [CourseBase.model_validate(course) for course in courses]
+    fields: str | None = Query(
+        default=None, description="Extra CourseBase fields to include, comma-separated, or 'all'."
+    ),
+) -> Response:
+    names = selected_fields(fields, CourseSummary, CourseBase)
+    extended = names != tuple(CourseSummary.model_fields)
+
+    async def render() -> list:
+        courses = await storage.get_courses(category=category, columns=names)
+        if extended:
+            return project(courses, names, CourseBase)
+        return [CourseSummary.model_validate(course) for course in courses]
+
+    adapter = rows_adapter if extended else _summaries_adapter
+    return await cached_json_response(request, ("courses", category, names), adapter, render)
 
 
 @router.post("/", response_model=CourseBase, status_code=201, summary="Create course")
@@ -42,11 +62,14 @@ async def create_course(
 
 
 @router.get("/{course_id}", response_model=CourseBase, summary="Get course by id")
-async def get_course(storage: StorageServiceDep, course_id: int = Path(...)) -> CourseBase:
-    course = await storage.get_course(course_id)
-    if not course:
-        raise HTTPException(status_code=404, detail="Course not found")
-    return CourseBase.model_validate(course)
+async def get_course(request: Request, storage: ReadStorageServiceDep, course_id: int = Path(...)) -> Response:
+    async def render() -> CourseBase:
+        course = await storage.get_course(course_id)
+        if not course:
+            raise HTTPException(status_code=404, detail="Course not found")
+        return CourseBase.model_validate(course)
+
+    return await cached_json_response(request, ("course", course_id), _course_adapter, render)
 
 
 @router.put("/{course_id}", response_model=CourseBase, summary="Update course")
@@ -64,20 +87,25 @@ async def update_course(
     return CourseBase.model_validate(course)
 
 
-@router.delete("/{course_id}", status_code=204, summary="Soft delete course")
+@router.delete("/{course_id}", status_code=204, response_model=None, summary="Soft delete course")
 async def delete_course(storage: StorageServiceDep, course_id: int = Path(...)) -> None:
     await storage.delete_course(course_id, permanent=False)
 
 
-@router.delete("/{course_id}/permanent", status_code=204, summary="Hard delete course")
+@router.delete("/{course_id}/permanent", status_code=204, response_model=None, summary="Hard delete course")
 async def delete_course_permanent(storage: StorageServiceDep, course_id: int = Path(...)) -> None:
     await storage.delete_course(course_id, permanent=True)
 
 
 @router.get("/{course_id}/lessons", response_model=list[CourseLessonRead], summary="Get lessons")
-async def get_course_lessons(storage: StorageServiceDep, course_id: int = Path(...)) -> list[CourseLessonRead]:
-    lessons = await storage.get_course_lessons(course_id)
-    return [CourseLessonRead.model_validate(lesson) for lesson in lessons]
+async def get_course_lessons(
+    request: Request, storage: ReadStorageServiceDep, course_id: int = Path(...)
+) -> Response:
+    async def render() -> list[CourseLessonRead]:
+        lessons = await storage.get_course_lessons(course_id)
+        return [CourseLessonRead.model_validate(lesson) for lesson in lessons]
+
+    return await cached_json_response(request, ("lessons", course_id), _lessons_adapter, render)
 
 
 @router.post(
@@ -106,7 +134,7 @@ async def update_course_lesson(
     return CourseLessonRead.model_validate(lesson)
 
 
-@router.delete("/lessons/{lesson_id}", status_code=204, summary="Delete lesson")
+@router.delete("/lessons/{lesson_id}", status_code=204, response_model=None, summary="Delete lesson")
 async def delete_course_lesson(storage: StorageServiceDep, lesson_id: int) -> None:
     await storage.delete_course_lesson(lesson_id)
 
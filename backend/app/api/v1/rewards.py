@@ -2,11 +2,15 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, HTTPException, Query, Request
 from pydantic import BaseModel, Field
 
-from app.api.deps import RewardEngineDep, StorageServiceDep
+from app.api.deps import ReadStorageServiceDep, RewardEngineDep, RewardQueueDep, StorageServiceDep
+from app.db.replica import note_written_users
 from app.services.reward_engine import RewardEvent
+from app.services.reward_queue import QueueFullError
 
 router = APIRouter()
 
@@ -28,26 +32,45 @@ class RewardBatchRequest(BaseModel):
 
 @router.post("/process", summary="Process single reward event")
 async def process_reward(
+    request: Request,
     storage: StorageServiceDep,
     engine: RewardEngineDep,
     payload: RewardEventRequest,
 ) -> dict[str, str]:
     await engine.process_batch(storage, [payload.to_model()])
+    note_written_users(request, [payload.user_id])
     return {"status": "processed"}
 
 
 @router.post("/batch", summary="Process batch of reward events")
 async def process_reward_batch(
+    request: Request,
     storage: StorageServiceDep,
     engine: RewardEngineDep,
     payload: RewardBatchRequest,
 ) -> dict[str, int]:
     if len(payload.events) > 100:
         raise HTTPException(status_code=400, detail="Batch limit is 100 events")
-    await engine.process_batch(storage, [event.to_model() for event in payload.events])
+    await engine.process_batch(storage, [event.to_model() for event in payload.events], bulk=True)
+    note_written_users(request, (event.user_id for event in payload.events))
     return {"processed": len(payload.events)}
 
 
+@router.post("/queue", status_code=202, summary="Queue reward events for asynchronous processing")
+async def queue_reward_events(
+    storage: StorageServiceDep,
+    queue: RewardQueueDep,
+    payload: RewardBatchRequest,
+) -> dict[str, int]:
+    if len(payload.events) > 1000:
+        raise HTTPException(status_code=400, detail="Queue batch limit is 1000 events")
+    try:
+        await queue.enqueue(storage, [event.to_model() for event in payload.events])
+    except QueueFullError as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "5"}) from exc
+    return {"queued": len(payload.events)}
+
+
 @router.get("/user/{user_id}/stats", summary="Get user daily reward stats")
 async def user_reward_stats(
     storage: StorageServiceDep,
@@ -59,11 +82,28 @@ async def user_reward_stats(
 
 @router.post("/reset-daily", summary="Reset daily counters")
 async def reset_daily_counters(storage: StorageServiceDep, engine: RewardEngineDep) -> dict:
-    await engine.reset_daily_counters(storage.session)
+    await engine.reset_daily_counters(storage)
     return {"status": "ok"}
 
 
 @router.post("/rebalance", summary="Run auto rebalance")
 async def run_auto_rebalance(storage: StorageServiceDep, engine: RewardEngineDep) -> dict:
-    coefficient = await engine.execute_monthly_rebalance(storage.session)
+    coefficient = await engine.execute_monthly_rebalance(storage)
     return {"rebalanceCoefficient": str(coefficient)}
+
+
+@router.get("/emission", summary="Daily reward emission per action")
+async def reward_emission(
+    storage: ReadStorageServiceDep,
+    days: int = Query(default=30, ge=1, le=366),
+) -> dict:
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    rows = await storage.get_emission_daily(since)
+    return {
+        "since": since.isoformat(),
+        "totalMind": sum(total for _, _, total, _ in rows),
+        "days": [
+            {"date": day.isoformat(), "actionId": action_id, "totalMind": total, "rewardCount": count}
+            for day, action_id, total, count in rows
+        ],
+    }
@@ -4,7 +4,7 @@ from __future__ import annotations
 
 from fastapi import APIRouter
 
-from app.api.deps import StorageServiceDep
+from app.api.deps import ReadStorageServiceDep, StorageServiceDep
 from app.schemas import (
     ChannelSubscriptionCreate,
     ChannelSubscriptionRead,
@@ -16,7 +16,7 @@ router = APIRouter()
 
 
 @router.get("/channels", response_model=list[SponsorChannelRead], summary="List sponsor channels")
-async def list_channels(storage: StorageServiceDep) -> list[SponsorChannelRead]:
+async def list_channels(storage: ReadStorageServiceDep) -> list[SponsorChannelRead]:
     channels = await storage.get_sponsor_channels()
     return [SponsorChannelRead.model_validate(channel) for channel in channels]
 
@@ -43,11 +43,11 @@ async def create_subscription(storage: StorageServiceDep, payload: ChannelSubscr
     response_model=list[ChannelSubscriptionRead],
     summary="List user subscriptions",
 )
-async def list_user_subscriptions(storage: StorageServiceDep, user_id: str) -> list[ChannelSubscriptionRead]:
+async def list_user_subscriptions(storage: ReadStorageServiceDep, user_id: str) -> list[ChannelSubscriptionRead]:
     subscriptions = await storage.get_user_subscriptions(user_id)
     return [ChannelSubscriptionRead.model_validate(item) for item in subscriptions]
 
 
-@router.put("/subscriptions/{subscription_id}/verify", status_code=204, summary="Verify subscription")
+@router.put("/subscriptions/{subscription_id}/verify", status_code=204, response_model=None, summary="Verify subscription")
 async def verify_subscription(storage: StorageServiceDep, subscription_id: int) -> None:
     await storage.verify_subscription(subscription_id)
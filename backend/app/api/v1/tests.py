@@ -4,7 +4,7 @@ from __future__ import annotations
 
 from fastapi import APIRouter, HTTPException, Query
 
-from app.api.deps import StorageServiceDep
+from app.api.deps import ReadStorageServiceDep, StorageServiceDep
 from app.schemas import (
     ChapterTestCreate,
     ChapterTestRead,
@@ -20,7 +20,7 @@ router = APIRouter()
 
 
 @router.get("/chapters/{chapter_id}/tests", response_model=list[ChapterTestRead], summary="List chapter tests")
-async def list_chapter_tests(storage: StorageServiceDep, chapter_id: int) -> list[ChapterTestRead]:
+async def list_chapter_tests(storage: ReadStorageServiceDep, chapter_id: int) -> list[ChapterTestRead]:
     tests = await storage.get_chapter_tests(chapter_id)
     return [ChapterTestRead.model_validate(test) for test in tests]
 
@@ -52,13 +52,13 @@ async def update_chapter_test(
     return ChapterTestRead.model_validate(test)
 
 
-@router.delete("/chapter-tests/{test_id}", status_code=204, summary="Delete chapter test")
+@router.delete("/chapter-tests/{test_id}", status_code=204, response_model=None, summary="Delete chapter test")
 async def delete_chapter_test(storage: StorageServiceDep, test_id: int) -> None:
     await storage.delete_chapter_test(test_id)
 
 
 @router.get("/lessons/{lesson_id}/tests", response_model=list[LessonTestRead], summary="List lesson tests")
-async def list_lesson_tests(storage: StorageServiceDep, lesson_id: int) -> list[LessonTestRead]:
+async def list_lesson_tests(storage: ReadStorageServiceDep, lesson_id: int) -> list[LessonTestRead]:
     tests = await storage.get_lesson_tests(lesson_id)
     return [LessonTestRead.model_validate(test) for test in tests]
 
@@ -90,7 +90,7 @@ async def update_lesson_test(
     return LessonTestRead.model_validate(test)
 
 
-@router.delete("/lesson-tests/{test_id}", status_code=204, summary="Delete lesson test")
+@router.delete("/lesson-tests/{test_id}", status_code=204, response_model=None, summary="Delete lesson test")
 async def delete_lesson_test(storage: StorageServiceDep, test_id: int) -> None:
     await storage.delete_lesson_test(test_id)
 
@@ -107,7 +107,7 @@ async def submit_test_attempt(storage: StorageServiceDep, payload: TestAttemptCr
     summary="List user test attempts",
 )
 async def list_test_attempts(
-    storage: StorageServiceDep,
+    storage: ReadStorageServiceDep,
     user_id: str,
     test_type: str = Query(...),
     test_id: int = Query(..., alias="testId"),
@@ -123,7 +123,7 @@ async def list_test_attempts(
     summary="Check if user passed test",
 )
 async def user_test_status(
-    storage: StorageServiceDep,
+    storage: ReadStorageServiceDep,
     user_id: str,
     test_type: str = Query(...),
     test_id: int = Query(..., alias="testId"),
@@ -2,16 +2,20 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from sqlalchemy.exc import NoResultFound
 
 from app.api.deps import StorageServiceDep
+from app.db.replica import note_written_users
 from app.schemas import TransactionCreate, TransactionRead
 
 router = APIRouter()
 
 
 @router.post("/", response_model=TransactionRead, status_code=201, summary="Create transaction")
-async def create_transaction(storage: StorageServiceDep, payload: TransactionCreate) -> TransactionRead:
+async def create_transaction(
+    request: Request, storage: StorageServiceDep, payload: TransactionCreate
+) -> TransactionRead:
     transaction = await storage.create_transaction(payload.model_dump(by_alias=False))
+    note_written_users(request, [payload.user_id])
     return TransactionRead.model_validate(transaction)
@@ -4,11 +4,14 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from fastapi import APIRouter, HTTPException, Path
+from fastapi import APIRouter, HTTPException, Path, Query, Request, Response
 from pydantic import BaseModel, Field
 from sqlalchemy.exc import NoResultFound
 
-from app.api.deps import StorageServiceDep
+from app.api.deps import ReadStorageServiceDep, StorageServiceDep
+from app.api.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from app.core.exceptions import InsufficientBalanceError
+from app.db.replica import note_written_users
 from app.schemas import (
     BookPurchaseCreate,
     BookPurchaseRead,
@@ -22,11 +25,14 @@ from app.schemas import (
     EnrollmentCreate,
     EnrollmentRead,
     TransactionRead,
+    TransactionTypeTotal,
     UserBase,
 )
 
 router = APIRouter()
 
+TRANSACTIONS_PAGE_SIZE = 50
+
 
 class StepsUpdateRequest(BaseModel):
     steps: int = Field(ge=0)
@@ -37,14 +43,14 @@ class EnrollmentProgressUpdate(BaseModel):
 
 
 @router.get("/{user_id}", response_model=UserBase, summary="Get user")
-async def get_user(storage: StorageServiceDep, user_id: str = Path(...)) -> UserBase:
+async def get_user(storage: ReadStorageServiceDep, user_id: str = Path(...)) -> UserBase:
     user = await storage.get_user(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return UserBase.model_validate(user)
 
 
-@router.put("/{user_id}/steps", status_code=204, summary="Update daily steps")
+@router.put("/{user_id}/steps", status_code=204, response_model=None, summary="Update daily steps")
 async def update_steps(
     storage: StorageServiceDep,
     user_id: str,
@@ -60,21 +66,24 @@ async def generate_referral_code(storage: StorageServiceDep, user_id: str) -> di
 
 
 @router.post("/enrollments", response_model=EnrollmentRead, status_code=201, summary="Enroll user")
-async def enroll_user(storage: StorageServiceDep, payload: EnrollmentCreate) -> EnrollmentRead:
+async def enroll_user(request: Request, storage: StorageServiceDep, payload: EnrollmentCreate) -> EnrollmentRead:
     try:
         enrollment = await storage.enroll_user(payload.model_dump(by_alias=False))
+    except NoResultFound as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
     except ValueError as exc:
         raise HTTPException(status_code=409, detail=str(exc)) from exc
+    note_written_users(request, [payload.user_id])
     return EnrollmentRead.model_validate(enrollment)
 
 
 @router.get("/{user_id}/enrollments", response_model=list[EnrollmentRead], summary="List user enrollments")
-async def list_user_enrollments(storage: StorageServiceDep, user_id: str) -> list[EnrollmentRead]:
+async def list_user_enrollments(storage: ReadStorageServiceDep, user_id: str) -> list[EnrollmentRead]:
     enrollments = await storage.get_user_enrollments(user_id)
     return [EnrollmentRead.model_validate(item) for item in enrollments]
 
 
-@router.put("/enrollments/{enrollment_id}/progress", status_code=204, summary="Update enrollment progress")
+@router.put("/enrollments/{enrollment_id}/progress", status_code=204, response_model=None, summary="Update enrollment progress")
 async def update_enrollment_progress(
     storage: StorageServiceDep,
     enrollment_id: int,
@@ -84,16 +93,23 @@ async def update_enrollment_progress(
 
 
 @router.post("/book-purchases", response_model=BookPurchaseRead, status_code=201, summary="Purchase book")
-async def create_book_purchase(storage: StorageServiceDep, payload: BookPurchaseCreate) -> BookPurchaseRead:
+async def create_book_purchase(
+    request: Request, storage: StorageServiceDep, payload: BookPurchaseCreate
+) -> BookPurchaseRead:
     try:
         purchase = await storage.purchase_book(payload.model_dump(by_alias=False))
+    except InsufficientBalanceError as exc:
+        raise HTTPException(status_code=402, detail=str(exc)) from exc
+    except NoResultFound as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
     except ValueError as exc:
         raise HTTPException(status_code=409, detail=str(exc)) from exc
+    note_written_users(request, [payload.user_id])
     return BookPurchaseRead.model_validate(purchase)
 
 
 @router.get("/{user_id}/books", response_model=list[BookPurchaseRead], summary="List user books")
-async def list_user_books(storage: StorageServiceDep, user_id: str) -> list[BookPurchaseRead]:
+async def list_user_books(storage: ReadStorageServiceDep, user_id: str) -> list[BookPurchaseRead]:
     purchases = await storage.get_user_books(user_id)
     return [BookPurchaseRead.model_validate(item) for item in purchases]
 
@@ -103,7 +119,7 @@ async def list_user_books(storage: StorageServiceDep, user_id: str) -> list[Book
     response_model=BookReadingProgressRead | None,
     summary="Get book progress",
 )
-async def get_book_progress(storage: StorageServiceDep, user_id: str, book_id: int) -> BookReadingProgressRead | None:
+async def get_book_progress(storage: ReadStorageServiceDep, user_id: str, book_id: int) -> BookReadingProgressRead | None:
     progress = await storage.get_book_reading_progress(user_id, book_id)
     if not progress:
         return None
@@ -140,7 +156,7 @@ async def complete_book(storage: StorageServiceDep, user_id: str, book_id: int)
     response_model=CourseReadingProgressRead | None,
     summary="Get course progress",
 )
-async def get_course_progress(storage: StorageServiceDep, user_id: str, course_id: int) -> CourseReadingProgressRead | None:
+async def get_course_progress(storage: ReadStorageServiceDep, user_id: str, course_id: int) -> CourseReadingProgressRead | None:
     progress = await storage.get_course_reading_progress(user_id, course_id)
     if not progress:
         return None
@@ -177,7 +193,7 @@ async def complete_course(storage: StorageServiceDep, user_id: str, course_id: i
     response_model=list[BookReadingProgressRead],
     summary="List all book progress",
 )
-async def list_book_progress(storage: StorageServiceDep, user_id: str) -> list[BookReadingProgressRead]:
+async def list_book_progress(storage: ReadStorageServiceDep, user_id: str) -> list[BookReadingProgressRead]:
     progress = await storage.get_all_book_progress(user_id)
     return [BookReadingProgressRead.model_validate(item) for item in progress]
 
@@ -188,14 +204,32 @@ async def list_book_progress(storage: StorageServiceDep, user_id: str) -> list[B
     summary="List user transactions",
 )
 async def list_user_transactions(
-    storage: StorageServiceDep,
+    storage: ReadStorageServiceDep,
+    response: Response,
     user_id: str,
-    limit: int | None = None,
+    limit: int | None = Query(None, ge=1, le=500, description="Page size; omit with `before` for the full history"),
+    before: str | None = Query(None, description="Value of the previous page's X-Next-Cursor header"),
 ) -> list[TransactionRead]:
-    transactions = await storage.get_user_transactions(user_id, limit)
+    """Newest first. Without ``limit`` or ``before`` the whole history, as before paging existed."""
+    if before is not None and limit is None:
+        limit = TRANSACTIONS_PAGE_SIZE
+    transactions = await storage.get_user_transactions(user_id, limit, decode_cursor(before, int) if before else None)
+    if limit is not None and len(transactions) == limit:
+        last = transactions[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
     return [TransactionRead.model_validate(tx) for tx in transactions]
 
 
+@router.get(
+    "/{user_id}/transactions/summary",
+    response_model=list[TransactionTypeTotal],
+    summary="Transaction count and total per type",
+)
+async def user_transaction_summary(storage: ReadStorageServiceDep, user_id: str) -> list[TransactionTypeTotal]:
+    totals = await storage.get_transaction_totals(user_id)
+    return [TransactionTypeTotal(type=kind, count=count, total=total) for kind, count, total in totals]
+
+
 @router.get(
     "/{user_id}/daily-challenge",
     response_model=DailyChallengeRead,
@@ -214,6 +248,7 @@ async def get_daily_challenge(storage: StorageServiceDep, user_id: str) -> Daily
 @router.put(
     "/daily-challenges/{challenge_id}",
     status_code=204,
+    response_model=None,
     summary="Update daily challenge",
 )
 async def update_daily_challenge(
@@ -4,7 +4,8 @@ from functools import lru_cache
 from pathlib import Path
 from typing import Literal
 
-from pydantic import BaseSettings, Field, computed_field
+from pydantic import Field, computed_field
+from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
@@ -13,6 +14,25 @@ class Settings(BaseSettings):
         default="development", alias="APP_ENV"
     )
     database_url: str = Field(..., alias="DATABASE_URL")
+    database_read_url: str | None = Field(default=None, alias="DATABASE_READ_URL")
+    db_replica_max_lag: float = Field(default=5.0, alias="DB_REPLICA_MAX_LAG")
+    db_replica_lag_check_interval: float = Field(
+        default=1.0, alias="DB_REPLICA_LAG_CHECK_INTERVAL"
+    )
+    db_read_your_writes_window: float = Field(
+        default=10.0, alias="DB_READ_YOUR_WRITES_WINDOW"
+    )
+    db_pool_size: int = Field(default=10, alias="DB_POOL_SIZE")
+    db_max_overflow: int = Field(default=20, alias="DB_MAX_OVERFLOW")
+    db_pool_timeout: float = Field(default=30.0, alias="DB_POOL_TIMEOUT")
+    db_pool_recycle: int = Field(default=1800, alias="DB_POOL_RECYCLE")
+    db_pool_pre_ping: bool = Field(default=False, alias="DB_POOL_PRE_PING")
+    db_pool_warm_connections: int = Field(default=0, alias="DB_POOL_WARM_CONNECTIONS")
+    db_statement_cache_size: int = Field(default=100, alias="DB_STATEMENT_CACHE_SIZE")
+    db_pgbouncer: bool = Field(default=False, alias="DB_PGBOUNCER")
+    storage_backend: Literal["postgres", "memory"] = Field(
+        default="postgres", alias="STORAGE_BACKEND"
+    )
     host: str = Field(default="0.0.0.0", alias="HOST")
     port: int = Field(default=5000, alias="PORT")
     telegram_bot_token: str | None = Field(default=None, alias="TELEGRAM_BOT_TOKEN")
@@ -26,6 +46,29 @@ class Settings(BaseSettings):
     daily_reward_limit: int = Field(default=1000, alias="DAILY_REWARD_LIMIT")
     action_cooldown: int = Field(default=30, alias="ACTION_COOLDOWN")
     replit_domains: str | None = Field(default=None, alias="REPLIT_DOMAINS")
+    rewards_config_poll_interval: float = Field(
+        default=2.0, alias="REWARDS_CONFIG_POLL_INTERVAL"
+    )
+    idempotency_cache_size: int = Field(default=100_000, alias="IDEMPOTENCY_CACHE_SIZE")
+    idempotency_bloom_capacity: int = Field(default=0, alias="IDEMPOTENCY_BLOOM_CAPACITY")
+    idempotency_bloom_error_rate: float = Field(
+        default=0.001, alias="IDEMPOTENCY_BLOOM_ERROR_RATE"
+    )
+    idempotency_warm_days: int = Field(default=7, alias="IDEMPOTENCY_WARM_DAYS")
+    reward_queue_workers: int = Field(default=4, alias="REWARD_QUEUE_WORKERS")
+    reward_queue_partitions: int = Field(default=16, alias="REWARD_QUEUE_PARTITIONS")
+    reward_queue_batch_size: int = Field(default=100, alias="REWARD_QUEUE_BATCH_SIZE")
+    reward_queue_poll_interval: float = Field(default=1.0, alias="REWARD_QUEUE_POLL_INTERVAL")
+    reward_queue_max_attempts: int = Field(default=5, alias="REWARD_QUEUE_MAX_ATTEMPTS")
+    reward_queue_retry_delay: float = Field(default=2.0, alias="REWARD_QUEUE_RETRY_DELAY")
+    reward_queue_max_backlog: int = Field(default=100_000, alias="REWARD_QUEUE_MAX_BACKLOG")
+    catalog_cache_size: int = Field(default=512, alias="CATALOG_CACHE_SIZE")
+    catalog_cache_ttl: float = Field(default=300.0, alias="CATALOG_CACHE_TTL")
+    catalog_cache_notify: bool = Field(default=False, alias="CATALOG_CACHE_NOTIFY")
+    catalog_http_max_age: int = Field(default=30, alias="CATALOG_HTTP_MAX_AGE")
+    db_repeated_statement_threshold: int = Field(
+        default=10, alias="DB_REPEATED_STATEMENT_THRESHOLD"
+    )
 
     @computed_field
     @property
@@ -43,6 +86,8 @@ class Settings(BaseSettings):
         env_file = (Path(__file__).resolve().parent.parent.parent / ".env", ".env")
         env_file_encoding = "utf-8"
         case_sensitive = False
+        # The .env at the repo root is shared with the Node server and the Vite build.
+        extra = "ignore"
 
 
 @lru_cache()
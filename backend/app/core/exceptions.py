@@ -0,0 +1,5 @@
+"""Domain exceptions shared by the data access layers."""
+
+
+class InsufficientBalanceError(ValueError):
+    """Raised when a guarded debit would take a balance below zero."""
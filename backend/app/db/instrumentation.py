@@ -0,0 +1,179 @@
+"""Per-request SQL statement accounting and connection pool metrics.
+
+Cursor events on the engine add every statement's duration and row count to the
+``QueryStats`` of the request being served (tracked in a context variable), and
+``QueryStatsMiddleware`` reports the totals as ``Server-Timing`` / ``X-DB-Queries``
+response headers. A statement shape that repeats more than
+``settings.db_repeated_statement_threshold`` times in one request is logged as a
+likely N+1 query. Pool occupancy and checkout wait time are exported through
+``app.core.metrics``.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Set on the statement's ExecutionContext, which is discarded with the statement, so a
+# statement that fails between the two cursor events leaves nothing behind.
+_START_ATTR = "_query_stats_start"
+
+
+@dataclass(slots=True)
+class QueryStats:
+    statements: int = 0
+    seconds: float = 0.0
+    rows: int = 0
+    shapes: Counter[str] = field(default_factory=Counter)
+
+    def record(self, statement: str, seconds: float, rows: int) -> None:
+        self.statements += 1
+        self.seconds += seconds
+        self.rows += max(rows, 0)
+        self.shapes[statement] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.seconds * 1000:.1f};desc="{self.statements} queries, {self.rows} rows"'
+
+
+_current_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def current_query_stats() -> QueryStats | None:
+    return _current_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _current_stats.get() is not None and context is not None:
+        setattr(context, _START_ATTR, time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    started = getattr(context, _START_ATTR, None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    # Bound parameters are placeholders in the compiled SQL, so the text itself
+    # identifies the statement shape.
+    stats.record(statement, elapsed, cursor.rowcount if cursor is not None else 0)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Attach the statement accounting listeners to a (sync) engine."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+_pools: dict[str, Pool] = {}
+
+
+def _pool_samples(read) -> list[tuple[tuple[str, ...], float]]:
+    return [((name,), read(pool)) for name, pool in _pools.items() if isinstance(pool, AsyncAdaptedQueuePool)]
+
+
+DB_POOL_SIZE = REGISTRY.gauge(
+    "db_pool_size", "Configured connection pool size.", ("pool",), lambda: _pool_samples(lambda pool: pool.size())
+)
+DB_POOL_CHECKED_OUT = REGISTRY.gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of the pool.",
+    ("pool",),
+    lambda: _pool_samples(lambda pool: pool.checkedout()),
+)
+DB_POOL_OVERFLOW = REGISTRY.gauge(
+    "db_pool_overflow",
+    "Connections open beyond the pool size (negative while the pool is still filling).",
+    ("pool",),
+    lambda: _pool_samples(lambda pool: pool.overflow()),
+)
+DB_POOL_WAIT = REGISTRY.histogram(
+    "db_pool_checkout_seconds",
+    "Time spent obtaining a pooled connection, including any new connect.",
+    ("pool",),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+DB_POOL_TIMEOUTS = REGISTRY.counter("db_pool_timeouts_total", "Pool checkouts that timed out.", ("pool",))
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """``AsyncAdaptedQueuePool`` that records how long each checkout waits."""
+
+    metrics_name = "primary"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            DB_POOL_TIMEOUTS.inc(self.metrics_name)
+            raise
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - started, self.metrics_name)
+
+
+def watch_pool(name: str, engine: Engine) -> None:
+    """Export occupancy gauges (and checkout timings, for ``TimedAsyncQueuePool``) for ``engine``."""
+    pool = engine.pool
+    if isinstance(pool, TimedAsyncQueuePool):
+        pool.metrics_name = name
+    _pools[name] = pool
+
+
+class QueryStatsMiddleware:
+    """Collect ``QueryStats`` for each HTTP request and expose them as response headers."""
+
+    def __init__(self, app: ASGIApp, repeated_threshold: int | None = None) -> None:
+        self.app = app
+        self.repeated_threshold = (
+            settings.db_repeated_statement_threshold if repeated_threshold is None else repeated_threshold
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+
+        async def send_with_stats(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", stats.server_timing())
+                headers["X-DB-Queries"] = str(stats.statements)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current_stats.reset(token)
+            if self.repeated_threshold > 0:
+                for shape, count in stats.repeated(self.repeated_threshold):
+                    logger.warning(
+                        "%s %s ran the same statement %s times (%s statements total): %s",
+                        scope["method"],
+                        scope["path"],
+                        count,
+                        stats.statements,
+                        " ".join(shape.split())[:500],
+                    )
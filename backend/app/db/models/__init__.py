@@ -16,6 +16,9 @@ from app.db.models.models import (
     DailyChallenge,
     Enrollment,
     LessonTest,
+    RewardEmissionBackfill,
+    RewardEmissionDaily,
+    RewardOutbox,
     Session,
     SponsorChannel,
     TestAttempt,
@@ -43,6 +46,9 @@ __all__ = [
     "DailyChallenge",
     "Enrollment",
     "LessonTest",
+    "RewardEmissionBackfill",
+    "RewardEmissionDaily",
+    "RewardOutbox",
     "Session",
     "SponsorChannel",
     "TestAttempt",
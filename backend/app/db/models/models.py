@@ -3,15 +3,18 @@
 from __future__ import annotations
 
 import enum
-from datetime import datetime
+from datetime import date as date_type, datetime
 
 from sqlalchemy import (
+    BigInteger,
     Boolean,
+    Date,
     DateTime,
     Enum,
     ForeignKey,
     Integer,
     Numeric,
+    SmallInteger,
     String,
     Text,
     UniqueConstraint,
@@ -67,6 +70,9 @@ class Session(Base):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("users_created_at_id_idx", "created_at", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String, primary_key=True)
     email: Mapped[str | None] = mapped_column(String, unique=True)
@@ -161,6 +167,9 @@ class Course(Base):
 
 class Enrollment(Base):
     __tablename__ = "enrollments"
+    __table_args__ = (
+        UniqueConstraint("user_id", "course_id", name="enrollments_user_course_key"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[str] = mapped_column(
@@ -218,6 +227,9 @@ class Book(Base):
 
 class BookPurchase(Base):
     __tablename__ = "book_purchases"
+    __table_args__ = (
+        UniqueConstraint("user_id", "book_id", name="book_purchases_user_book_key"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[str] = mapped_column(
@@ -236,6 +248,15 @@ class BookPurchase(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        Index(
+            "transactions_user_created_at_idx",
+            "user_id",
+            "created_at",
+            "id",
+            postgresql_include=["type", "amount"],
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[str] = mapped_column(
@@ -246,7 +267,7 @@ class Transaction(Base):
     )
     amount: Mapped[Numeric] = mapped_column(Numeric(10, 2), nullable=False)
     description: Mapped[str] = mapped_column(String, nullable=False)
-    metadata: Mapped[dict | None] = mapped_column(JSON)
+    metadata_: Mapped[dict | None] = mapped_column("metadata", JSON)
     created_at: Mapped[datetime] = mapped_column(
         DateTime, server_default=func.now(), nullable=False
     )
@@ -273,6 +294,9 @@ class SponsorChannel(Base):
 
 class ChannelSubscription(Base):
     __tablename__ = "channel_subscriptions"
+    __table_args__ = (
+        Index("channel_subscriptions_user_idx", "user_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[str] = mapped_column(
@@ -314,6 +338,9 @@ class DailyChallenge(Base):
 
 class CourseLesson(Base):
     __tablename__ = "course_lessons"
+    __table_args__ = (
+        Index("course_lessons_course_order_idx", "course_id", "order_index"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     course_id: Mapped[int] = mapped_column(
@@ -343,6 +370,9 @@ class CourseLesson(Base):
 
 class BookChapter(Base):
     __tablename__ = "book_chapters"
+    __table_args__ = (
+        Index("book_chapters_book_order_idx", "book_id", "order_index"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     book_id: Mapped[int] = mapped_column(
@@ -426,6 +456,9 @@ class CourseReadingProgress(Base):
 
 class ChapterTest(Base):
     __tablename__ = "chapter_tests"
+    __table_args__ = (
+        Index("chapter_tests_chapter_idx", "chapter_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     chapter_id: Mapped[int] = mapped_column(
@@ -446,13 +479,20 @@ class ChapterTest(Base):
     )
 
     chapter: Mapped[BookChapter] = relationship(back_populates="tests")
+    # Attempts reference a test by (test_type, test_id), with no foreign key; chapter and
+    # lesson tests share that column, hence ``overlaps``.
     attempts: Mapped[list["TestAttempt"]] = relationship(
-        back_populates="chapter", cascade="all, delete-orphan"
+        primaryjoin="and_(foreign(TestAttempt.test_id) == ChapterTest.id, TestAttempt.test_type == 'chapter')",
+        cascade="all, delete-orphan",
+        overlaps="attempts",
     )
 
 
 class LessonTest(Base):
     __tablename__ = "lesson_tests"
+    __table_args__ = (
+        Index("lesson_tests_lesson_idx", "lesson_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     lesson_id: Mapped[int] = mapped_column(
@@ -473,13 +513,20 @@ class LessonTest(Base):
     )
 
     lesson: Mapped[CourseLesson] = relationship(back_populates="tests")
+    # Attempts reference a test by (test_type, test_id), with no foreign key; chapter and
+    # lesson tests share that column, hence ``overlaps``.
     attempts: Mapped[list["TestAttempt"]] = relationship(
-        back_populates="lesson", cascade="all, delete-orphan"
+        primaryjoin="and_(foreign(TestAttempt.test_id) == LessonTest.id, TestAttempt.test_type == 'lesson')",
+        cascade="all, delete-orphan",
+        overlaps="attempts",
     )
 
 
 class TestAttempt(Base):
     __tablename__ = "test_attempts"
+    __table_args__ = (
+        Index("test_attempts_user_test_idx", "user_id", "test_type", "test_id", "attempted_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[str] = mapped_column(
@@ -500,12 +547,8 @@ class TestAttempt(Base):
     )
 
     user: Mapped[User] = relationship(overlaps="chapter,lesson")
-    chapter: Mapped[BookChapter | None] = relationship(
-        back_populates="attempts", overlaps="user,lesson"
-    )
-    lesson: Mapped[CourseLesson | None] = relationship(
-        back_populates="attempts", overlaps="user,chapter"
-    )
+    chapter: Mapped[BookChapter | None] = relationship(overlaps="user,lesson")
+    lesson: Mapped[CourseLesson | None] = relationship(overlaps="user,chapter")
 
 
 class UserDailyCounter(Base):
@@ -550,7 +593,7 @@ class UserReward(Base):
     action_id: Mapped[str] = mapped_column(String, nullable=False)
     mind_amount: Mapped[int] = mapped_column(Integer, nullable=False)
     idempotency_key: Mapped[str] = mapped_column(String, unique=True, nullable=False)
-    metadata: Mapped[dict | None] = mapped_column(JSON)
+    metadata_: Mapped[dict | None] = mapped_column("metadata", JSON)
     timestamp: Mapped[datetime] = mapped_column(
         DateTime, server_default=func.now(), nullable=False
     )
@@ -561,8 +604,74 @@ class UserReward(Base):
     user: Mapped[User] = relationship()
 
 
+class RewardEmissionDaily(Base):
+    """Per-day, per-action reward totals maintained as rewards are recorded.
+
+    Each (date, action) is split over a few ``shard`` rows keyed by user so that
+    concurrent reward writers rarely contend on the same row; readers sum the shards.
+    """
+
+    __tablename__ = "reward_emission_daily"
+
+    date: Mapped[date_type] = mapped_column(Date, primary_key=True)
+    action_id: Mapped[str] = mapped_column(String, primary_key=True)
+    shard: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    total_mind: Mapped[int] = mapped_column(BigInteger, server_default=text("0"), nullable=False)
+    reward_count: Mapped[int] = mapped_column(Integer, server_default=text("0"), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+
+class RewardEmissionBackfill(Base):
+    """Marks ``reward_emission_daily`` as reconciled with ``user_rewards`` by
+    ``scripts/backfill_emission.py``; until the row exists emission is read from
+    ``user_rewards`` directly.
+    """
+
+    __tablename__ = "reward_emission_backfill"
+
+    id: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    cutover: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    completed_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), nullable=False
+    )
+
+
+class RewardOutbox(Base):
+    """Reward events accepted by the ingestion endpoint and not yet applied."""
+
+    __tablename__ = "reward_outbox"
+    __table_args__ = (
+        Index(
+            "reward_outbox_pending_idx",
+            "partition",
+            "id",
+            postgresql_where=text("status = 'pending'"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    partition: Mapped[int] = mapped_column(Integer, nullable=False)
+    user_id: Mapped[str] = mapped_column(String, nullable=False)
+    idempotency_key: Mapped[str] = mapped_column(String, nullable=False)
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False)
+    status: Mapped[str] = mapped_column(String(16), server_default=text("'pending'"), nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, server_default=text("0"), nullable=False)
+    last_error: Mapped[str | None] = mapped_column(Text)
+    available_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), nullable=False
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), nullable=False
+    )
+
+
 class TextContent(Base):
     __tablename__ = "text_content"
+    __table_args__ = (
+        Index("text_content_category_idx", "category"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     key: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
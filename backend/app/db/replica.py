@@ -0,0 +1,176 @@
+"""Routing of read-only requests between the primary and a streaming replica.
+
+A request is served from the replica only when one is configured, its replay lag
+is within ``settings.db_replica_max_lag`` and the caller has not written recently.
+"Recently" is tracked two ways: a short-lived cookie set on the writer's own
+responses (works across workers) and a per-process map of user ids that were
+written, either through ``/users/{user_id}/...``-style routes or by endpoints that
+name the user in the body and report it with ``note_written_users``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator, Iterable
+
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.db.session import ReadSessionLocal, SessionLocal, read_engine
+
+logger = logging.getLogger(__name__)
+
+STICKY_COOKIE = "db_primary_until"
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Zero when the replica has replayed everything it received (an idle primary also
+# stops advancing pg_last_xact_replay_timestamp, which would otherwise look like lag).
+_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaLagMonitor:
+    """Cache the replica's replay lag, re-measuring at most once per interval."""
+
+    def __init__(self, engine: AsyncEngine, max_lag: float, check_interval: float) -> None:
+        self.engine = engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag: float | None = None
+        self._checked_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    async def measure(self) -> float | None:
+        try:
+            async with self.engine.connect() as connection:
+                return float((await connection.execute(_LAG_SQL)).scalar_one())
+        except Exception as exc:  # an unreachable replica must not fail the request
+            logger.warning("Replica lag check failed: %s", exc)
+            return None
+
+    async def healthy(self) -> bool:
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            async with self._lock:
+                if time.monotonic() - self._checked_at >= self.check_interval:
+                    self.lag = await self.measure()
+                    self._checked_at = time.monotonic()
+        return self.lag is not None and self.lag <= self.max_lag
+
+
+class RecentWriters:
+    """Per-process user ids that wrote within the read-your-writes window."""
+
+    def __init__(self, window: float, max_entries: int = 100_000) -> None:
+        self.window = window
+        self.max_entries = max_entries
+        self._until: dict[str, float] = {}
+
+    def note(self, user_id: str) -> None:
+        now = time.monotonic()
+        if len(self._until) >= self.max_entries:
+            self._until = {key: until for key, until in self._until.items() if until > now}
+        self._until.pop(user_id, None)
+        self._until[user_id] = now + self.window
+
+    def __contains__(self, user_id: str) -> bool:
+        until = self._until.get(user_id)
+        return until is not None and until > time.monotonic()
+
+
+recent_writers = RecentWriters(settings.db_read_your_writes_window)
+lag_monitor = (
+    ReplicaLagMonitor(read_engine, settings.db_replica_max_lag, settings.db_replica_lag_check_interval)
+    if read_engine is not None
+    else None
+)
+
+
+def note_written_users(request: Request, user_ids: Iterable[str]) -> None:
+    """Record users a write endpoint changed without naming them in its path.
+
+    ``ReadYourWritesMiddleware`` pins them to the primary once the response succeeds.
+    """
+    written = getattr(request.state, "written_user_ids", None)
+    if written is None:
+        written = request.state.written_user_ids = set()
+    written.update(user_ids)
+
+
+def _sticky(request: Request) -> bool:
+    try:
+        if float(request.cookies.get(STICKY_COOKIE, 0)) > time.time():
+            return True
+    except ValueError:
+        pass
+    user_id = request.path_params.get("user_id")
+    return user_id is not None and str(user_id) in recent_writers
+
+
+async def use_replica(request: Request) -> bool:
+    """Whether to read from the replica; the choice is kept for the ``X-DB-Source`` header."""
+    replica = (
+        ReadSessionLocal is not None
+        and lag_monitor is not None
+        and not _sticky(request)
+        and await lag_monitor.healthy()
+    )
+    request.state.db_source = "replica" if replica else "primary"
+    return replica
+
+
+async def get_read_session(request: Request) -> AsyncIterator[AsyncSession]:
+    """Session for read-only endpoints: the replica when safe, otherwise the primary."""
+    replica = await use_replica(request)
+    factory = ReadSessionLocal if replica else SessionLocal
+    async with factory() as session:
+        yield session
+
+
+class ReadYourWritesMiddleware:
+    """Pin a client (and the user it wrote for) to the primary after a successful write.
+
+    Also reports where a read was served from as ``X-DB-Source``, on every response
+    type (cached and streamed bodies are built outside the dependency's ``Response``).
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        pin = scope["method"] not in SAFE_METHODS and ReadSessionLocal is not None
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                # Request.state lives in scope["state"], shared with the endpoint.
+                state = scope.get("state", {})
+                source = state.get("db_source")
+                if source is not None and "X-DB-Source" not in headers:
+                    headers["X-DB-Source"] = source
+                if pin and message["status"] < 400:
+                    window = settings.db_read_your_writes_window
+                    user_id = scope.get("path_params", {}).get("user_id")
+                    if user_id is not None:
+                        recent_writers.note(str(user_id))
+                    for written in state.get("written_user_ids", ()):
+                        recent_writers.note(written)
+                    cookie = (
+                        f"{STICKY_COOKIE}={time.time() + window:.0f}; Max-Age={window:.0f}; "
+                        "Path=/; HttpOnly; SameSite=Lax"
+                    )
+                    headers.append("Set-Cookie", cookie)
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
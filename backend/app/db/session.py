@@ -1,14 +1,80 @@
 """SQLAlchemy engine and session management."""
 
+import asyncio
+import logging
 from collections.abc import AsyncIterator
+from typing import Any
+from uuid import uuid4
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
 from app.core.config import settings
+from app.db.instrumentation import TimedAsyncQueuePool, instrument_engine, watch_pool
 
-engine = create_async_engine(settings.database_url, echo=False, future=True)
+logger = logging.getLogger(__name__)
+
+
+def _prepared_statement_name() -> str:
+    return f"__asyncpg_{uuid4()}__"
+
+
+def engine_options() -> dict[str, Any]:
+    """Pool and driver options for ``create_async_engine`` taken from settings."""
+    connect_args: dict[str, Any] = {"statement_cache_size": settings.db_statement_cache_size}
+    if settings.db_pgbouncer:
+        # PgBouncer in transaction mode hands each transaction to any server
+        # connection, so a statement prepared on one may be missing (or clash by
+        # name) on the next. Disable both prepared statement caches, and name the
+        # statements SQLAlchemy still prepares per query uniquely.
+        connect_args = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": _prepared_statement_name,
+        }
+    return {
+        "echo": False,
+        "future": True,
+        "poolclass": TimedAsyncQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "connect_args": connect_args,
+    }
+
+
+engine = create_async_engine(settings.database_url, **engine_options())
+instrument_engine(engine.sync_engine)
+watch_pool("primary", engine.sync_engine)
 SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 
+# Optional streaming replica for read-only traffic; see ``app.db.replica`` for routing.
+read_engine: AsyncEngine | None = None
+ReadSessionLocal: async_sessionmaker[AsyncSession] | None = None
+if settings.database_read_url:
+    read_engine = create_async_engine(settings.database_read_url, **engine_options())
+    instrument_engine(read_engine.sync_engine)
+    watch_pool("replica", read_engine.sync_engine)
+    ReadSessionLocal = async_sessionmaker(bind=read_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def warm_pool(target: AsyncEngine, count: int) -> int:
+    """Open up to ``count`` pooled connections at once so early requests skip the connect."""
+    # Overflow connections are closed when checked back in; only pool_size stay warm.
+    count = min(count, settings.db_pool_size)
+    if count <= 0:
+        return 0
+    connections = [target.connect() for _ in range(count)]
+    results = await asyncio.gather(*(connection.start() for connection in connections), return_exceptions=True)
+    opened = [connection for connection, result in zip(connections, results) if not isinstance(result, BaseException)]
+    # Returning them checks them back into the pool, where they stay open.
+    await asyncio.gather(*(connection.close() for connection in opened))
+    failures = [result for result in results if isinstance(result, BaseException)]
+    if failures:
+        logger.warning("Could only warm %s of %s connections: %s", len(opened), count, failures[0])
+    return len(opened)
+
 
 async def get_session() -> AsyncIterator[AsyncSession]:
     async with SessionLocal() as session:
@@ -2,12 +2,21 @@
 
 import logging
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.routes import api_router
 from app.api.v1.telegram import public_router as telegram_public_router
 from app.core.config import settings
+from app.core.metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware
+from app.db.instrumentation import QueryStatsMiddleware
+from app.db.replica import ReadYourWritesMiddleware
+from app.db.session import SessionLocal, engine, warm_pool
+from app.services.catalog_cache import start_catalog_listener, stop_catalog_listener
+from app.services.idempotency import warm_idempotency_filter
+from app.services.reward_config import start_reward_config_watcher, stop_reward_config_watcher
+from app.services.reward_engine import get_reward_engine
+from app.services.reward_queue import start_reward_queue, stop_reward_queue
 from app.services.telegram_bot import initialise_telegram_bot
 
 app = FastAPI(title=settings.app_name)
@@ -21,7 +30,11 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-DB-Queries", "X-DB-Source", "X-Next-Cursor"],
 )
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(api_router, prefix="/api")
 app.include_router(telegram_public_router)
@@ -32,6 +45,11 @@ async def root_health() -> dict[str, str]:
     return {"status": "ok", "service": settings.app_name}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
 @app.on_event("startup")
 async def on_startup() -> None:
     manager = initialise_telegram_bot()
@@ -39,3 +57,19 @@ async def on_startup() -> None:
         logger.info("Telegram bot initialised")
     else:
         logger.info("Telegram bot token not configured; skipping initialisation")
+    start_reward_config_watcher(get_reward_engine())
+    if settings.storage_backend == "postgres" and settings.db_pool_warm_connections > 0:
+        warmed = await warm_pool(engine, settings.db_pool_warm_connections)
+        logger.info("Warmed %s database connections", warmed)
+    if settings.storage_backend == "postgres":
+        async with SessionLocal() as session:
+            await warm_idempotency_filter(session)
+        await start_catalog_listener(engine)
+    start_reward_queue()
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    await stop_reward_queue()
+    await stop_catalog_listener()
+    await stop_reward_config_watcher()
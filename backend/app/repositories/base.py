@@ -1,7 +1,115 @@
 """Base repository abstractions."""
 
+from __future__ import annotations
+
+from typing import Any, Mapping, Sequence, TypeVar
+
+from sqlalchemy import Column, inspect, insert, null, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+ModelT = TypeVar("ModelT")
+
+
+def _columns(model: type) -> dict[str, Column]:
+    """``model``'s columns by column name and by mapped attribute name.
+
+    Both are accepted because they differ for ``metadata``, which is reserved on
+    ORM entities and mapped as ``metadata_``.
+    """
+    columns = {column.name: column for column in model.__table__.c}
+    for prop in inspect(model).column_attrs:
+        columns[prop.key] = prop.columns[0]
+    return columns
+
+
+def _insert_values(model: type, data: Mapping[str, Any]) -> dict:
+    """Column values for an INSERT, treating ``None`` the way the ORM's ``add()`` does.
+
+    ``None`` leaves a column with a default to that default and is SQL NULL
+    otherwise (Core would store JSON columns as JSON ``null``). A key that is not
+    a column raises ``TypeError``, as ``model(**data)`` does.
+    """
+    columns = _columns(model)
+    values = {}
+    for key, value in data.items():
+        column = columns.get(key)
+        if column is None:
+            raise TypeError(f"{key!r} is an invalid keyword argument for {model.__name__}")
+        if value is None:
+            if column.default is not None or column.server_default is not None:
+                continue
+            value = null()
+        values[column] = value
+    return values
+
+
+def _update_values(model: type, data: Mapping[str, Any]) -> dict:
+    """The non-``None`` column values in ``data``: partial updates never clear a column.
+
+    Keys that are not columns are ignored, as the attribute-by-attribute updates
+    this replaces ignored them.
+    """
+    columns = _columns(model)
+    return {columns[key]: value for key, value in data.items() if key in columns and value is not None}
+
+
+async def insert_returning(session: AsyncSession, model: type[ModelT], data: Mapping[str, Any]) -> ModelT:
+    """INSERT one row and load it, server defaults included, from ``RETURNING``.
+
+    One round trip, where ``add()`` + ``flush()`` + ``refresh()`` takes two.
+    """
+    return await session.scalar(insert(model).values(_insert_values(model, data)).returning(model))
+
+
+async def update_returning(
+    session: AsyncSession, model: type[ModelT], key: Any, data: Mapping[str, Any]
+) -> ModelT | None:
+    """Apply the non-``None`` column values in ``data`` to the row with primary key ``key``.
+
+    The updated row (with ``onupdate`` columns such as ``updated_at`` refreshed)
+    comes back from ``RETURNING``; ``None`` if there is no such row.
+    """
+    values = _update_values(model, data)
+    if not values:
+        return await session.get(model, key)
+    (primary_key,) = model.__table__.primary_key.columns
+    return await session.scalar(
+        update(model)
+        .where(primary_key == key)
+        .values(values)
+        .returning(model)
+        .execution_options(populate_existing=True)
+    )
+
+
+async def upsert_returning(
+    session: AsyncSession, model: type[ModelT], data: Mapping[str, Any], index_elements: Sequence[str]
+) -> ModelT:
+    """``INSERT ... ON CONFLICT (index_elements) DO UPDATE ... RETURNING`` in one round trip.
+
+    An existing row gets the non-``None`` values in ``data`` (and its ``onupdate``
+    columns bumped); with nothing to change it is returned as it is.
+    """
+    stmt = pg_insert(model).values(_insert_values(model, data))
+    updates = {
+        column.name: stmt.excluded[column.name]
+        for column in _update_values(model, data)
+        if column.name not in index_elements
+    }
+    if updates:
+        for column in model.__table__.c:
+            if column.onupdate is not None and column.onupdate.is_clause_element and column.name not in updates:
+                updates[column.name] = column.onupdate.arg
+    else:
+        # DO NOTHING would return no row; a no-op assignment returns the existing one.
+        updates = {index_elements[0]: stmt.excluded[index_elements[0]]}
+    return await session.scalar(
+        stmt.on_conflict_do_update(index_elements=index_elements, set_=updates)
+        .returning(model)
+        .execution_options(populate_existing=True)
+    )
+
 
 class BaseRepository:
     """Common repository helpers."""
@@ -17,3 +125,14 @@ class BaseRepository:
 
     async def refresh(self, instance) -> None:
         await self.session.refresh(instance)
+
+    async def insert_returning(self, model: type[ModelT], data: Mapping[str, Any]) -> ModelT:
+        return await insert_returning(self.session, model, data)
+
+    async def update_returning(self, model: type[ModelT], key: Any, data: Mapping[str, Any]) -> ModelT | None:
+        return await update_returning(self.session, model, key, data)
+
+    async def upsert_returning(
+        self, model: type[ModelT], data: Mapping[str, Any], index_elements: Sequence[str]
+    ) -> ModelT:
+        return await upsert_returning(self.session, model, data, index_elements)
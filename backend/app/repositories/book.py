@@ -26,21 +26,12 @@ class BookRepository(BaseRepository):
         return result.scalar_one_or_none()
 
     async def create(self, data: dict) -> Book:
-        book = Book(**data)
-        self.session.add(book)
-        await self.flush()
-        await self.refresh(book)
-        return book
+        return await self.insert_returning(Book, data)
 
     async def update(self, book_id: int, data: dict) -> Book:
-        book = await self.get(book_id)
+        book = await self.update_returning(Book, book_id, data)
         if not book:
             raise NoResultFound(f"Book {book_id} not found")
-        for key, value in data.items():
-            if value is not None and hasattr(book, key):
-                setattr(book, key, value)
-        await self.flush()
-        await self.refresh(book)
         return book
 
     async def soft_delete(self, book_id: int) -> None:
@@ -51,10 +42,7 @@ class BookRepository(BaseRepository):
         await self.flush()
 
     async def set_visibility(self, book_id: int, is_visible: bool) -> Book:
-        book = await self.get(book_id)
+        book = await self.update_returning(Book, book_id, {"is_visible": is_visible})
         if not book:
             raise NoResultFound(f"Book {book_id} not found")
-        book.is_visible = is_visible
-        await self.flush()
-        await self.refresh(book)
         return book
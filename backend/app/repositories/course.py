@@ -24,21 +24,12 @@ class CourseRepository(BaseRepository):
         return result.scalar_one_or_none()
 
     async def create(self, data: dict) -> Course:
-        course = Course(**data)
-        self.session.add(course)
-        await self.flush()
-        await self.refresh(course)
-        return course
+        return await self.insert_returning(Course, data)
 
     async def update(self, course_id: int, data: dict) -> Course:
-        course = await self.get(course_id)
+        course = await self.update_returning(Course, course_id, data)
         if not course:
             raise NoResultFound(f"Course {course_id} not found")
-        for key, value in data.items():
-            if value is not None and hasattr(course, key):
-                setattr(course, key, value)
-        await self.flush()
-        await self.refresh(course)
         return course
 
     async def soft_delete(self, course_id: int) -> None:
@@ -49,10 +40,7 @@ class CourseRepository(BaseRepository):
         await self.flush()
 
     async def set_visibility(self, course_id: int, is_visible: bool) -> Course:
-        course = await self.get(course_id)
+        course = await self.update_returning(Course, course_id, {"is_visible": is_visible})
         if not course:
             raise NoResultFound(f"Course {course_id} not found")
-        course.is_visible = is_visible
-        await self.flush()
-        await self.refresh(course)
         return course
@@ -4,9 +4,10 @@ from __future__ import annotations
 
 from decimal import Decimal
 
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.exc import NoResultFound
 
+from app.core.exceptions import InsufficientBalanceError
 from app.db.models import User
 from app.repositories.base import BaseRepository
 
@@ -17,34 +18,34 @@ class UserRepository(BaseRepository):
         return result.scalar_one_or_none()
 
     async def upsert(self, data: dict) -> User:
-        user = await self.get(data["id"])
-        if user:
-            for key, value in data.items():
-                if hasattr(user, key) and value is not None and key != "id":
-                    setattr(user, key, value)
-        else:
-            user = User(**data)
-            self.session.add(user)
-        await self.flush()
-        await self.refresh(user)
-        return user
+        return await self.upsert_returning(User, data, ["id"])
 
     async def update_steps(self, user_id: str, steps: int) -> User:
-        user = await self.get(user_id)
+        user = await self.update_returning(User, user_id, {"daily_steps": steps})
         if not user:
             raise NoResultFound(f"User {user_id} not found")
-        user.daily_steps = steps
-        await self.flush()
-        await self.refresh(user)
         return user
 
-    async def adjust_tokens(self, user_id: str, amount: Decimal | float | int) -> User:
-        user = await self.get(user_id)
-        if not user:
-            raise NoResultFound(f"User {user_id} not found")
+    async def adjust_tokens(
+        self,
+        user_id: str,
+        amount: Decimal | float | int,
+        *,
+        non_negative: bool = False,
+    ) -> User:
         delta = Decimal(str(amount))
-        current = Decimal(user.token_balance or 0)
-        user.token_balance = current + delta
-        await self.flush()
-        await self.refresh(user)
+        stmt = (
+            update(User)
+            .where(User.id == user_id)
+            .values(token_balance=User.token_balance + delta)
+            .returning(User)
+            .execution_options(populate_existing=True)
+        )
+        if non_negative:
+            stmt = stmt.where(User.token_balance + delta >= 0)
+        user = await self.session.scalar(stmt)
+        if user is None:
+            if non_negative and await self.get(user_id):
+                raise InsufficientBalanceError(f"User {user_id} has insufficient balance")
+            raise NoResultFound(f"User {user_id} not found")
         return user
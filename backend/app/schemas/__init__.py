@@ -2,27 +2,48 @@
 
 from app.schemas.models import (
     BookBase,
+    BookChapterCreate,
     BookChapterRead,
+    BookChapterUpdate,
     BookCreate,
+    BookPurchaseCreate,
     BookPurchaseRead,
     BookReadingProgressRead,
+    BookReadingProgressUpdate,
+    BookSummary,
     BookUpdate,
+    ChannelSubscriptionCreate,
     ChannelSubscriptionRead,
+    ChapterTestCreate,
     ChapterTestRead,
+    ChapterTestUpdate,
     CourseBase,
     CourseCreate,
+    CourseLessonCreate,
     CourseLessonRead,
+    CourseLessonUpdate,
     CourseReadingProgressRead,
+    CourseReadingProgressUpdate,
+    CourseSummary,
     CourseUpdate,
+    DailyChallengeCreate,
     DailyChallengeRead,
+    DailyChallengeUpdate,
+    EnrollmentCreate,
     EnrollmentRead,
+    LessonTestCreate,
     LessonTestRead,
+    LessonTestUpdate,
     RewardBatchRequest,
     RewardProcessEvent,
+    SponsorChannelCreate,
     SponsorChannelRead,
+    TestAttemptCreate,
     TestAttemptRead,
     TextContentRead,
+    TransactionCreate,
     TransactionRead,
+    TransactionTypeTotal,
     UserBase,
     UserCreate,
     UserRewardRead,
@@ -31,27 +52,48 @@ from app.schemas.models import (
 
 __all__ = [
     "BookBase",
+    "BookChapterCreate",
     "BookChapterRead",
+    "BookChapterUpdate",
     "BookCreate",
+    "BookPurchaseCreate",
     "BookPurchaseRead",
     "BookReadingProgressRead",
+    "BookReadingProgressUpdate",
+    "BookSummary",
     "BookUpdate",
+    "ChannelSubscriptionCreate",
     "ChannelSubscriptionRead",
+    "ChapterTestCreate",
     "ChapterTestRead",
+    "ChapterTestUpdate",
     "CourseBase",
     "CourseCreate",
+    "CourseLessonCreate",
     "CourseLessonRead",
+    "CourseLessonUpdate",
     "CourseReadingProgressRead",
+    "CourseReadingProgressUpdate",
+    "CourseSummary",
     "CourseUpdate",
+    "DailyChallengeCreate",
     "DailyChallengeRead",
+    "DailyChallengeUpdate",
+    "EnrollmentCreate",
     "EnrollmentRead",
+    "LessonTestCreate",
     "LessonTestRead",
+    "LessonTestUpdate",
     "RewardBatchRequest",
     "RewardProcessEvent",
+    "SponsorChannelCreate",
     "SponsorChannelRead",
+    "TestAttemptCreate",
     "TestAttemptRead",
     "TextContentRead",
+    "TransactionCreate",
     "TransactionRead",
+    "TransactionTypeTotal",
     "UserBase",
     "UserCreate",
     "UserRewardRead",
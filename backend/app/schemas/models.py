@@ -6,7 +6,7 @@ from datetime import datetime
 from decimal import Decimal
 from typing import Any, List, Optional
 
-from pydantic import Field
+from pydantic import AliasChoices, Field
 
 from app.db.models import (
     BookCategory,
@@ -72,6 +72,24 @@ class CourseBase(ORMModel):
     updated_at: datetime = Field(alias="updatedAt")
 
 
+class CourseSummary(ORMModel):
+    """Course card for list pages; the ``content`` bodies are only served by the detail endpoint."""
+
+    id: int
+    title: str
+    title_ru: str | None = Field(default=None, alias="titleRu")
+    description: str | None = None
+    description_ru: str | None = Field(default=None, alias="descriptionRu")
+    instructor: str
+    instructor_ru: str | None = Field(default=None, alias="instructorRu")
+    category: CourseCategory
+    price: Decimal = Decimal("0")
+    rating: Decimal = Decimal("0")
+    review_count: int = Field(default=0, alias="reviewCount")
+    image_url: str | None = Field(default=None, alias="imageUrl")
+    duration: int | None = None
+
+
 class CourseCreate(ORMModel):
     title: str
     title_ru: str | None = Field(default=None, alias="titleRu")
@@ -125,6 +143,22 @@ class BookBase(ORMModel):
     updated_at: datetime = Field(alias="updatedAt")
 
 
+class BookSummary(ORMModel):
+    """Book card for list pages, with the short description the cards show."""
+
+    id: int
+    title: str
+    title_ru: str | None = Field(default=None, alias="titleRu")
+    author: str
+    author_ru: str | None = Field(default=None, alias="authorRu")
+    description: str | None = None
+    description_ru: str | None = Field(default=None, alias="descriptionRu")
+    category: BookCategory
+    price: Decimal = Decimal("0")
+    cover_image_url: str | None = Field(default=None, alias="coverImageUrl")
+    page_count: int | None = Field(default=None, alias="pageCount")
+
+
 class BookCreate(ORMModel):
     title: str
     title_ru: str | None = Field(default=None, alias="titleRu")
@@ -187,10 +221,17 @@ class TransactionRead(ORMModel):
     type: TransactionType
     amount: Decimal
     description: str
-    metadata: dict[str, Any] | None = None
+    # ORM rows carry the column as ``metadata_`` (``metadata`` is reserved there).
+    metadata: dict[str, Any] | None = Field(default=None, validation_alias=AliasChoices("metadata_", "metadata"))
     created_at: datetime = Field(alias="createdAt")
 
 
+class TransactionTypeTotal(ORMModel):
+    type: TransactionType
+    count: int
+    total: Decimal
+
+
 class TransactionCreate(ORMModel):
     user_id: str = Field(alias="userId")
     type: TransactionType
@@ -453,7 +494,7 @@ class UserRewardRead(ORMModel):
     action_id: str = Field(alias="actionId")
     mind_amount: int = Field(alias="mindAmount")
     idempotency_key: str = Field(alias="idempotencyKey")
-    metadata: dict[str, Any] | None = None
+    metadata: dict[str, Any] | None = Field(default=None, validation_alias=AliasChoices("metadata_", "metadata"))
     timestamp: datetime
     created_at: datetime = Field(alias="createdAt")
 
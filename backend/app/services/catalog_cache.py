@@ -0,0 +1,210 @@
+"""Versioned in-process cache for catalog reads (courses, books, lessons, chapters).
+
+The catalog only changes through admin writes, so listings are cached per worker
+and the whole cache is dropped whenever a transaction that touched the catalog
+commits. With ``settings.catalog_cache_notify`` the commit also sends a Postgres
+``NOTIFY`` (delivered only if the transaction commits) that every other worker
+listens for, so all workers drop their copies within milliseconds.
+
+Besides ORM rows (stored as detached snapshots) the cache also holds pre-encoded
+HTTP responses for the catalog endpoints. Everything in it is shared between
+requests: treat cached values as read-only.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "catalog_changed"
+_DIRTY_KEY = "catalog_dirty"
+_NOTIFIED_KEY = "catalog_notified"
+
+CATALOG_CACHE_REQUESTS = REGISTRY.counter(
+    "catalog_cache_requests_total", "Catalog cache lookups by result.", ("result",)
+)
+
+
+def snapshot(instance: Any) -> Any:
+    """Detached copy of an ORM row holding only its loaded column values."""
+    state = inspect(instance)
+    copy = state.mapper.class_manager.new_instance()
+    loaded = state.dict
+    for attr in state.mapper.column_attrs:
+        if attr.key in loaded:
+            setattr(copy, attr.key, loaded[attr.key])
+    return copy
+
+
+class CatalogCache:
+    """LRU + TTL cache whose entries are valid only for the version they were loaded at."""
+
+    def __init__(self, max_entries: int, ttl: float, replica_lag: float = 0.0) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Reads right after a change may come from a lagging replica; such entries
+        # are only trusted until the replica has had time to catch up.
+        self.replica_lag = replica_lag
+        self.version = 0
+        self.changed_at = float("-inf")
+        self.token = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            CATALOG_CACHE_REQUESTS.inc("miss")
+            return None
+        self._entries.move_to_end(key)
+        CATALOG_CACHE_REQUESTS.inc("hit")
+        return entry[1]
+
+    def put(self, key: Hashable, version: int, value: Any) -> Any:
+        """Cache ``value`` computed from the catalog at ``version`` and return it."""
+        if version != self.version:
+            # The catalog changed while this was computed; it may predate the change.
+            return value
+        now = time.monotonic()
+        expires = now + self.ttl
+        if now - self.changed_at < self.replica_lag:
+            expires = min(expires, self.changed_at + self.replica_lag)
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self) -> None:
+        self.version += 1
+        self.changed_at = time.monotonic()
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {"version": self.version, "entries": len(self._entries)}
+
+
+_catalog_cache: CatalogCache | None = None
+
+
+def get_catalog_cache() -> CatalogCache:
+    global _catalog_cache
+    if _catalog_cache is None:
+        _catalog_cache = CatalogCache(
+            settings.catalog_cache_size,
+            settings.catalog_cache_ttl,
+            settings.db_replica_max_lag if settings.database_read_url else 0.0,
+        )
+    return _catalog_cache
+
+
+def session_changed_catalog(session: AsyncSession | None) -> bool:
+    return session is not None and bool(session.sync_session.info.get(_DIRTY_KEY))
+
+
+async def mark_catalog_changed(session: AsyncSession) -> None:
+    """Invalidate the catalog cache once ``session``'s transaction commits."""
+    info = session.sync_session.info
+    info[_DIRTY_KEY] = True
+    if settings.catalog_cache_notify and not info.get(_NOTIFIED_KEY):
+        info[_NOTIFIED_KEY] = True
+        # NOTIFY is transactional: other workers only hear about committed changes.
+        await session.execute(
+            text("SELECT pg_notify(:channel, :token)"),
+            {"channel": NOTIFY_CHANNEL, "token": get_catalog_cache().token},
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    session.info.pop(_NOTIFIED_KEY, None)
+    if session.info.pop(_DIRTY_KEY, False):
+        get_catalog_cache().invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_NOTIFIED_KEY, None)
+    session.info.pop(_DIRTY_KEY, None)
+
+
+class CatalogChangeListener:
+    """Hold a dedicated connection that ``LISTEN``s for catalog changes from other workers.
+
+    Needs a session-level connection: it does not work through PgBouncer in
+    transaction pooling mode.
+    """
+
+    def __init__(self, engine: AsyncEngine, cache: CatalogCache) -> None:
+        self.engine = engine
+        self.cache = cache
+        self._connection: AsyncConnection | None = None
+        self._driver_connection: Any = None
+
+    def _on_notify(self, connection: Any, pid: int, channel: str, payload: str) -> None:
+        if payload != self.cache.token:
+            self.cache.invalidate()
+
+    def _on_terminate(self, connection: Any) -> None:
+        # Notifications sent while disconnected are lost, so assume the worst.
+        logger.warning("Catalog change listener connection lost; other workers' changes now wait for the TTL")
+        self.cache.invalidate()
+        self._driver_connection = None
+
+    async def start(self) -> None:
+        self._connection = await self.engine.connect()
+        raw = await self._connection.get_raw_connection()
+        self._driver_connection = raw.driver_connection
+        await self._driver_connection.add_listener(NOTIFY_CHANNEL, self._on_notify)
+        self._driver_connection.add_termination_listener(self._on_terminate)
+        logger.info("Listening for catalog changes on %s", NOTIFY_CHANNEL)
+
+    async def stop(self) -> None:
+        if self._driver_connection is not None:
+            self._driver_connection.remove_termination_listener(self._on_terminate)
+            with contextlib.suppress(Exception):  # the connection is discarded anyway
+                await asyncio.wait_for(self._driver_connection.remove_listener(NOTIFY_CHANNEL, self._on_notify), 5)
+        if self._connection is not None:
+            # Never hand a LISTENing connection back to the pool.
+            await self._connection.invalidate()
+            await self._connection.close()
+        self._connection = None
+        self._driver_connection = None
+
+
+_listener: CatalogChangeListener | None = None
+
+
+async def start_catalog_listener(engine: AsyncEngine) -> None:
+    global _listener
+    if not settings.catalog_cache_notify or _listener is not None:
+        return
+    _listener = CatalogChangeListener(engine, get_catalog_cache())
+    await _listener.start()
+
+
+async def stop_catalog_listener() -> None:
+    global _listener
+    if _listener is not None:
+        await _listener.stop()
+        _listener = None
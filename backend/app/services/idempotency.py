@@ -0,0 +1,175 @@
+"""Per-process idempotency filter placed in front of ``user_rewards`` lookups."""
+
+from __future__ import annotations
+
+import enum
+import hashlib
+import logging
+import math
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import UserReward
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "idempotency_pending"
+
+
+class Verdict(enum.Enum):
+    DUPLICATE = "duplicate"  # seen recently: skip without touching the DB
+    NEW = "new"  # not in the Bloom filter: skip the lookup, the unique constraint arbitrates
+    UNKNOWN = "unknown"  # ask the database
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing of a blake2b digest."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class IdempotencyFilter:
+    """Bounded LRU of committed idempotency keys plus an optional Bloom filter.
+
+    Only keys known to be committed are remembered, so a rolled-back request can be
+    retried. A Bloom "new" verdict is a hint rather than a guarantee (other workers
+    write keys this process never sees); callers must still insert with
+    ``ON CONFLICT DO NOTHING`` and treat a conflict as a duplicate.
+    """
+
+    def __init__(self, max_keys: int, bloom_capacity: int = 0, bloom_error_rate: float = 0.001) -> None:
+        self.max_keys = max_keys
+        self._recent: OrderedDict[str, None] = OrderedDict()
+        self.bloom = BloomFilter(bloom_capacity, bloom_error_rate) if bloom_capacity > 0 else None
+        self.bloom_ready = False
+        self.hits = 0
+        self.misses = 0
+        self.false_positives = 0
+
+    def check(self, key: str) -> Verdict:
+        if key in self._recent:
+            self._recent.move_to_end(key)
+            self.hits += 1
+            return Verdict.DUPLICATE
+        if self.bloom is not None and self.bloom_ready and key not in self.bloom:
+            self.misses += 1
+            return Verdict.NEW
+        return Verdict.UNKNOWN
+
+    def resolve(self, session: AsyncSession | None, key: str, exists: bool) -> None:
+        """Feed back the result of a database lookup for an ``UNKNOWN`` key.
+
+        The row found may be the session's own uncommitted insert (the same key
+        twice in one batch), so it is only remembered once the session commits.
+        """
+        if exists:
+            self.remember_on_commit(session, key)
+            return
+        self.misses += 1
+        if self.bloom is not None and self.bloom_ready:
+            self.false_positives += 1
+
+    def remember(self, key: str) -> None:
+        """Record a key that is known to be committed."""
+        self._recent[key] = None
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.max_keys:
+            self._recent.popitem(last=False)
+        if self.bloom is not None:
+            self.bloom.add(key)
+
+    def remember_on_commit(self, session: AsyncSession | None, key: str) -> None:
+        """Remember ``key`` once the session's transaction commits; forget it on rollback."""
+        if session is None:
+            # Storage without a session (the in-memory backend) writes immediately.
+            self.remember(key)
+            return
+        pending = session.sync_session.info.setdefault(_PENDING_KEY, [])
+        pending.append((self, key))
+
+    async def warm(self, session: AsyncSession, window: timedelta, batch_size: int = 10_000) -> int:
+        """Load keys of rewards recorded within ``window`` into the Bloom filter."""
+        if self.bloom is None:
+            return 0
+        since = datetime.utcnow() - window
+        stmt = (
+            select(UserReward.idempotency_key)
+            .where(UserReward.timestamp >= since)
+            .limit(self.bloom.capacity)
+            .execution_options(yield_per=batch_size)
+        )
+        loaded = 0
+        result = await session.stream_scalars(stmt)
+        async for key in result:
+            self.bloom.add(key)
+            loaded += 1
+        self.bloom_ready = True
+        return loaded
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "false_positives": self.false_positives,
+            "cached_keys": len(self._recent),
+            "bloom_keys": self.bloom.count if self.bloom is not None else 0,
+        }
+
+
+@event.listens_for(Session, "after_commit")
+def _flush_pending_keys(session: Session) -> None:
+    for idempotency_filter, key in session.info.pop(_PENDING_KEY, ()):
+        idempotency_filter.remember(key)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_keys(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+_idempotency_filter: IdempotencyFilter | None = None
+
+
+def get_idempotency_filter() -> IdempotencyFilter:
+    global _idempotency_filter
+    if _idempotency_filter is None:
+        _idempotency_filter = IdempotencyFilter(
+            settings.idempotency_cache_size,
+            settings.idempotency_bloom_capacity,
+            settings.idempotency_bloom_error_rate,
+        )
+    return _idempotency_filter
+
+
+async def warm_idempotency_filter(session: AsyncSession) -> None:
+    idempotency_filter = get_idempotency_filter()
+    if idempotency_filter.bloom is None:
+        return
+    loaded = await idempotency_filter.warm(session, timedelta(days=settings.idempotency_warm_days))
+    logger.info("Idempotency Bloom filter warmed with %s keys", loaded)
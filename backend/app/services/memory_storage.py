@@ -0,0 +1,802 @@
+"""Dict-backed ``StorageService`` for load tests, replays and DB-free benchmarks."""
+
+from __future__ import annotations
+
+import itertools
+from collections import defaultdict
+from datetime import date as date_type, datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, AsyncIterator, Iterable, Mapping, Sequence, TypeVar
+
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.exc import NoResultFound
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import TextClause
+
+from app.core.config import settings
+from app.core.exceptions import InsufficientBalanceError
+from app.db.models import (
+    Book,
+    BookCategory,
+    BookChapter,
+    BookPurchase,
+    BookReadingProgress,
+    ChannelSubscription,
+    ChapterTest,
+    Course,
+    CourseCategory,
+    CourseLesson,
+    CourseReadingProgress,
+    DailyChallenge,
+    Enrollment,
+    LessonTest,
+    RewardOutbox,
+    SponsorChannel,
+    TestAttempt,
+    TextContent,
+    Transaction,
+    TransactionType,
+    User,
+    UserDailyCounter,
+    UserReward,
+)
+from app.services.catalog_cache import get_catalog_cache
+from app.services.storage_service import (
+    DAILY_COUNTER_COLUMNS,
+    OUTBOX_FAILED,
+    OUTBOX_PENDING,
+    StorageService,
+)
+
+ModelT = TypeVar("ModelT")
+
+_CENT = Decimal("0.01")
+
+
+def _server_default(column: Any) -> Any:
+    default = column.server_default
+    if default is None:
+        return None
+    arg = default.arg
+    if not isinstance(arg, (TextClause, str)):
+        return datetime.utcnow()  # func.now()
+    raw = arg.text if isinstance(arg, TextClause) else arg
+    if raw in ("true", "false"):
+        return raw == "true"
+    if raw.startswith("'"):
+        return raw.strip("'")
+    python_type = column.type.python_type
+    return Decimal(raw) if python_type is Decimal else python_type(raw)
+
+
+class MemoryStore:
+    """Process-wide tables of transient model instances keyed by primary key."""
+
+    def __init__(self) -> None:
+        self.tables: dict[type, dict[Any, Any]] = defaultdict(dict)
+        self._sequences: dict[type, itertools.count] = defaultdict(lambda: itertools.count(1))
+        self.reward_keys: dict[str, UserReward] = {}
+        self.daily_counters: dict[tuple[str, str], UserDailyCounter] = {}
+        self.emission: dict[tuple[date_type, str], list[int]] = defaultdict(lambda: [0, 0])
+
+    def build(self, model: type[ModelT], data: Mapping[str, Any]) -> ModelT:
+        """Instantiate ``model`` from column names or attribute keys, applying server defaults.
+
+        Any other key raises ``TypeError``, as the Postgres backend's inserts do.
+        """
+        instance = model()
+        mapper = sa_inspect(model)
+        known = {name for prop in mapper.column_attrs for name in (prop.key, prop.columns[0].name)}
+        for key in data:
+            if key not in known:
+                raise TypeError(f"{key!r} is an invalid keyword argument for {model.__name__}")
+        for prop in mapper.column_attrs:
+            column = prop.columns[0]
+            if prop.key in data:
+                value = data[prop.key]
+            elif column.name in data:
+                value = data[column.name]
+            else:
+                value = None
+            if value is None:
+                value = _server_default(column)
+            setattr(instance, prop.key, value)
+        return instance
+
+    def insert(self, model: type[ModelT], data: Mapping[str, Any]) -> ModelT:
+        instance = self.build(model, data)
+        if getattr(instance, "id", None) is None:
+            instance.id = next(self._sequences[model])
+        self.tables[model][instance.id] = instance
+        return instance
+
+    def rows(self, model: type[ModelT]) -> list[ModelT]:
+        return list(self.tables[model].values())
+
+    def get(self, model: type[ModelT], key: Any) -> ModelT | None:
+        return self.tables[model].get(key)
+
+    def delete(self, model: type, key: Any) -> None:
+        self.tables[model].pop(key, None)
+
+
+def _apply(instance: Any, data: Mapping[str, Any]) -> None:
+    for key, value in data.items():
+        if hasattr(instance, key) and value is not None:
+            setattr(instance, key, value)
+
+
+class InMemoryStorageService(StorageService):
+    """``StorageService`` with the same method surface backed by a ``MemoryStore``.
+
+    Writes are applied immediately and never roll back, so where Postgres would
+    roll a reward batch back on a foreign key violation, the users are checked
+    before anything is written instead (``lock_users``, which both engine paths
+    call first). None of the methods await anything, so a reward batch runs without
+    yielding to the event loop and per-user locking is unnecessary within the
+    process. ``session`` is always ``None``.
+    """
+
+    def __init__(self, store: MemoryStore) -> None:
+        self.store = store
+        self.session = None  # type: ignore[assignment]
+
+    def _require(self, model: type[ModelT], key: Any, label: str) -> ModelT:
+        instance = self.store.get(model, key)
+        if instance is None:
+            raise NoResultFound(f"{label} {key} not found")
+        return instance
+
+    def _update(self, model: type[ModelT], key: Any, label: str, data: dict) -> ModelT:
+        instance = self._require(model, key, label)
+        _apply(instance, data)
+        if hasattr(instance, "updated_at"):
+            instance.updated_at = datetime.utcnow()
+        return instance
+
+    # ------------------------------------------------------------------
+    # Users
+    # ------------------------------------------------------------------
+    async def get_user(self, user_id: str) -> User | None:
+        return self.store.get(User, user_id)
+
+    async def update_user_steps(self, user_id: str, steps: int) -> None:
+        self._require(User, user_id, "User").daily_steps = steps
+
+    async def generate_referral_code(self, user_id: str) -> str:
+        code = f"USER{user_id[-4:]}{datetime.utcnow().strftime('%H%M')}"
+        self._require(User, user_id, "User").referral_code = code
+        return code
+
+    async def upsert_user(self, data: dict) -> User:
+        user = self.store.get(User, data["id"])
+        if user:
+            for key, value in data.items():
+                if key != "id" and hasattr(user, key) and value is not None:
+                    setattr(user, key, value)
+            return user
+        return self.store.insert(User, data)
+
+    async def update_user_tokens(self, user_id: str, delta: str | Decimal | float | int) -> None:
+        await self.adjust_balance(user_id, delta)
+
+    async def adjust_balance(
+        self,
+        user_id: str,
+        delta: str | Decimal | float | int,
+        *,
+        non_negative: bool = False,
+    ) -> Decimal:
+        user = self._require(User, user_id, "User")
+        balance = (Decimal(user.token_balance) + Decimal(str(delta))).quantize(_CENT, rounding=ROUND_HALF_UP)
+        if non_negative and balance < 0:
+            raise InsufficientBalanceError(f"User {user_id} has insufficient balance")
+        user.token_balance = balance
+        return balance
+
+    async def adjust_balances(self, deltas: Mapping[str, Decimal]) -> dict[str, Decimal]:
+        balances = {}
+        for user_id, delta in deltas.items():
+            if self.store.get(User, user_id) is not None:
+                balances[user_id] = await self.adjust_balance(user_id, delta)
+        return balances
+
+    # ------------------------------------------------------------------
+    # Courses
+    # ------------------------------------------------------------------
+    async def get_courses(
+        self,
+        category: CourseCategory | None = None,
+        only_visible: bool = True,
+        columns: Sequence[str] | None = None,
+    ) -> Sequence[Course]:
+        courses = self.store.rows(Course)
+        if category and category != "all":
+            courses = [course for course in courses if course.category == category]
+        if only_visible:
+            courses = [course for course in courses if course.is_active and course.is_visible]
+        return sorted(courses, key=lambda course: course.id)
+
+    async def get_course(self, course_id: int) -> Course | None:
+        return self.store.get(Course, course_id)
+
+    async def update_course(self, course_id: int, data: dict) -> Course:
+        get_catalog_cache().invalidate()
+        return self._update(Course, course_id, "Course", data)
+
+    async def create_course(self, data: dict) -> Course:
+        get_catalog_cache().invalidate()
+        return self.store.insert(Course, data)
+
+    async def delete_course(self, course_id: int, *, permanent: bool = False) -> None:
+        get_catalog_cache().invalidate()
+        course = self._require(Course, course_id, "Course")
+        if permanent:
+            self.store.delete(Course, course_id)
+        else:
+            course.is_active = False
+
+    async def update_course_visibility(self, course_id: int, is_visible: bool) -> None:
+        get_catalog_cache().invalidate()
+        self._update(Course, course_id, "Course", {"is_visible": is_visible})
+
+    # ------------------------------------------------------------------
+    # Lessons
+    # ------------------------------------------------------------------
+    async def get_course_lessons(self, course_id: int) -> Sequence[CourseLesson]:
+        lessons = [lesson for lesson in self.store.rows(CourseLesson) if lesson.course_id == course_id]
+        return sorted(lessons, key=lambda lesson: lesson.order_index)
+
+    async def create_course_lesson(self, data: dict) -> CourseLesson:
+        get_catalog_cache().invalidate()
+        return self.store.insert(CourseLesson, data)
+
+    async def update_course_lesson(self, lesson_id: int, data: dict) -> CourseLesson:
+        get_catalog_cache().invalidate()
+        return self._update(CourseLesson, lesson_id, "Course lesson", data)
+
+    async def delete_course_lesson(self, lesson_id: int) -> None:
+        get_catalog_cache().invalidate()
+        self._require(CourseLesson, lesson_id, "Course lesson")
+        self.store.delete(CourseLesson, lesson_id)
+
+    async def generate_course_lessons(self, course_id: int, number_of_lessons: int) -> Sequence[CourseLesson]:
+        get_catalog_cache().invalidate()
+        for lesson in await self.get_course_lessons(course_id):
+            self.store.delete(CourseLesson, lesson.id)
+        return [
+            self.store.insert(
+                CourseLesson,
+                {
+                    "course_id": course_id,
+                    "title": f"Lesson {i}",
+                    "title_ru": f"Урок {i}",
+                    "description": f"Description for Lesson {i}...",
+                    "description_ru": f"Описание для урока {i}...",
+                    "content": f"Content for Lesson {i}...",
+                    "content_ru": f"Содержание для урока {i}...",
+                    "duration": 10,
+                    "order_index": i,
+                },
+            )
+            for i in range(1, number_of_lessons + 1)
+        ]
+
+    # ------------------------------------------------------------------
+    # Books
+    # ------------------------------------------------------------------
+    async def get_books(
+        self,
+        category: BookCategory | None = None,
+        search: str | None = None,
+        only_visible: bool = True,
+        columns: Sequence[str] | None = None,
+    ) -> Sequence[Book]:
+        books = self.store.rows(Book)
+        if category and category != "all":
+            books = [book for book in books if book.category == category]
+        if search:
+            needle = search.lower()
+            books = [book for book in books if needle in (book.title or "").lower()]
+        if only_visible:
+            books = [book for book in books if book.is_active and book.is_visible]
+        return sorted(books, key=lambda book: book.id)
+
+    async def get_book(self, book_id: int) -> Book | None:
+        return self.store.get(Book, book_id)
+
+    async def update_book(self, book_id: int, data: dict) -> Book:
+        get_catalog_cache().invalidate()
+        return self._update(Book, book_id, "Book", data)
+
+    async def create_book(self, data: dict) -> Book:
+        get_catalog_cache().invalidate()
+        return self.store.insert(Book, data)
+
+    async def delete_book(self, book_id: int, *, permanent: bool = False) -> None:
+        get_catalog_cache().invalidate()
+        book = self._require(Book, book_id, "Book")
+        if permanent:
+            self.store.delete(Book, book_id)
+        else:
+            book.is_active = False
+
+    async def update_book_visibility(self, book_id: int, is_visible: bool) -> None:
+        get_catalog_cache().invalidate()
+        self._update(Book, book_id, "Book", {"is_visible": is_visible})
+
+    # ------------------------------------------------------------------
+    # Chapters
+    # ------------------------------------------------------------------
+    async def get_book_chapters(self, book_id: int) -> Sequence[BookChapter]:
+        chapters = [chapter for chapter in self.store.rows(BookChapter) if chapter.book_id == book_id]
+        return sorted(chapters, key=lambda chapter: chapter.order_index)
+
+    async def create_book_chapter(self, data: dict) -> BookChapter:
+        get_catalog_cache().invalidate()
+        return self.store.insert(BookChapter, data)
+
+    async def update_book_chapter(self, chapter_id: int, data: dict) -> BookChapter:
+        get_catalog_cache().invalidate()
+        return self._update(BookChapter, chapter_id, "Book chapter", data)
+
+    async def delete_book_chapter(self, chapter_id: int) -> None:
+        get_catalog_cache().invalidate()
+        self._require(BookChapter, chapter_id, "Book chapter")
+        self.store.delete(BookChapter, chapter_id)
+
+    async def generate_book_chapters(self, book_id: int, number_of_chapters: int) -> Sequence[BookChapter]:
+        get_catalog_cache().invalidate()
+        for chapter in await self.get_book_chapters(book_id):
+            self.store.delete(BookChapter, chapter.id)
+        return [
+            self.store.insert(
+                BookChapter,
+                {
+                    "book_id": book_id,
+                    "title": f"Chapter {i}",
+                    "title_ru": f"Глава {i}",
+                    "content": f"Content for Chapter {i}...",
+                    "content_ru": f"Содержание для главы {i}...",
+                    "order_index": i,
+                },
+            )
+            for i in range(1, number_of_chapters + 1)
+        ]
+
+    # ------------------------------------------------------------------
+    # Enrollments & Purchases
+    # ------------------------------------------------------------------
+    async def enroll_user(self, data: dict) -> Enrollment:
+        self._require(User, data["user_id"], "User")
+        self._require(Course, data["course_id"], "Course")
+        for enrollment in self.store.rows(Enrollment):
+            if enrollment.user_id == data["user_id"] and enrollment.course_id == data["course_id"]:
+                raise ValueError("User is already enrolled in this course")
+        return self.store.insert(Enrollment, data)
+
+    async def get_user_enrollments(self, user_id: str) -> Sequence[Enrollment]:
+        enrollments = [item for item in self.store.rows(Enrollment) if item.user_id == user_id]
+        return sorted(enrollments, key=lambda item: item.enrolled_at, reverse=True)
+
+    async def update_enrollment_progress(self, enrollment_id: int, progress: int) -> None:
+        enrollment = self._require(Enrollment, enrollment_id, "Enrollment")
+        enrollment.progress = progress
+        enrollment.completed_at = datetime.utcnow() if progress == 100 else None
+
+    async def purchase_book(self, data: dict) -> BookPurchase:
+        self._require(User, data["user_id"], "User")
+        book = self._require(Book, data["book_id"], "Book")
+        for purchase in self.store.rows(BookPurchase):
+            if purchase.user_id == data["user_id"] and purchase.book_id == data["book_id"]:
+                raise ValueError("User has already purchased this book")
+        price = Decimal(book.price or 0)
+        if price:
+            # Nothing to roll back here, so debit before recording anything.
+            await self.adjust_balance(data["user_id"], -price, non_negative=True)
+            self.store.insert(
+                Transaction,
+                {
+                    "user_id": data["user_id"],
+                    "type": TransactionType.PURCHASE,
+                    "amount": -price,
+                    "description": f"Purchased book: {book.title}",
+                },
+            )
+        return self.store.insert(BookPurchase, data)
+
+    async def get_user_books(self, user_id: str) -> Sequence[BookPurchase]:
+        purchases = [item for item in self.store.rows(BookPurchase) if item.user_id == user_id]
+        return sorted(purchases, key=lambda item: item.purchased_at, reverse=True)
+
+    # ------------------------------------------------------------------
+    # Transactions
+    # ------------------------------------------------------------------
+    async def create_transaction(self, data: dict) -> Transaction:
+        return self.store.insert(Transaction, data)
+
+    async def get_user_transactions(
+        self,
+        user_id: str,
+        limit: int | None = None,
+        before: tuple[datetime, int] | None = None,
+    ) -> Sequence[Transaction]:
+        transactions = [item for item in self.store.rows(Transaction) if item.user_id == user_id]
+        if before is not None:
+            transactions = [item for item in transactions if (item.created_at, item.id) < before]
+        transactions.sort(key=lambda item: (item.created_at, item.id), reverse=True)
+        return transactions[:limit] if limit else transactions
+
+    async def get_transaction_totals(self, user_id: str) -> Sequence[tuple[TransactionType, int, Decimal]]:
+        counts: dict[TransactionType, int] = defaultdict(int)
+        totals: dict[TransactionType, Decimal] = defaultdict(Decimal)
+        for item in self.store.rows(Transaction):
+            if item.user_id == user_id:
+                kind = TransactionType(item.type)
+                counts[kind] += 1
+                totals[kind] += Decimal(item.amount)
+        # Enum declaration order, as Postgres sorts enum values.
+        return [(kind, counts[kind], totals[kind]) for kind in TransactionType if kind in counts]
+
+    # ------------------------------------------------------------------
+    # Sponsor channels & subscriptions
+    # ------------------------------------------------------------------
+    async def get_sponsor_channels(self) -> Sequence[SponsorChannel]:
+        return [channel for channel in self.store.rows(SponsorChannel) if channel.is_active]
+
+    async def create_sponsor_channel(self, data: dict) -> SponsorChannel:
+        return self.store.insert(SponsorChannel, data)
+
+    async def subscribe_to_channel(self, data: dict) -> ChannelSubscription:
+        return self.store.insert(ChannelSubscription, data)
+
+    async def get_user_subscriptions(self, user_id: str) -> Sequence[ChannelSubscription]:
+        return [item for item in self.store.rows(ChannelSubscription) if item.user_id == user_id]
+
+    async def verify_subscription(self, subscription_id: int) -> None:
+        self._require(ChannelSubscription, subscription_id, "Subscription").verified = True
+
+    # ------------------------------------------------------------------
+    # Daily challenges
+    # ------------------------------------------------------------------
+    async def get_today_challenge(self, user_id: str) -> DailyChallenge | None:
+        today = datetime.utcnow().date().isoformat()
+        for challenge in self.store.rows(DailyChallenge):
+            if challenge.user_id == user_id and challenge.date == today:
+                return challenge
+        return None
+
+    async def create_daily_challenge(self, data: dict) -> DailyChallenge:
+        return self.store.insert(DailyChallenge, data)
+
+    async def update_daily_challenge(self, challenge_id: int, data: dict) -> None:
+        _apply(self._require(DailyChallenge, challenge_id, "Daily challenge"), data)
+
+    # ------------------------------------------------------------------
+    # Reading progress
+    # ------------------------------------------------------------------
+    async def get_book_reading_progress(self, user_id: str, book_id: int) -> BookReadingProgress | None:
+        for progress in self.store.rows(BookReadingProgress):
+            if progress.user_id == user_id and progress.book_id == book_id:
+                return progress
+        return None
+
+    async def upsert_book_progress(self, user_id: str, book_id: int, current_chapter: int) -> BookReadingProgress:
+        progress = await self.get_book_reading_progress(user_id, book_id)
+        if progress:
+            progress.current_chapter = current_chapter
+            progress.updated_at = datetime.utcnow()
+            return progress
+        return self.store.insert(
+            BookReadingProgress,
+            {
+                "user_id": user_id,
+                "book_id": book_id,
+                "current_chapter": current_chapter,
+                "total_chapters": len(await self.get_book_chapters(book_id)),
+            },
+        )
+
+    async def complete_book_reading(self, user_id: str, book_id: int) -> None:
+        progress = await self.get_book_reading_progress(user_id, book_id)
+        if not progress:
+            progress = await self.upsert_book_progress(user_id, book_id, current_chapter=1)
+        progress.is_completed = True
+        progress.completed_at = datetime.utcnow()
+        progress.reward_claimed = True
+
+    async def get_all_book_progress(self, user_id: str) -> Sequence[BookReadingProgress]:
+        return [item for item in self.store.rows(BookReadingProgress) if item.user_id == user_id]
+
+    async def get_course_reading_progress(self, user_id: str, course_id: int) -> CourseReadingProgress | None:
+        for progress in self.store.rows(CourseReadingProgress):
+            if progress.user_id == user_id and progress.course_id == course_id:
+                return progress
+        return None
+
+    async def upsert_course_progress(self, user_id: str, course_id: int, current_lesson: int) -> CourseReadingProgress:
+        progress = await self.get_course_reading_progress(user_id, course_id)
+        if progress:
+            progress.current_lesson = current_lesson
+            progress.updated_at = datetime.utcnow()
+            return progress
+        return self.store.insert(
+            CourseReadingProgress,
+            {
+                "user_id": user_id,
+                "course_id": course_id,
+                "current_lesson": current_lesson,
+                "total_lessons": len(await self.get_course_lessons(course_id)),
+            },
+        )
+
+    async def complete_course_reading(self, user_id: str, course_id: int) -> None:
+        progress = await self.get_course_reading_progress(user_id, course_id)
+        if not progress:
+            progress = await self.upsert_course_progress(user_id, course_id, current_lesson=1)
+        progress.is_completed = True
+        progress.completed_at = datetime.utcnow()
+        progress.reward_claimed = True
+
+    # ------------------------------------------------------------------
+    # Tests
+    # ------------------------------------------------------------------
+    async def get_chapter_tests(self, chapter_id: int) -> Sequence[ChapterTest]:
+        return [test for test in self.store.rows(ChapterTest) if test.chapter_id == chapter_id]
+
+    async def create_chapter_test(self, data: dict) -> ChapterTest:
+        return self.store.insert(ChapterTest, data)
+
+    async def update_chapter_test(self, test_id: int, data: dict) -> ChapterTest:
+        return self._update(ChapterTest, test_id, "Chapter test", data)
+
+    async def delete_chapter_test(self, test_id: int) -> None:
+        self._require(ChapterTest, test_id, "Chapter test")
+        self.store.delete(ChapterTest, test_id)
+        self._delete_attempts("chapter", test_id)
+
+    async def get_lesson_tests(self, lesson_id: int) -> Sequence[LessonTest]:
+        return [test for test in self.store.rows(LessonTest) if test.lesson_id == lesson_id]
+
+    async def create_lesson_test(self, data: dict) -> LessonTest:
+        return self.store.insert(LessonTest, data)
+
+    async def update_lesson_test(self, test_id: int, data: dict) -> LessonTest:
+        return self._update(LessonTest, test_id, "Lesson test", data)
+
+    async def delete_lesson_test(self, test_id: int) -> None:
+        self._require(LessonTest, test_id, "Lesson test")
+        self.store.delete(LessonTest, test_id)
+        self._delete_attempts("lesson", test_id)
+
+    def _delete_attempts(self, test_type: str, test_id: int) -> None:
+        """Drop a deleted test's attempts, as the ORM cascade on ``attempts`` does."""
+        for attempt in self.store.rows(TestAttempt):
+            if attempt.test_type == test_type and attempt.test_id == test_id:
+                self.store.delete(TestAttempt, attempt.id)
+
+    async def submit_test_attempt(self, data: dict) -> TestAttempt:
+        return self.store.insert(TestAttempt, data)
+
+    async def get_user_test_attempts(self, user_id: str, test_type: str, test_id: int) -> Sequence[TestAttempt]:
+        attempts = [
+            attempt
+            for attempt in self.store.rows(TestAttempt)
+            if attempt.user_id == user_id and attempt.test_type == test_type and attempt.test_id == test_id
+        ]
+        return sorted(attempts, key=lambda attempt: (attempt.attempted_at, attempt.id), reverse=True)
+
+    # ------------------------------------------------------------------
+    # Admin stats
+    # ------------------------------------------------------------------
+    async def get_admin_stats(self) -> dict[str, int | str]:
+        users = self.store.rows(User)
+        return {
+            "totalUsers": len(users),
+            "activeCourses": sum(1 for course in self.store.rows(Course) if course.is_active),
+            "totalBooks": sum(1 for book in self.store.rows(Book) if book.is_active),
+            "tokensDistributed": str(sum((Decimal(user.token_balance) for user in users), Decimal(0))),
+        }
+
+    async def get_all_courses_admin(self) -> Sequence[Course]:
+        return sorted(self.store.rows(Course), key=lambda course: course.id)
+
+    async def get_all_books_admin(self) -> Sequence[Book]:
+        return sorted(self.store.rows(Book), key=lambda book: book.id)
+
+    def _users_newest_first(self) -> list[User]:
+        return sorted(self.store.rows(User), key=lambda user: (user.created_at, user.id), reverse=True)
+
+    async def get_users_page(self, limit: int, after: tuple[datetime, str] | None = None) -> Sequence[User]:
+        users = self._users_newest_first()
+        if after is not None:
+            users = [user for user in users if (user.created_at, user.id) < after]
+        return users[:limit]
+
+    async def stream_users(self, batch_size: int = 1000) -> AsyncIterator[Sequence[User]]:
+        users = self._users_newest_first()
+        for start in range(0, len(users), batch_size):
+            yield users[start : start + batch_size]
+
+    # ------------------------------------------------------------------
+    # Text content
+    # ------------------------------------------------------------------
+    async def get_all_text_content(self) -> Sequence[TextContent]:
+        return sorted(self.store.rows(TextContent), key=lambda item: (item.category, item.key))
+
+    async def get_text_content_by_key(self, key: str) -> TextContent | None:
+        for content in self.store.rows(TextContent):
+            if content.key == key:
+                return content
+        return None
+
+    async def get_text_content_by_category(self, category: str) -> Sequence[TextContent]:
+        return [item for item in self.store.rows(TextContent) if item.category == category]
+
+    async def create_text_content(self, data: dict) -> TextContent:
+        return self.store.insert(TextContent, data)
+
+    async def update_text_content(self, content_id: int, data: dict) -> TextContent:
+        return self._update(TextContent, content_id, "Text content", data)
+
+    async def delete_text_content(self, content_id: int) -> None:
+        self._require(TextContent, content_id, "Text content")
+        self.store.delete(TextContent, content_id)
+
+    # ------------------------------------------------------------------
+    # Rewards (basic helpers)
+    # ------------------------------------------------------------------
+    async def get_daily_counter(self, user_id: str, date: str) -> UserDailyCounter:
+        counter = self.store.daily_counters.get((user_id, date))
+        if counter is None:
+            counter = self.store.insert(UserDailyCounter, {"user_id": user_id, "date": date})
+            self.store.daily_counters[(user_id, date)] = counter
+        return counter
+
+    async def count_daily_counters(self) -> int:
+        return len(self.store.daily_counters)
+
+    async def record_reward(self, data: dict) -> UserReward | None:
+        if data["idempotency_key"] in self.store.reward_keys:
+            return None
+        self._require(User, data["user_id"], "User")
+        reward = self.store.insert(UserReward, data)
+        self.store.reward_keys[reward.idempotency_key] = reward
+        return reward
+
+    async def reward_exists(self, idempotency_key: str) -> bool:
+        return idempotency_key in self.store.reward_keys
+
+    async def lock_users(self, user_ids: Iterable[str]) -> None:
+        # Nothing to lock; fail the batch up front for a missing user, as its first
+        # write would in Postgres, rather than after the rest of the batch is applied.
+        for user_id in set(user_ids):
+            self._require(User, user_id, "User")
+
+    # ------------------------------------------------------------------
+    # Rewards (bulk helpers)
+    # ------------------------------------------------------------------
+    async def get_existing_reward_keys(self, idempotency_keys: Iterable[str]) -> set[str]:
+        return {key for key in idempotency_keys if key in self.store.reward_keys}
+
+    async def get_daily_counter_values(
+        self,
+        keys: Iterable[tuple[str, str]],
+    ) -> dict[tuple[str, str], dict[str, int]]:
+        values = {}
+        for key in set(keys):
+            counter = self.store.daily_counters.get(key)
+            if counter is not None:
+                values[key] = {name: getattr(counter, name) or 0 for name in DAILY_COUNTER_COLUMNS}
+        return values
+
+    async def record_rewards(self, rows: Sequence[dict]) -> set[str]:
+        for row in rows:
+            self._require(User, row["user_id"], "User")
+        inserted = set()
+        for row in rows:
+            if await self.record_reward(row) is not None:
+                inserted.add(row["idempotency_key"])
+        await self.add_reward_emission([row for row in rows if row["idempotency_key"] in inserted])
+        return inserted
+
+    async def add_reward_emission(self, rewards: Sequence[dict]) -> None:
+        for reward in rewards:
+            day = (reward.get("timestamp") or datetime.utcnow()).date()
+            total = self.store.emission[(day, reward["action_id"])]
+            total[0] += reward["mind_amount"]
+            total[1] += 1
+
+    async def get_emission_total(self, since: date_type | None = None) -> int:
+        return sum(
+            mind for (day, _), (mind, _) in self.store.emission.items() if since is None or day >= since
+        )
+
+    async def get_emission_daily(self, since: date_type) -> Sequence[tuple[date_type, str, int, int]]:
+        return [
+            (day, action_id, mind, count)
+            for (day, action_id), (mind, count) in sorted(self.store.emission.items())
+            if day >= since
+        ]
+
+    async def create_transactions(self, rows: Sequence[dict]) -> None:
+        for row in rows:
+            self.store.insert(Transaction, row)
+
+    async def increment_daily_counters(self, rows: Sequence[dict]) -> Sequence[UserDailyCounter]:
+        counters = []
+        for row in rows:
+            counter = await self.get_daily_counter(row["user_id"], row["date"])
+            for name in DAILY_COUNTER_COLUMNS:
+                setattr(counter, name, (getattr(counter, name) or 0) + row.get(name, 0))
+            counter.updated_at = datetime.utcnow()
+            counters.append(counter)
+        return counters
+
+    # ------------------------------------------------------------------
+    # Reward outbox
+    # ------------------------------------------------------------------
+    async def enqueue_reward_events(self, rows: Sequence[dict]) -> None:
+        for row in rows:
+            self.store.insert(RewardOutbox, row)
+
+    async def try_lock_outbox_partition(self, partition: int) -> bool:
+        return True
+
+    async def claim_reward_outbox(self, partition: int, limit: int) -> Sequence[RewardOutbox]:
+        now = datetime.utcnow()
+        pending = sorted(
+            (item for item in self.store.rows(RewardOutbox) if item.partition == partition and item.status == OUTBOX_PENDING),
+            key=lambda item: item.id,
+        )[:limit]
+        claimed = []
+        for item in pending:
+            if item.available_at > now:
+                break
+            claimed.append(item)
+        return claimed
+
+    async def delete_reward_outbox(self, ids: Sequence[int]) -> None:
+        for outbox_id in ids:
+            self.store.delete(RewardOutbox, outbox_id)
+
+    async def reschedule_reward_outbox(
+        self,
+        ids: Sequence[int],
+        error: str,
+        *,
+        retry_delay: float,
+        max_attempts: int,
+    ) -> None:
+        now = datetime.utcnow()
+        for outbox_id in ids:
+            item = self.store.get(RewardOutbox, outbox_id)
+            if item is None:
+                continue
+            item.available_at = now + timedelta(seconds=retry_delay * 2**item.attempts)
+            item.attempts += 1
+            item.last_error = error
+            item.status = OUTBOX_FAILED if item.attempts >= max_attempts else OUTBOX_PENDING
+
+    async def count_pending_reward_outbox(self) -> int:
+        return sum(1 for item in self.store.rows(RewardOutbox) if item.status == OUTBOX_PENDING)
+
+
+_memory_store: MemoryStore | None = None
+
+
+def get_memory_store() -> MemoryStore:
+    global _memory_store
+    if _memory_store is None:
+        _memory_store = MemoryStore()
+    return _memory_store
+
+
+def make_storage(session: AsyncSession) -> StorageService:
+    """The configured ``STORAGE_BACKEND`` over ``session``, which memory mode never uses.
+
+    Sessions connect lazily, so committing or rolling back an unused one is free.
+    """
+    if settings.storage_backend == "memory":
+        return InMemoryStorageService(get_memory_store())
+    return StorageService(session)
@@ -0,0 +1,92 @@
+"""Hot reloading of ``rewards.yml`` for the reward engine."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from typing import TYPE_CHECKING
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    from app.services.reward_engine import RewardEngine
+
+logger = logging.getLogger(__name__)
+
+
+class RewardConfigWatcher:
+    """Poll the config file's inode/mtime/size and hot-swap the compiled rule table.
+
+    Every uvicorn worker runs its own watcher, so a rebalance written by one worker
+    reaches all of them within ``interval`` seconds. Polling costs one ``stat`` per
+    interval; the YAML is only re-read, on a worker thread, when the stamp changes.
+    """
+
+    def __init__(self, engine: RewardEngine, interval: float) -> None:
+        self.engine = engine
+        self.interval = interval
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run(), name="reward-config-watcher")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def check(self) -> bool:
+        """Reload the config if the file changed; return whether a new table was applied."""
+        engine = self.engine
+        try:
+            stamp = await asyncio.to_thread(engine.stat_config)
+        except FileNotFoundError:
+            logger.warning("rewards.yml disappeared; keeping the current rule table")
+            return False
+        if stamp == engine.config_stamp:
+            return False
+
+        try:
+            config = await asyncio.to_thread(engine._load_config)
+            if not isinstance(config, dict) or not config.get("rewards"):
+                logger.warning("rewards.yml has no rewards section; keeping the current rule table")
+                return False
+            rules = engine.apply_config(config)
+        except Exception:  # noqa: BLE001 - a bad edit must not take the engine down
+            logger.exception("Failed to reload rewards.yml; keeping the current rule table")
+            return False
+        logger.info(
+            "Reloaded rewards.yml (rule table v%s, rebalance coefficient %s)",
+            rules.version,
+            rules.rebalance_coefficient,
+        )
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception:  # noqa: BLE001 - keep watching; the next change may be valid
+                logger.exception("rewards.yml check failed")
+
+
+reward_config_watcher: RewardConfigWatcher | None = None
+
+
+def start_reward_config_watcher(engine: RewardEngine) -> RewardConfigWatcher:
+    global reward_config_watcher
+    if reward_config_watcher is None:
+        reward_config_watcher = RewardConfigWatcher(engine, settings.rewards_config_poll_interval)
+    reward_config_watcher.start()
+    return reward_config_watcher
+
+
+async def stop_reward_config_watcher() -> None:
+    if reward_config_watcher is not None:
+        await reward_config_watcher.stop()
@@ -2,28 +2,126 @@
 
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import itertools
+import os
+import shutil
+import tempfile
+from collections import defaultdict
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from decimal import Decimal
+from decimal import ROUND_HALF_UP, Decimal
 from pathlib import Path
-from typing import Any, Iterable
+from types import MappingProxyType
+from typing import Any, Iterable, Mapping
 
 import yaml
 from pydantic import BaseModel
-from sqlalchemy import select, func, between
-from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.services.storage_service import StorageService
-from app.db.models import TransactionType, UserReward, UserDailyCounter
+from app.core.metrics import REGISTRY
+from app.services.idempotency import IdempotencyFilter, Verdict, get_idempotency_filter
+from app.services.storage_service import DAILY_COUNTER_COLUMNS, StorageService
+from app.db.models import TransactionType
 
-CONFIG_PATH = Path(__file__).resolve().parents[3] / "rewards.yml"
+try:  # libyaml bindings are several times faster when PyYAML was built with them
+    from yaml import CSafeDumper as YamlDumper, CSafeLoader as YamlLoader
+except ImportError:  # pragma: no cover - depends on the PyYAML build
+    from yaml import SafeDumper as YamlDumper, SafeLoader as YamlLoader
 
+CONFIG_PATH = Path(__file__).resolve().parents[3] / "rewards.yml"
 
-@dataclass
+# Daily counter column each action accumulates into.
+_COUNTER_COLUMNS = {
+    "steps": "steps_mind",
+    "book_completion": "books_mind",
+    "course_completion_basic": "courses_mind",
+    "course_completion_intermediate": "courses_mind",
+    "course_completion_advanced": "courses_mind",
+    "partner_subscription": "subs_mind",
+    "referral_bonus": "subs_mind",
+}
+# ``StorageService.increment_daily_counter`` keyword for each counter column.
+_COUNTER_KWARGS = {
+    "steps_mind": "steps",
+    "books_mind": "books",
+    "courses_mind": "courses",
+    "subs_mind": "subs",
+}
+# Balances are NUMERIC(10, 2); Postgres rounds half away from zero on assignment.
+_CENT = Decimal("0.01")
+_ZERO = Decimal("0")
+_BOOK_COMPLETION_THRESHOLD = Decimal("0.8")
+
+_rule_table_versions = itertools.count(1)
+
+REWARD_EVENTS_PROCESSED = REGISTRY.counter(
+    "reward_events_processed_total", "Reward events that granted MIND.", ("action_id",)
+)
+REWARD_EVENTS_SKIPPED = REGISTRY.counter(
+    "reward_events_skipped_total",
+    "Reward events that granted nothing (duplicate, unknown_action, unrewarded, cap_reached).",
+    ("action_id", "reason"),
+)
+REWARD_EVENTS_CAPPED = REGISTRY.counter(
+    "reward_events_capped_total", "Granted reward events reduced by a daily cap.", ("action_id",)
+)
+
+
+@dataclass(frozen=True, slots=True)
 class RewardRule:
     action_id: str
     base_reward: Decimal
     daily_cap: Decimal | None
+    counter_column: str | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class RuleTable:
+    """Immutable, pre-parsed view of ``rewards.yml`` used on the hot path."""
+
+    rules: Mapping[str, RewardRule]
+    rebalance_coefficient: Decimal
+    idempotency_enabled: bool
+    version: int
+
+    @classmethod
+    def compile(cls, config: Mapping[str, Any]) -> RuleTable:
+        rules = {}
+        for action_id, raw in (config.get("rewards") or {}).items():
+            if not raw:
+                continue
+            daily_cap = raw.get("daily_cap")
+            rules[action_id] = RewardRule(
+                action_id=raw.get("action_id", action_id),
+                base_reward=Decimal(str(raw.get("base_reward", 0))),
+                daily_cap=Decimal(str(daily_cap)) if daily_cap is not None else None,
+                counter_column=_COUNTER_COLUMNS.get(action_id),
+            )
+        return cls(
+            rules=MappingProxyType(rules),
+            rebalance_coefficient=Decimal(str(config.get("rebalance_coefficient", 1))),
+            idempotency_enabled=bool(config.get("security", {}).get("idempotency_enabled", True)),
+            version=next(_rule_table_versions),
+        )
+
+
+def calculate_base_reward(action_id: str, value: float | None, rule: RewardRule) -> Decimal:
+    """Reward for one event before the rebalance coefficient and daily cap."""
+    if action_id == "steps":
+        steps = int(value or 0)
+        return (steps // 1000) * rule.base_reward
+    if action_id == "book_completion":
+        progress = Decimal(str(value or 0))
+        return rule.base_reward if progress >= _BOOK_COMPLETION_THRESHOLD else _ZERO
+    return rule.base_reward
+
+
+def apply_daily_cap(rule: RewardRule, counted: int, amount: Decimal) -> Decimal:
+    """``amount`` cut to what is left of ``rule``'s daily cap after ``counted`` MIND today."""
+    if rule.daily_cap is None:
+        return amount
+    return min(amount, max(_ZERO, rule.daily_cap - counted))
 
 
 class RewardEvent(BaseModel):
@@ -35,9 +133,15 @@ class RewardEvent(BaseModel):
 
 
 class RewardEngine:
-    def __init__(self) -> None:
+    def __init__(self, idempotency_filter: IdempotencyFilter | None = None) -> None:
         self.config_path = CONFIG_PATH
-        self.config = self._load_config()
+        self.idempotency_filter = idempotency_filter
+        self.config_stamp: tuple[int, int, int] | None = None
+        self.apply_config(self._load_config())
+
+    @property
+    def rules(self) -> RuleTable:
+        return self._rules
 
     # ------------------------------------------------------------------
     # Config helpers
@@ -45,13 +149,53 @@ class RewardEngine:
     def _load_config(self) -> dict[str, Any]:
         if not self.config_path.exists():
             raise FileNotFoundError("rewards.yml configuration is missing")
+        # Stamp before reading: a write racing the read leaves an older stamp, which
+        # only causes one extra reload on the next check.
+        self.config_stamp = self.stat_config()
         with self.config_path.open("r", encoding="utf-8") as fh:
-            data = yaml.safe_load(fh)
+            data = yaml.load(fh, Loader=YamlLoader)
         return data or {}
 
-    def save_config(self) -> None:
-        with self.config_path.open("w", encoding="utf-8") as fh:
-            yaml.safe_dump(self.config, fh, allow_unicode=True, sort_keys=False)
+    def stat_config(self) -> tuple[int, int, int]:
+        """Return the ``(inode, mtime_ns, size)`` stamp used to detect config changes."""
+        stat = self.config_path.stat()
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def apply_config(self, config: dict[str, Any]) -> RuleTable:
+        """Compile ``config`` and swap it in as a single attribute assignment."""
+        rules = RuleTable.compile(config)
+        self.config = config
+        self._rules = rules
+        return rules
+
+    async def save_config(self) -> None:
+        """Persist the active config without blocking the event loop."""
+        self.config_stamp = await asyncio.to_thread(self._write_config, self.config)
+
+    def _write_config(self, config: dict[str, Any]) -> tuple[int, int, int]:
+        # Write a sibling temp file and rename it over the original so readers (and
+        # other workers' watchers) only ever see the old or the new file, never a torn one.
+        directory = self.config_path.parent
+        fd, tmp_name = tempfile.mkstemp(dir=directory, prefix=f".{self.config_path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                yaml.dump(config, fh, Dumper=YamlDumper, allow_unicode=True, sort_keys=False)
+                fh.flush()
+                os.fsync(fh.fileno())
+            if self.config_path.exists():
+                shutil.copymode(self.config_path, tmp_name)
+            os.replace(tmp_name, self.config_path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp_name)
+            raise
+        if hasattr(os, "O_DIRECTORY"):
+            dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        return self.stat_config()
 
     # ------------------------------------------------------------------
     # Reward processing
@@ -60,40 +204,213 @@ class RewardEngine:
         self,
         storage: StorageService,
         events: Iterable[RewardEvent],
+        *,
+        bulk: bool = False,
     ) -> None:
+        """Process events in order.
+
+        With ``bulk=True`` the whole batch is evaluated in memory and written with a
+        fixed number of statements; the outcome matches the per-event path.
+        """
+        if bulk:
+            await self._process_bulk(storage, list(events))
+            return
+        events = list(events)
+        # Lock every user up front, in key order: taking them event by event could
+        # deadlock against a concurrent batch that lists the same users differently.
+        rules = self._rules
+        await storage.lock_users(event.user_id for event in events if event.action_id in rules.rules)
+        recorded = []
         for event in events:
-            await self._process_event(storage, event)
+            reward = await self._process_event(storage, event)
+            if reward is not None:
+                recorded.append(reward)
+        # One sorted rollup upsert per batch, as in the bulk path: per-event upserts
+        # would lock the shared shard rows in event order and deadlock across batches.
+        await storage.add_reward_emission(recorded)
+
+    async def _process_bulk(self, storage: StorageService, events: list[RewardEvent]) -> None:
+        if not events:
+            return
 
-    async def _process_event(self, storage: StorageService, event: RewardEvent) -> None:
-        if self.config.get("security", {}).get("idempotency_enabled", True):
-            if await storage.reward_exists(event.idempotency_key):
-                return
+        rules = self._rules
+        idempotency_filter = self.idempotency_filter if rules.idempotency_enabled else None
+        recorded: set[str] = set()
+        if rules.idempotency_enabled:
+            unknown = {event.idempotency_key for event in events}
+            if idempotency_filter is not None:
+                for key in list(unknown):
+                    verdict = idempotency_filter.check(key)
+                    if verdict is not Verdict.UNKNOWN:
+                        unknown.discard(key)
+                        if verdict is Verdict.DUPLICATE:
+                            recorded.add(key)
+            existing = await storage.get_existing_reward_keys(unknown)
+            recorded |= existing
+            if idempotency_filter is not None:
+                for key in unknown:
+                    idempotency_filter.resolve(storage.session, key, key in existing)
+
+        # Hold every user's lock before reading counters so concurrent batches cannot
+        # both see the same remaining cap.
+        await storage.lock_users(
+            event.user_id
+            for event in events
+            if event.idempotency_key not in recorded and event.action_id in rules.rules
+        )
+
+        now = datetime.utcnow()
+        today = now.date().isoformat()
+        loaded = await storage.get_daily_counter_values((event.user_id, today) for event in events)
+        counters: dict[str, dict[str, int]] = {}
+
+        # (event, amount, counter column) for every reward the per-event path would grant.
+        granted: list[tuple[RewardEvent, Decimal, str | None]] = []
+        capped: set[str] = set()
+        for event in events:
+            if event.idempotency_key in recorded:
+                REWARD_EVENTS_SKIPPED.inc(_action_label(rules, event.action_id), "duplicate")
+                continue
+            rule = rules.rules.get(event.action_id)
+            if rule is None:
+                REWARD_EVENTS_SKIPPED.inc("unknown", "unknown_action")
+                continue
+            reward_amount = self._calculate_base_reward(event, rule)
+            if reward_amount <= 0:
+                REWARD_EVENTS_SKIPPED.inc(event.action_id, "unrewarded")
+                continue
+            reward_amount = reward_amount * rules.rebalance_coefficient
+
+            column_name = rule.counter_column
+            counter = counters.get(event.user_id)
+            if counter is None:
+                counter = dict(loaded.get((event.user_id, today)) or dict.fromkeys(DAILY_COUNTER_COLUMNS, 0))
+                counters[event.user_id] = counter
+            allowed = apply_daily_cap(rule, counter[column_name] if column_name else 0, reward_amount)
+            if allowed < reward_amount:
+                reward_amount = allowed
+                capped.add(event.idempotency_key)
+            if reward_amount <= 0:
+                REWARD_EVENTS_SKIPPED.inc(event.action_id, "cap_reached")
+                continue
+
+            recorded.add(event.idempotency_key)
+            if column_name:
+                counter[column_name] += int(reward_amount)
+            granted.append((event, reward_amount, column_name))
+
+        reward_rows = [
+            {
+                "user_id": event.user_id,
+                "action_id": event.action_id,
+                "mind_amount": int(amount),
+                "idempotency_key": event.idempotency_key,
+                "metadata": event.metadata,
+                "timestamp": now,
+            }
+            for event, amount, _ in granted
+        ]
+        # Keys written concurrently by another request lose the ON CONFLICT race; drop them.
+        inserted = await storage.record_rewards(reward_rows)
+        if idempotency_filter is not None:
+            # Conflicting keys too: until this transaction commits, nothing it saw is settled.
+            for event, _, _ in granted:
+                idempotency_filter.remember_on_commit(storage.session, event.idempotency_key)
+        for event, _, _ in granted:
+            if event.idempotency_key not in inserted:
+                REWARD_EVENTS_SKIPPED.inc(event.action_id, "duplicate")
+                continue
+            REWARD_EVENTS_PROCESSED.inc(event.action_id)
+            if event.idempotency_key in capped:
+                REWARD_EVENTS_CAPPED.inc(event.action_id)
+        granted = [item for item in granted if item[0].idempotency_key in inserted]
+
+        balance_deltas: dict[str, Decimal] = defaultdict(Decimal)
+        # Only users with a granted reward get a counter row, as on the per-event path;
+        # users whose events were all skipped keep their row (and updated_at) untouched.
+        increments: dict[str, dict[str, int]] = {}
+        transaction_rows = []
+        for event, amount, column_name in granted:
+            delta = amount.quantize(_CENT, rounding=ROUND_HALF_UP)
+            balance_deltas[event.user_id] += delta
+            increment = increments.get(event.user_id)
+            if increment is None:
+                increment = increments[event.user_id] = dict.fromkeys(DAILY_COUNTER_COLUMNS, 0)
+            if column_name:
+                increment[column_name] += int(amount)
+            transaction_rows.append(
+                {
+                    "user_id": event.user_id,
+                    "type": TransactionType.REWARD,
+                    "amount": delta,
+                    "description": f"Reward for {event.action_id}",
+                    "metadata": event.metadata,
+                }
+            )
+
+        await storage.adjust_balances(balance_deltas)
+        await storage.create_transactions(transaction_rows)
+        await storage.increment_daily_counters(
+            [{"user_id": user_id, "date": today, **columns} for user_id, columns in increments.items()]
+        )
 
-        reward_cfg = self._get_rule(event.action_id)
+    async def _process_event(self, storage: StorageService, event: RewardEvent) -> dict | None:
+        """Process one event; the recorded reward row, for the emission rollup, or ``None``."""
+        rules = self._rules
+        idempotency_filter = self.idempotency_filter if rules.idempotency_enabled else None
+        if rules.idempotency_enabled:
+            verdict = idempotency_filter.check(event.idempotency_key) if idempotency_filter else Verdict.UNKNOWN
+            if verdict is Verdict.DUPLICATE:
+                REWARD_EVENTS_SKIPPED.inc(_action_label(rules, event.action_id), "duplicate")
+                return
+            if verdict is Verdict.UNKNOWN:
+                exists = await storage.reward_exists(event.idempotency_key)
+                if idempotency_filter is not None:
+                    idempotency_filter.resolve(storage.session, event.idempotency_key, exists)
+                if exists:
+                    REWARD_EVENTS_SKIPPED.inc(_action_label(rules, event.action_id), "duplicate")
+                    return
+
+        reward_cfg = rules.rules.get(event.action_id)
         if reward_cfg is None:
+            REWARD_EVENTS_SKIPPED.inc("unknown", "unknown_action")
             return
 
         reward_amount = self._calculate_base_reward(event, reward_cfg)
         if reward_amount <= 0:
+            REWARD_EVENTS_SKIPPED.inc(event.action_id, "unrewarded")
             return
 
-        reward_amount = reward_amount * Decimal(str(self.config.get("rebalance_coefficient", 1)))
-        reward_amount = await self._apply_daily_cap(storage, event.user_id, event.action_id, reward_cfg, reward_amount)
+        uncapped_amount = reward_amount * rules.rebalance_coefficient
+        reward_amount = await self._apply_daily_cap(storage, event.user_id, reward_cfg, uncapped_amount)
 
         if reward_amount <= 0:
+            REWARD_EVENTS_SKIPPED.inc(event.action_id, "cap_reached")
+            return
+
+        # The reward row is written first: its unique key decides duplicates that the
+        # idempotency filter let through, before any balance or counter is touched.
+        row = {
+            "user_id": event.user_id,
+            "action_id": event.action_id,
+            "mind_amount": int(reward_amount),
+            "idempotency_key": event.idempotency_key,
+            "metadata": event.metadata,
+            "timestamp": datetime.utcnow(),
+        }
+        reward = await storage.record_reward(row)
+        # The conflicting row may be this transaction's own insert: remember the key
+        # only if the transaction commits, so a rolled-back batch can be retried.
+        if idempotency_filter is not None:
+            idempotency_filter.remember_on_commit(storage.session, event.idempotency_key)
+        if reward is None:
+            REWARD_EVENTS_SKIPPED.inc(event.action_id, "duplicate")
             return
+        REWARD_EVENTS_PROCESSED.inc(event.action_id)
+        if reward_amount < uncapped_amount:
+            REWARD_EVENTS_CAPPED.inc(event.action_id)
 
         await storage.update_user_tokens(event.user_id, reward_amount)
-        await storage.record_reward(
-            {
-                "user_id": event.user_id,
-                "action_id": event.action_id,
-                "mind_amount": int(reward_amount),
-                "idempotency_key": event.idempotency_key,
-                "metadata": event.metadata,
-                "timestamp": datetime.utcnow(),
-            }
-        )
         await storage.create_transaction(
             {
                 "user_id": event.user_id,
@@ -103,74 +420,46 @@ class RewardEngine:
                 "metadata": event.metadata,
             }
         )
-        await self._update_daily_counter(storage, event.user_id, event.action_id, int(reward_amount))
+        await self._update_daily_counter(storage, event.user_id, reward_cfg, int(reward_amount))
+        return row
 
     def _get_rule(self, action_id: str) -> RewardRule | None:
-        rewards = self.config.get("rewards", {})
-        rule = rewards.get(action_id)
-        if not rule:
-            return None
-        return RewardRule(
-            action_id=rule.get("action_id", action_id),
-            base_reward=Decimal(str(rule.get("base_reward", 0))),
-            daily_cap=Decimal(str(rule["daily_cap"])) if rule.get("daily_cap") is not None else None,
-        )
+        return self._rules.rules.get(action_id)
 
     def _calculate_base_reward(self, event: RewardEvent, rule: RewardRule) -> Decimal:
-        if event.action_id == "steps":
-            steps = int(event.value or 0)
-            return (steps // 1000) * rule.base_reward
-        if event.action_id == "book_completion":
-            progress = Decimal(str(event.value or 0))
-            return rule.base_reward if progress >= Decimal("0.8") else Decimal("0")
-        return rule.base_reward
+        return calculate_base_reward(event.action_id, event.value, rule)
 
     async def _apply_daily_cap(
         self,
         storage: StorageService,
         user_id: str,
-        action_id: str,
         rule: RewardRule,
         proposed_amount: Decimal,
     ) -> Decimal:
+        """Cut ``proposed_amount`` to what is left of today's cap.
+
+        The counter read here and the increment written after crediting are exact
+        only because ``process_batch`` holds the user's ``lock_users`` lock for the
+        whole transaction; nothing in the counter upsert itself enforces the cap.
+        """
         if rule.daily_cap is None:
             return proposed_amount
         today = datetime.utcnow().date().isoformat()
         counter = await storage.get_daily_counter(user_id, today)
-        current = {
-            "steps": counter.steps_mind,
-            "book_completion": counter.books_mind,
-            "course_completion_basic": counter.courses_mind,
-            "course_completion_intermediate": counter.courses_mind,
-            "course_completion_advanced": counter.courses_mind,
-            "partner_subscription": counter.subs_mind,
-            "referral_bonus": counter.subs_mind,
-        }.get(action_id, 0)
-        remaining = max(Decimal("0"), rule.daily_cap - Decimal(str(current)))
-        return min(proposed_amount, remaining)
+        counted = getattr(counter, rule.counter_column) if rule.counter_column else 0
+        return apply_daily_cap(rule, counted, proposed_amount)
 
     async def _update_daily_counter(
         self,
         storage: StorageService,
         user_id: str,
-        action_id: str,
+        rule: RewardRule,
         amount: int,
     ) -> None:
         today = datetime.utcnow().date().isoformat()
-        kwargs = {
-            "steps": 0,
-            "books": 0,
-            "courses": 0,
-            "subs": 0,
-        }
-        if action_id == "steps":
-            kwargs["steps"] = amount
-        elif action_id == "book_completion":
-            kwargs["books"] = amount
-        elif action_id in {"course_completion_basic", "course_completion_intermediate", "course_completion_advanced"}:
-            kwargs["courses"] = amount
-        elif action_id in {"partner_subscription", "referral_bonus"}:
-            kwargs["subs"] = amount
+        kwargs: dict[str, Any] = {}
+        if rule.counter_column:
+            kwargs[_COUNTER_KWARGS[rule.counter_column]] = amount
         await storage.increment_daily_counter(user_id, today, **kwargs)
 
     # ------------------------------------------------------------------
@@ -194,48 +483,47 @@ class RewardEngine:
             },
         }
 
-    async def reset_daily_counters(self, session: AsyncSession) -> None:
-        yesterday = datetime.utcnow().date() - timedelta(days=1)
+    async def reset_daily_counters(self, storage: StorageService) -> None:
         # No explicit reset needed; counters are per-date rows.
-        await session.execute(
-            select(func.count()).select_from(UserDailyCounter)  # touch table to ensure connection
-        )
+        await storage.count_daily_counters()  # touch table to ensure connection
 
-    async def execute_monthly_rebalance(self, session: AsyncSession) -> Decimal:
+    async def execute_monthly_rebalance(self, storage: StorageService) -> Decimal:
         if not self.config.get("auto_rebalance", {}).get("enabled", True):
-            return Decimal(str(self.config.get("rebalance_coefficient", 1)))
+            return self._rules.rebalance_coefficient
 
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        result = await session.execute(
-            select(func.coalesce(func.sum(UserReward.mind_amount), 0)).where(
-                between(UserReward.timestamp, thirty_days_ago, datetime.utcnow())
-            )
-        )
-        actual_emission = Decimal(result.scalar_one())
+        # Both totals come from the reward_emission_daily rollup (user_rewards until it
+        # is backfilled), so the window is whole UTC days: the last 30 days including today.
+        thirty_days_ago = datetime.utcnow().date() - timedelta(days=29)
+        actual_emission = Decimal(await storage.get_emission_total(thirty_days_ago))
 
-        total_distributed = await session.scalar(select(func.coalesce(func.sum(UserReward.mind_amount), 0)))
-        remaining_pool = Decimal("2000000000") - Decimal(total_distributed or 0)
+        total_distributed = await storage.get_emission_total()
+        remaining_pool = Decimal("2000000000") - Decimal(total_distributed)
         months_left = Decimal(str(self.config.get("auto_rebalance", {}).get("remaining_pool_months", 24)))
         if months_left <= 0:
-            return Decimal(str(self.config.get("rebalance_coefficient", 1)))
+            return self._rules.rebalance_coefficient
         target_emission = remaining_pool / months_left
 
-        new_coefficient = Decimal(str(self.config.get("rebalance_coefficient", 1)))
+        new_coefficient = self._rules.rebalance_coefficient
         if actual_emission > target_emission * Decimal("1.1") and actual_emission > 0:
             new_coefficient = (target_emission / actual_emission).quantize(Decimal("0.0001"))
         elif actual_emission < target_emission * Decimal("0.9") and actual_emission > 0:
             new_coefficient = min(Decimal("1"), (target_emission / actual_emission).quantize(Decimal("0.0001")))
 
-        self.config["rebalance_coefficient"] = float(new_coefficient)
-        self.save_config()
+        self.apply_config({**self.config, "rebalance_coefficient": float(new_coefficient)})
+        await self.save_config()
         return new_coefficient
 
 
+def _action_label(rules: RuleTable, action_id: str) -> str:
+    # Action ids come from clients; only configured ones become metric labels.
+    return action_id if action_id in rules.rules else "unknown"
+
+
 _reward_engine: RewardEngine | None = None
 
 
 def get_reward_engine() -> RewardEngine:
     global _reward_engine
     if _reward_engine is None:
-        _reward_engine = RewardEngine()
+        _reward_engine = RewardEngine(get_idempotency_filter())
     return _reward_engine
@@ -0,0 +1,213 @@
+"""Durable reward ingestion: an outbox table drained by a pool of asyncio workers."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import zlib
+from typing import Sequence
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.memory_storage import make_storage
+from app.services.reward_engine import RewardEngine, RewardEvent, get_reward_engine
+from app.services.storage_service import StorageService
+
+logger = logging.getLogger(__name__)
+
+_PENDING_WAKE_KEY = "reward_queue_pending_wake"
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the outbox backlog is above ``reward_queue_max_backlog``."""
+
+
+class RewardQueue:
+    """Accept reward events into ``reward_outbox`` and apply them in micro-batches.
+
+    Events are spread over ``partitions`` by a stable hash of the user id. A partition
+    is only drained under a Postgres advisory lock, in insertion order, so a user's
+    events are applied in the order they were accepted even with several processes
+    running pools. Changing the partition count while events are pending may reorder
+    those events once.
+    """
+
+    def __init__(
+        self,
+        engine: RewardEngine,
+        *,
+        workers: int,
+        partitions: int,
+        batch_size: int,
+        poll_interval: float,
+        max_attempts: int,
+        retry_delay: float,
+        max_backlog: int,
+    ) -> None:
+        self.engine = engine
+        self.workers = workers
+        self.partitions = partitions
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_backlog = max_backlog
+        self.backlog = 0
+        self._wake = asyncio.Event()
+        self._tasks: list[asyncio.Task[None]] = []
+
+    def partition_for(self, user_id: str) -> int:
+        return zlib.crc32(user_id.encode("utf-8")) % self.partitions
+
+    async def enqueue(self, storage: StorageService, events: Sequence[RewardEvent]) -> None:
+        """Append events to the outbox in the caller's transaction."""
+        if self.max_backlog and self.backlog + len(events) > self.max_backlog:
+            raise QueueFullError("Reward queue is full")
+        await storage.enqueue_reward_events(
+            [
+                {
+                    "partition": self.partition_for(event.user_id),
+                    "user_id": event.user_id,
+                    "idempotency_key": event.idempotency_key,
+                    "payload": event.model_dump(),
+                }
+                for event in events
+            ]
+        )
+        self.backlog += len(events)
+        self.wake_on_commit(storage.session)
+
+    def wake_on_commit(self, session: AsyncSession | None) -> None:
+        """Wake the workers once ``session`` commits: before that they cannot see the rows."""
+        if session is None:
+            # Storage without a session (the in-memory backend) writes immediately.
+            self._wake.set()
+            return
+        session.sync_session.info.setdefault(_PENDING_WAKE_KEY, []).append(self)
+
+    def start(self) -> None:
+        if self._tasks or self.workers <= 0:
+            return
+        self._tasks = [
+            asyncio.create_task(self._run_worker(index), name=f"reward-queue-worker-{index}")
+            for index in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._monitor_backlog(), name="reward-queue-backlog"))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+
+    async def drain_partition(self, partition: int) -> int:
+        """Apply one micro-batch from ``partition``; return the number of events handled."""
+        async with SessionLocal() as session:
+            storage = make_storage(session)
+            if not await storage.try_lock_outbox_partition(partition):
+                await session.rollback()
+                return 0
+            rows = await storage.claim_reward_outbox(partition, self.batch_size)
+            if not rows:
+                await session.rollback()
+                return 0
+            # A batch that already failed is retried one event at a time so a single
+            # bad event cannot hold back the rest of the partition.
+            if rows[0].attempts:
+                rows = rows[:1]
+            ids = [row.id for row in rows]
+            try:
+                events = [RewardEvent(**row.payload) for row in rows]
+                await self.engine.process_batch(storage, events, bulk=True)
+                await storage.delete_reward_outbox(ids)
+                await session.commit()
+            except Exception as exc:  # noqa: BLE001 - every failure is retried or parked
+                await session.rollback()
+                logger.exception("Reward queue batch failed (partition %s, %s events)", partition, len(ids))
+                await self._reschedule(ids, exc)
+                return 0
+        return len(ids)
+
+    async def _reschedule(self, ids: list[int], exc: Exception) -> None:
+        async with SessionLocal() as session:
+            await make_storage(session).reschedule_reward_outbox(
+                ids,
+                repr(exc),
+                retry_delay=self.retry_delay,
+                max_attempts=self.max_attempts,
+            )
+            await session.commit()
+
+    async def _run_worker(self, index: int) -> None:
+        owned = range(index, self.partitions, self.workers)
+        while True:
+            handled = 0
+            for partition in owned:
+                try:
+                    handled += await self.drain_partition(partition)
+                except Exception:  # noqa: BLE001 - keep the worker alive through DB outages
+                    logger.exception("Reward queue worker %s failed on partition %s", index, partition)
+            if handled:
+                self.backlog = max(0, self.backlog - handled)
+                continue
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            self._wake.clear()
+
+    async def _monitor_backlog(self) -> None:
+        # Other processes enqueue and drain too; refresh the estimate used for backpressure.
+        while True:
+            try:
+                async with SessionLocal() as session:
+                    self.backlog = await make_storage(session).count_pending_reward_outbox()
+            except Exception:  # noqa: BLE001
+                logger.exception("Failed to refresh reward queue backlog")
+            await asyncio.sleep(max(self.poll_interval, 1.0))
+
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_pending_queues(session: Session) -> None:
+    for queue in session.info.pop(_PENDING_WAKE_KEY, ()):
+        queue._wake.set()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_wakes(session: Session) -> None:
+    session.info.pop(_PENDING_WAKE_KEY, None)
+
+_reward_queue: RewardQueue | None = None
+
+
+def get_reward_queue() -> RewardQueue:
+    global _reward_queue
+    if _reward_queue is None:
+        _reward_queue = RewardQueue(
+            get_reward_engine(),
+            workers=settings.reward_queue_workers,
+            partitions=settings.reward_queue_partitions,
+            batch_size=settings.reward_queue_batch_size,
+            poll_interval=settings.reward_queue_poll_interval,
+            max_attempts=settings.reward_queue_max_attempts,
+            retry_delay=settings.reward_queue_retry_delay,
+            max_backlog=settings.reward_queue_max_backlog,
+        )
+    return _reward_queue
+
+
+def start_reward_queue() -> RewardQueue:
+    queue = get_reward_queue()
+    queue.start()
+    return queue
+
+
+async def stop_reward_queue() -> None:
+    if _reward_queue is not None:
+        await _reward_queue.stop()
@@ -0,0 +1,144 @@
+"""Offline replay of reward events against a candidate rule table."""
+
+from __future__ import annotations
+
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from decimal import ROUND_CEILING, Decimal
+from typing import Any, Iterable, NamedTuple
+
+from app.services.reward_engine import RewardRule, RuleTable, apply_daily_cap, calculate_base_reward
+from app.services.storage_service import DAILY_COUNTER_COLUMNS
+
+_COLUMN_INDEX = {name: index for index, name in enumerate(DAILY_COUNTER_COLUMNS)}
+
+
+class ReplayEvent(NamedTuple):
+    day: str
+    user_id: str
+    action_id: str
+    value: float | None
+    idempotency_key: str | None = None
+
+
+@dataclass(slots=True)
+class SimulationResult:
+    events: int = 0
+    granted: int = 0
+    duplicates: int = 0
+    unknown_action: int = 0
+    unrewarded: int = 0
+    cap_reached: int = 0
+    capped: int = 0
+    mind_by_action: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    mind_by_day: dict[str, dict[str, int]] = field(default_factory=lambda: defaultdict(lambda: defaultdict(int)))
+
+    @property
+    def total_mind(self) -> int:
+        return sum(self.mind_by_action.values())
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "events": self.events,
+            "granted": self.granted,
+            "duplicates": self.duplicates,
+            "unknownAction": self.unknown_action,
+            "unrewarded": self.unrewarded,
+            "capReached": self.cap_reached,
+            "capped": self.capped,
+            "totalMind": self.total_mind,
+            "mindByAction": dict(sorted(self.mind_by_action.items())),
+            "mindByDay": {day: dict(sorted(actions.items())) for day, actions in sorted(self.mind_by_day.items())},
+        }
+
+
+class RewardSimulator:
+    """Apply ``RewardEngine``'s rule logic to an event stream entirely in memory.
+
+    Mirrors the engine's bulk path, sharing its reward and cap functions:
+    idempotency keys are de-duplicated, base rewards are scaled by the rebalance
+    coefficient and capped against a running per-user, per-day counter. Skips are
+    counted under the engine's ``reward_events_skipped_total`` reasons, and
+    ``capped`` counts granted events a cap reduced. Counters for only the
+    ``open_days`` most recent days are kept, so the stream should be roughly
+    ordered by day.
+    """
+
+    def __init__(self, rules: RuleTable, *, deduplicate: bool = True, open_days: int = 2) -> None:
+        self.rules = rules
+        self.deduplicate = deduplicate
+        self.open_days = open_days
+        self.result = SimulationResult()
+        self._seen: set[str] = set()
+        self._counters: OrderedDict[str, dict[str, list[int]]] = OrderedDict()
+
+    def _day_counters(self, day: str) -> dict[str, list[int]]:
+        counters = self._counters.get(day)
+        if counters is None:
+            counters = self._counters[day] = {}
+            while len(self._counters) > self.open_days:
+                self._counters.popitem(last=False)
+        return counters
+
+    def run(self, events: Iterable[ReplayEvent]) -> SimulationResult:
+        result = self.result
+        rules = self.rules.rules
+        coefficient = self.rules.rebalance_coefficient
+        seen = self._seen
+        mind_by_action = result.mind_by_action
+        mind_by_day = result.mind_by_day
+
+        for event in events:
+            result.events += 1
+            if self.deduplicate and event.idempotency_key is not None:
+                if event.idempotency_key in seen:
+                    result.duplicates += 1
+                    continue
+            rule = rules.get(event.action_id)
+            if rule is None:
+                result.unknown_action += 1
+                continue
+            amount = calculate_base_reward(event.action_id, event.value, rule)
+            if amount <= 0:
+                result.unrewarded += 1
+                continue
+            amount *= coefficient
+
+            counter = None
+            index = _COLUMN_INDEX.get(rule.counter_column) if rule.counter_column else None
+            if index is not None:
+                day_counters = self._day_counters(event.day)
+                counter = day_counters.get(event.user_id)
+                if counter is None:
+                    counter = day_counters[event.user_id] = [0] * len(DAILY_COUNTER_COLUMNS)
+            allowed = apply_daily_cap(rule, counter[index] if counter is not None else 0, amount)
+            if allowed <= 0:
+                result.cap_reached += 1
+                continue
+            if allowed < amount:
+                amount = allowed
+                result.capped += 1
+
+            if self.deduplicate and event.idempotency_key is not None:
+                seen.add(event.idempotency_key)
+            mind = int(amount)
+            if counter is not None:
+                counter[index] += mind
+            result.granted += 1
+            mind_by_action[event.action_id] += mind
+            mind_by_day[event.day][event.action_id] += mind
+        return result
+
+
+def reconstruct_value(action_id: str, mind_amount: int, rule: RewardRule | None, coefficient: Decimal) -> float | None:
+    """Best-effort event ``value`` that produced ``mind_amount`` under the given rules.
+
+    Recorded rewards are post-cap, so rewards that hit a cap reconstruct to the
+    capped amount rather than the original activity.
+    """
+    if action_id == "steps" and rule is not None and rule.base_reward > 0 and coefficient > 0:
+        thousands = (Decimal(mind_amount) / (rule.base_reward * coefficient)).to_integral_value(ROUND_CEILING)
+        return float(thousands * 1000)
+    if action_id == "book_completion":
+        return 1.0
+    return None
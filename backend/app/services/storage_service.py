@@ -2,14 +2,46 @@
 
 from __future__ import annotations
 
-from datetime import datetime
+import zlib
+from collections import defaultdict
+from datetime import date as date_type, datetime, time
 from decimal import Decimal
-from typing import Sequence
-
-from sqlalchemy import delete, desc, func, select
+from typing import Any, AsyncIterator, Iterable, Mapping, Sequence
+
+from sqlalchemy import (
+    Date,
+    Integer,
+    Numeric,
+    String,
+    case,
+    cast,
+    column,
+    delete,
+    desc,
+    exists,
+    func,
+    literal,
+    null,
+    select,
+    tuple_,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import Insert, insert as pg_insert
+from sqlalchemy.engine import Row
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
-
+from sqlalchemy.orm import load_only
+
+from app.core.exceptions import InsufficientBalanceError
+from app.repositories.base import insert_returning, update_returning, upsert_returning
+from app.services.catalog_cache import (
+    CatalogCache,
+    get_catalog_cache,
+    mark_catalog_changed,
+    session_changed_catalog,
+    snapshot,
+)
 from app.db.models import (
     Book,
     BookCategory,
@@ -25,6 +57,9 @@ from app.db.models import (
     DailyChallenge,
     Enrollment,
     LessonTest,
+    RewardEmissionBackfill,
+    RewardEmissionDaily,
+    RewardOutbox,
     SponsorChannel,
     TestAttempt,
     Transaction,
@@ -35,12 +70,38 @@ from app.db.models import (
     UserReward,
 )
 
+DAILY_COUNTER_COLUMNS = ("steps_mind", "books_mind", "courses_mind", "subs_mind")
+
+OUTBOX_PENDING = "pending"
+OUTBOX_FAILED = "failed"
+# First key of the two-int advisory locks held on outbox partitions ("RWOB").
+OUTBOX_LOCK_NAMESPACE = 0x52574F42
+# First key of the per-user advisory locks serialising reward processing ("RWUS").
+USER_LOCK_NAMESPACE = 0x52575553
+# Rows each (date, action) is spread over in reward_emission_daily.
+EMISSION_SHARDS = 8
+
+
+def user_lock_key(user_id: str) -> int:
+    """Stable signed 32-bit key for ``pg_advisory_xact_lock(USER_LOCK_NAMESPACE, key)``."""
+    key = zlib.crc32(user_id.encode("utf-8"))
+    return key - (1 << 32) if key >= 1 << 31 else key
+
 
 class StorageService:
     """High-level data access helpers."""
 
-    def __init__(self, session: AsyncSession) -> None:
+    def __init__(self, session: AsyncSession, catalog_cache: CatalogCache | None = None) -> None:
         self.session = session
+        self.catalog_cache = catalog_cache if catalog_cache is not None else get_catalog_cache()
+
+    def _catalog_lookup(self, key: tuple) -> tuple[Sequence | None, int]:
+        """Cached catalog rows for ``key`` (or None) and the cache version to store under."""
+        cache = self.catalog_cache
+        if not cache.enabled or session_changed_catalog(self.session):
+            # This transaction's own catalog writes are not visible to other readers yet.
+            return None, -1
+        return cache.get(key), cache.version
 
     # ------------------------------------------------------------------
     # Users
@@ -66,64 +127,103 @@ class StorageService:
         return code
 
     async def upsert_user(self, data: dict) -> User:
-        user = await self.get_user(data["id"])
-        if user:
-            for key, value in data.items():
-                if key != "id" and hasattr(user, key) and value is not None:
-                    setattr(user, key, value)
-        else:
-            user = User(**data)
-            self.session.add(user)
-        await self.session.flush()
-        await self.session.refresh(user)
-        return user
+        return await upsert_returning(self.session, User, data, ["id"])
 
     async def update_user_tokens(self, user_id: str, delta: str | Decimal | float | int) -> None:
-        user = await self.get_user(user_id)
-        if not user:
+        await self.adjust_balance(user_id, delta)
+
+    async def adjust_balance(
+        self,
+        user_id: str,
+        delta: str | Decimal | float | int,
+        *,
+        non_negative: bool = False,
+    ) -> Decimal:
+        """Atomically add ``delta`` to a balance and return the new balance.
+
+        With ``non_negative=True`` the update only applies when the resulting balance
+        stays at or above zero, which makes debits safe under concurrency.
+        """
+        amount = Decimal(str(delta))
+        stmt = (
+            update(User)
+            .where(User.id == user_id)
+            .values(token_balance=User.token_balance + amount)
+            .returning(User.token_balance)
+        )
+        if non_negative:
+            stmt = stmt.where(User.token_balance + amount >= 0)
+        balance = await self.session.scalar(stmt)
+        if balance is None:
+            if non_negative and await self.get_user(user_id):
+                raise InsufficientBalanceError(f"User {user_id} has insufficient balance")
             raise NoResultFound(f"User {user_id} not found")
-        current = Decimal(user.token_balance or 0)
-        user.token_balance = current + Decimal(str(delta))
-        await self.session.flush()
-        await self.session.refresh(user)
+        return balance
+
+    async def adjust_balances(self, deltas: Mapping[str, Decimal]) -> dict[str, Decimal]:
+        """Apply many balance deltas with one ``UPDATE ... FROM (VALUES ...)``.
+
+        Returns the new balance of every user that was updated.
+        """
+        if not deltas:
+            return {}
+        delta_rows = values(
+            column("user_id", String),
+            column("delta", Numeric(10, 2)),
+            name="balance_deltas",
+        ).data([(user_id, Decimal(str(delta))) for user_id, delta in deltas.items()])
+        result = await self.session.execute(
+            update(User)
+            .where(User.id == delta_rows.c.user_id)
+            .values(token_balance=User.token_balance + delta_rows.c.delta)
+            .returning(User.id, User.token_balance)
+            .execution_options(synchronize_session=False)
+        )
+        return {row.id: row.token_balance for row in result}
 
     # ------------------------------------------------------------------
     # Courses
     # ------------------------------------------------------------------
-    async def get_courses(self, category: CourseCategory | None = None, only_visible: bool = True) -> Sequence[Course]:
+    async def get_courses(
+        self,
+        category: CourseCategory | None = None,
+        only_visible: bool = True,
+        columns: Sequence[str] | None = None,
+    ) -> Sequence[Course]:
+        """Courses in id order; ``columns`` limits the loaded attributes (others stay unset)."""
+        columns = tuple(sorted(columns)) if columns is not None else None
+        key = ("courses", category if category and category != "all" else None, only_visible, columns)
+        cached, version = self._catalog_lookup(key)
+        if cached is not None:
+            return cached
         stmt = select(Course)
+        if columns is not None:
+            stmt = stmt.options(load_only(*(getattr(Course, name) for name in columns)))
         if category and category != "all":
             stmt = stmt.where(Course.category == category)
         if only_visible:
             stmt = stmt.where(Course.is_active.is_(True), Course.is_visible.is_(True))
         stmt = stmt.order_by(Course.id)
         result = await self.session.execute(stmt)
-        return result.scalars().all()
+        return self.catalog_cache.put(key, version, [snapshot(row) for row in result.scalars()])
 
     async def get_course(self, course_id: int) -> Course | None:
         result = await self.session.execute(select(Course).where(Course.id == course_id))
         return result.scalar_one_or_none()
 
     async def update_course(self, course_id: int, data: dict) -> Course:
-        course = await self.get_course(course_id)
+        await mark_catalog_changed(self.session)
+        course = await update_returning(self.session, Course, course_id, data)
         if not course:
             raise NoResultFound(f"Course {course_id} not found")
-        for key, value in data.items():
-            if hasattr(course, key) and value is not None:
-                setattr(course, key, value)
-        course.updated_at = datetime.utcnow()
-        await self.session.flush()
-        await self.session.refresh(course)
         return course
 
     async def create_course(self, data: dict) -> Course:
-        course = Course(**data)
-        self.session.add(course)
-        await self.session.flush()
-        await self.session.refresh(course)
-        return course
+        await mark_catalog_changed(self.session)
+        return await insert_returning(self.session, Course, data)
 
     async def delete_course(self, course_id: int, *, permanent: bool = False) -> None:
+        await mark_catalog_changed(self.session)
         course = await self.get_course(course_id)
         if not course:
             raise NoResultFound(f"Course {course_id} not found")
@@ -134,6 +234,7 @@ class StorageService:
             await self.session.flush()
 
     async def update_course_visibility(self, course_id: int, is_visible: bool) -> None:
+        await mark_catalog_changed(self.session)
         course = await self.get_course(course_id)
         if not course:
             raise NoResultFound(f"Course {course_id} not found")
@@ -145,40 +246,37 @@ class StorageService:
     # Lessons
     # ------------------------------------------------------------------
     async def get_course_lessons(self, course_id: int) -> Sequence[CourseLesson]:
+        key = ("lessons", course_id)
+        cached, version = self._catalog_lookup(key)
+        if cached is not None:
+            return cached
         result = await self.session.execute(
             select(CourseLesson)
             .where(CourseLesson.course_id == course_id)
             .order_by(CourseLesson.order_index)
         )
-        return result.scalars().all()
+        return self.catalog_cache.put(key, version, [snapshot(row) for row in result.scalars()])
 
     async def create_course_lesson(self, data: dict) -> CourseLesson:
-        lesson = CourseLesson(**data)
-        self.session.add(lesson)
-        await self.session.flush()
-        await self.session.refresh(lesson)
-        return lesson
+        await mark_catalog_changed(self.session)
+        return await insert_returning(self.session, CourseLesson, data)
 
     async def update_course_lesson(self, lesson_id: int, data: dict) -> CourseLesson:
-        result = await self.session.execute(select(CourseLesson).where(CourseLesson.id == lesson_id))
-        lesson = result.scalar_one_or_none()
+        await mark_catalog_changed(self.session)
+        lesson = await update_returning(self.session, CourseLesson, lesson_id, data)
         if not lesson:
             raise NoResultFound(f"Course lesson {lesson_id} not found")
-        for key, value in data.items():
-            if hasattr(lesson, key) and value is not None:
-                setattr(lesson, key, value)
-        lesson.updated_at = datetime.utcnow()
-        await self.session.flush()
-        await self.session.refresh(lesson)
         return lesson
 
     async def delete_course_lesson(self, lesson_id: int) -> None:
+        await mark_catalog_changed(self.session)
         lesson = await self.session.get(CourseLesson, lesson_id)
         if not lesson:
             raise NoResultFound(f"Course lesson {lesson_id} not found")
         await self.session.delete(lesson)
 
     async def generate_course_lessons(self, course_id: int, number_of_lessons: int) -> Sequence[CourseLesson]:
+        await mark_catalog_changed(self.session)
         # delete existing
         await self.session.execute(delete(CourseLesson).where(CourseLesson.course_id == course_id))
         lessons = [
@@ -202,8 +300,22 @@ class StorageService:
     # ------------------------------------------------------------------
     # Books
     # ------------------------------------------------------------------
-    async def get_books(self, category: BookCategory | None = None, search: str | None = None, only_visible: bool = True) -> Sequence[Book]:
+    async def get_books(
+        self,
+        category: BookCategory | None = None,
+        search: str | None = None,
+        only_visible: bool = True,
+        columns: Sequence[str] | None = None,
+    ) -> Sequence[Book]:
+        """Books in id order; ``columns`` limits the loaded attributes (others stay unset)."""
+        columns = tuple(sorted(columns)) if columns is not None else None
+        key = ("books", category if category and category != "all" else None, search or None, only_visible, columns)
+        cached, version = self._catalog_lookup(key)
+        if cached is not None:
+            return cached
         stmt = select(Book)
+        if columns is not None:
+            stmt = stmt.options(load_only(*(getattr(Book, name) for name in columns)))
         if category and category != "all":
             stmt = stmt.where(Book.category == category)
         if search:
@@ -212,32 +324,25 @@ class StorageService:
             stmt = stmt.where(Book.is_active.is_(True), Book.is_visible.is_(True))
         stmt = stmt.order_by(Book.id)
         result = await self.session.execute(stmt)
-        return result.scalars().all()
+        return self.catalog_cache.put(key, version, [snapshot(row) for row in result.scalars()])
 
     async def get_book(self, book_id: int) -> Book | None:
         result = await self.session.execute(select(Book).where(Book.id == book_id))
         return result.scalar_one_or_none()
 
     async def update_book(self, book_id: int, data: dict) -> Book:
-        book = await self.get_book(book_id)
+        await mark_catalog_changed(self.session)
+        book = await update_returning(self.session, Book, book_id, data)
         if not book:
             raise NoResultFound(f"Book {book_id} not found")
-        for key, value in data.items():
-            if hasattr(book, key) and value is not None:
-                setattr(book, key, value)
-        book.updated_at = datetime.utcnow()
-        await self.session.flush()
-        await self.session.refresh(book)
         return book
 
     async def create_book(self, data: dict) -> Book:
-        book = Book(**data)
-        self.session.add(book)
-        await self.session.flush()
-        await self.session.refresh(book)
-        return book
+        await mark_catalog_changed(self.session)
+        return await insert_returning(self.session, Book, data)
 
     async def delete_book(self, book_id: int, *, permanent: bool = False) -> None:
+        await mark_catalog_changed(self.session)
         book = await self.get_book(book_id)
         if not book:
             raise NoResultFound(f"Book {book_id} not found")
@@ -248,6 +353,7 @@ class StorageService:
             await self.session.flush()
 
     async def update_book_visibility(self, book_id: int, is_visible: bool) -> None:
+        await mark_catalog_changed(self.session)
         book = await self.get_book(book_id)
         if not book:
             raise NoResultFound(f"Book {book_id} not found")
@@ -259,39 +365,37 @@ class StorageService:
     # Chapters
     # ------------------------------------------------------------------
     async def get_book_chapters(self, book_id: int) -> Sequence[BookChapter]:
+        key = ("chapters", book_id)
+        cached, version = self._catalog_lookup(key)
+        if cached is not None:
+            return cached
         result = await self.session.execute(
             select(BookChapter)
             .where(BookChapter.book_id == book_id)
             .order_by(BookChapter.order_index)
         )
-        return result.scalars().all()
+        return self.catalog_cache.put(key, version, [snapshot(row) for row in result.scalars()])
 
     async def create_book_chapter(self, data: dict) -> BookChapter:
-        chapter = BookChapter(**data)
-        self.session.add(chapter)
-        await self.session.flush()
-        await self.session.refresh(chapter)
-        return chapter
+        await mark_catalog_changed(self.session)
+        return await insert_returning(self.session, BookChapter, data)
 
     async def update_book_chapter(self, chapter_id: int, data: dict) -> BookChapter:
-        chapter = await self.session.get(BookChapter, chapter_id)
+        await mark_catalog_changed(self.session)
+        chapter = await update_returning(self.session, BookChapter, chapter_id, data)
         if not chapter:
             raise NoResultFound(f"Book chapter {chapter_id} not found")
-        for key, value in data.items():
-            if hasattr(chapter, key) and value is not None:
-                setattr(chapter, key, value)
-        chapter.updated_at = datetime.utcnow()
-        await self.session.flush()
-        await self.session.refresh(chapter)
         return chapter
 
     async def delete_book_chapter(self, chapter_id: int) -> None:
+        await mark_catalog_changed(self.session)
         chapter = await self.session.get(BookChapter, chapter_id)
         if not chapter:
             raise NoResultFound(f"Book chapter {chapter_id} not found")
         await self.session.delete(chapter)
 
     async def generate_book_chapters(self, book_id: int, number_of_chapters: int) -> Sequence[BookChapter]:
+        await mark_catalog_changed(self.session)
         await self.session.execute(delete(BookChapter).where(BookChapter.book_id == book_id))
         chapters = [
             BookChapter(
@@ -311,18 +415,45 @@ class StorageService:
     # ------------------------------------------------------------------
     # Enrollments & Purchases
     # ------------------------------------------------------------------
+    @staticmethod
+    def _insert_with_parents(model: type, data: dict, parents: Sequence[tuple[str, Any, Any]]) -> Insert:
+        """``INSERT INTO model SELECT <data> WHERE <each parent row exists>``.
+
+        ``parents`` are ``(label, key column, key)`` triples. A missing parent makes
+        the statement insert nothing instead of failing its foreign key, which would
+        abort the whole transaction.
+        """
+        columns = model.__table__.c
+        source = select(*(literal(value, columns[key].type) for key, value in data.items())).where(
+            *(exists().where(key_column == key) for _, key_column, key in parents)
+        )
+        return pg_insert(model).from_select(list(data), source)
+
+    async def _require_parents(self, parents: Sequence[tuple[str, Any, Any]]) -> None:
+        """Raise ``NoResultFound`` for the first parent row that does not exist."""
+        checks = select(*(exists().where(key_column == key) for _, key_column, key in parents))
+        found = (await self.session.execute(checks)).one()
+        for (label, _, key), present in zip(parents, found):
+            if not present:
+                raise NoResultFound(f"{label} {key} not found")
+
     async def enroll_user(self, data: dict) -> Enrollment:
-        stmt = select(Enrollment).where(
-            Enrollment.user_id == data["user_id"],
-            Enrollment.course_id == data["course_id"],
+        """Insert the enrollment in one statement.
+
+        Raises ``ValueError`` if it already exists and ``NoResultFound`` if the user
+        or course does not.
+        """
+        parents = [("User", User.id, data["user_id"]), ("Course", Course.id, data["course_id"])]
+        stmt = (
+            self._insert_with_parents(Enrollment, data, parents)
+            .on_conflict_do_nothing(constraint="enrollments_user_course_key")
+            .returning(Enrollment)
         )
-        result = await self.session.execute(stmt)
-        if result.scalar_one_or_none():
+        enrollment = await self.session.scalar(stmt)
+        if enrollment is None:
+            # Only now tell a missing user or course apart from an existing enrollment.
+            await self._require_parents(parents)
             raise ValueError("User is already enrolled in this course")
-        enrollment = Enrollment(**data)
-        self.session.add(enrollment)
-        await self.session.flush()
-        await self.session.refresh(enrollment)
         return enrollment
 
     async def get_user_enrollments(self, user_id: str) -> Sequence[Enrollment]:
@@ -342,17 +473,40 @@ class StorageService:
         await self.session.flush()
 
     async def purchase_book(self, data: dict) -> BookPurchase:
-        stmt = select(BookPurchase).where(
-            BookPurchase.user_id == data["user_id"],
-            BookPurchase.book_id == data["book_id"],
+        """Record a purchase and debit the book's price from the buyer's balance.
+
+        Raises ``ValueError`` if the user already owns the book, ``NoResultFound``
+        if the user or book does not exist and ``InsufficientBalanceError`` if the
+        balance does not cover the price; the purchase row is then discarded with
+        the rest of the transaction.
+        """
+        parents = [("User", User.id, data["user_id"]), ("Book", Book.id, data["book_id"])]
+        book = select(Book).where(Book.id == data["book_id"])
+        stmt = (
+            self._insert_with_parents(BookPurchase, data, parents)
+            .on_conflict_do_nothing(constraint="book_purchases_user_book_key")
+            .returning(
+                BookPurchase,
+                book.with_only_columns(Book.price).scalar_subquery(),
+                book.with_only_columns(Book.title).scalar_subquery(),
+            )
         )
-        result = await self.session.execute(stmt)
-        if result.scalar_one_or_none():
+        row = (await self.session.execute(stmt)).one_or_none()
+        if row is None:
+            await self._require_parents(parents)
             raise ValueError("User has already purchased this book")
-        purchase = BookPurchase(**data)
-        self.session.add(purchase)
-        await self.session.flush()
-        await self.session.refresh(purchase)
+        purchase, price, title = row
+        if price:
+            await self.adjust_balance(purchase.user_id, -price, non_negative=True)
+            # Flushed with the commit, in the same transaction as the debit.
+            self.session.add(
+                Transaction(
+                    user_id=purchase.user_id,
+                    type=TransactionType.PURCHASE,
+                    amount=-price,
+                    description=f"Purchased book: {title}",
+                )
+            )
         return purchase
 
     async def get_user_books(self, user_id: str) -> Sequence[BookPurchase]:
@@ -367,23 +521,37 @@ class StorageService:
     # Transactions
     # ------------------------------------------------------------------
     async def create_transaction(self, data: dict) -> Transaction:
-        transaction = Transaction(**data)
-        self.session.add(transaction)
-        await self.session.flush()
-        await self.session.refresh(transaction)
-        return transaction
+        return await insert_returning(self.session, Transaction, data)
 
-    async def get_user_transactions(self, user_id: str, limit: int | None = None) -> Sequence[Transaction]:
+    async def get_user_transactions(
+        self,
+        user_id: str,
+        limit: int | None = None,
+        before: tuple[datetime, int] | None = None,
+    ) -> Sequence[Transaction]:
+        """Newest first; ``before`` continues after the ``(created_at, id)`` key of a previous page."""
         stmt = (
             select(Transaction)
             .where(Transaction.user_id == user_id)
-            .order_by(desc(Transaction.created_at))
+            .order_by(desc(Transaction.created_at), desc(Transaction.id))
         )
+        if before is not None:
+            stmt = stmt.where(tuple_(Transaction.created_at, Transaction.id) < tuple_(*before))
         if limit:
             stmt = stmt.limit(limit)
         result = await self.session.execute(stmt)
         return result.scalars().all()
 
+    async def get_transaction_totals(self, user_id: str) -> Sequence[tuple[TransactionType, int, Decimal]]:
+        """``(type, count, total amount)`` per transaction type, in one aggregate query."""
+        result = await self.session.execute(
+            select(Transaction.type, func.count(), func.sum(Transaction.amount))
+            .where(Transaction.user_id == user_id)
+            .group_by(Transaction.type)
+            .order_by(Transaction.type)
+        )
+        return [tuple(row) for row in result]
+
     # ------------------------------------------------------------------
     # Sponsor channels & subscriptions
     # ------------------------------------------------------------------
@@ -394,18 +562,10 @@ class StorageService:
         return result.scalars().all()
 
     async def create_sponsor_channel(self, data: dict) -> SponsorChannel:
-        channel = SponsorChannel(**data)
-        self.session.add(channel)
-        await self.session.flush()
-        await self.session.refresh(channel)
-        return channel
+        return await insert_returning(self.session, SponsorChannel, data)
 
     async def subscribe_to_channel(self, data: dict) -> ChannelSubscription:
-        subscription = ChannelSubscription(**data)
-        self.session.add(subscription)
-        await self.session.flush()
-        await self.session.refresh(subscription)
-        return subscription
+        return await insert_returning(self.session, ChannelSubscription, data)
 
     async def get_user_subscriptions(self, user_id: str) -> Sequence[ChannelSubscription]:
         result = await self.session.execute(
@@ -434,11 +594,7 @@ class StorageService:
         return result.scalar_one_or_none()
 
     async def create_daily_challenge(self, data: dict) -> DailyChallenge:
-        challenge = DailyChallenge(**data)
-        self.session.add(challenge)
-        await self.session.flush()
-        await self.session.refresh(challenge)
-        return challenge
+        return await insert_returning(self.session, DailyChallenge, data)
 
     async def update_daily_challenge(self, challenge_id: int, data: dict) -> None:
         challenge = await self.session.get(DailyChallenge, challenge_id)
@@ -462,25 +618,24 @@ class StorageService:
         return result.scalar_one_or_none()
 
     async def upsert_book_progress(self, user_id: str, book_id: int, current_chapter: int) -> BookReadingProgress:
-        progress = await self.get_book_reading_progress(user_id, book_id)
-        if progress:
-            progress.current_chapter = current_chapter
-            progress.updated_at = datetime.utcnow()
-        else:
-            chapters_result = await self.session.execute(
-                select(func.count()).select_from(BookChapter).where(BookChapter.book_id == book_id)
-            )
-            total = chapters_result.scalar_one()
-            progress = BookReadingProgress(
-                user_id=user_id,
-                book_id=book_id,
-                current_chapter=current_chapter,
-                total_chapters=total,
+        # The chapter count subquery only runs when the row is new.
+        stmt = pg_insert(BookReadingProgress).values(
+            user_id=user_id,
+            book_id=book_id,
+            current_chapter=current_chapter,
+            total_chapters=select(func.count())
+            .select_from(BookChapter)
+            .where(BookChapter.book_id == book_id)
+            .scalar_subquery(),
+        )
+        return await self.session.scalar(
+            stmt.on_conflict_do_update(
+                constraint="book_reading_progress_user_book_key",
+                set_={"current_chapter": stmt.excluded.current_chapter, "updated_at": func.now()},
             )
-            self.session.add(progress)
-        await self.session.flush()
-        await self.session.refresh(progress)
-        return progress
+            .returning(BookReadingProgress)
+            .execution_options(populate_existing=True)
+        )
 
     async def complete_book_reading(self, user_id: str, book_id: int) -> None:
         progress = await self.get_book_reading_progress(user_id, book_id)
@@ -507,25 +662,24 @@ class StorageService:
         return result.scalar_one_or_none()
 
     async def upsert_course_progress(self, user_id: str, course_id: int, current_lesson: int) -> CourseReadingProgress:
-        progress = await self.get_course_reading_progress(user_id, course_id)
-        if progress:
-            progress.current_lesson = current_lesson
-            progress.updated_at = datetime.utcnow()
-        else:
-            lessons_result = await self.session.execute(
-                select(func.count()).select_from(CourseLesson).where(CourseLesson.course_id == course_id)
-            )
-            total = lessons_result.scalar_one()
-            progress = CourseReadingProgress(
-                user_id=user_id,
-                course_id=course_id,
-                current_lesson=current_lesson,
-                total_lessons=total,
+        # The lesson count subquery only runs when the row is new.
+        stmt = pg_insert(CourseReadingProgress).values(
+            user_id=user_id,
+            course_id=course_id,
+            current_lesson=current_lesson,
+            total_lessons=select(func.count())
+            .select_from(CourseLesson)
+            .where(CourseLesson.course_id == course_id)
+            .scalar_subquery(),
+        )
+        return await self.session.scalar(
+            stmt.on_conflict_do_update(
+                constraint="course_reading_progress_user_course_key",
+                set_={"current_lesson": stmt.excluded.current_lesson, "updated_at": func.now()},
             )
-            self.session.add(progress)
-        await self.session.flush()
-        await self.session.refresh(progress)
-        return progress
+            .returning(CourseReadingProgress)
+            .execution_options(populate_existing=True)
+        )
 
     async def complete_course_reading(self, user_id: str, course_id: int) -> None:
         progress = await self.get_course_reading_progress(user_id, course_id)
@@ -546,22 +700,12 @@ class StorageService:
         return result.scalars().all()
 
     async def create_chapter_test(self, data: dict) -> ChapterTest:
-        test = ChapterTest(**data)
-        self.session.add(test)
-        await self.session.flush()
-        await self.session.refresh(test)
-        return test
+        return await insert_returning(self.session, ChapterTest, data)
 
     async def update_chapter_test(self, test_id: int, data: dict) -> ChapterTest:
-        test = await self.session.get(ChapterTest, test_id)
+        test = await update_returning(self.session, ChapterTest, test_id, data)
         if not test:
             raise NoResultFound(f"Chapter test {test_id} not found")
-        for key, value in data.items():
-            if hasattr(test, key) and value is not None:
-                setattr(test, key, value)
-        test.updated_at = datetime.utcnow()
-        await self.session.flush()
-        await self.session.refresh(test)
         return test
 
     async def delete_chapter_test(self, test_id: int) -> None:
@@ -577,22 +721,12 @@ class StorageService:
         return result.scalars().all()
 
     async def create_lesson_test(self, data: dict) -> LessonTest:
-        test = LessonTest(**data)
-        self.session.add(test)
-        await self.session.flush()
-        await self.session.refresh(test)
-        return test
+        return await insert_returning(self.session, LessonTest, data)
 
     async def update_lesson_test(self, test_id: int, data: dict) -> LessonTest:
-        test = await self.session.get(LessonTest, test_id)
+        test = await update_returning(self.session, LessonTest, test_id, data)
         if not test:
             raise NoResultFound(f"Lesson test {test_id} not found")
-        for key, value in data.items():
-            if hasattr(test, key) and value is not None:
-                setattr(test, key, value)
-        test.updated_at = datetime.utcnow()
-        await self.session.flush()
-        await self.session.refresh(test)
         return test
 
     async def delete_lesson_test(self, test_id: int) -> None:
@@ -602,11 +736,7 @@ class StorageService:
         await self.session.delete(test)
 
     async def submit_test_attempt(self, data: dict) -> TestAttempt:
-        attempt = TestAttempt(**data)
-        self.session.add(attempt)
-        await self.session.flush()
-        await self.session.refresh(attempt)
-        return attempt
+        return await insert_returning(self.session, TestAttempt, data)
 
     async def get_user_test_attempts(self, user_id: str, test_type: str, test_id: int) -> Sequence[TestAttempt]:
         result = await self.session.execute(
@@ -651,10 +781,29 @@ class StorageService:
         result = await self.session.execute(select(Book).order_by(Book.id))
         return result.scalars().all()
 
-    async def get_all_users(self) -> Sequence[User]:
-        result = await self.session.execute(select(User).order_by(desc(User.created_at)))
+    async def get_users_page(self, limit: int, after: tuple[datetime, str] | None = None) -> Sequence[User]:
+        """Up to ``limit`` users newest first, continuing after the ``(created_at, id)`` key ``after``."""
+        stmt = select(User).order_by(desc(User.created_at), desc(User.id)).limit(limit)
+        if after is not None:
+            stmt = stmt.where(tuple_(User.created_at, User.id) < tuple_(*after))
+        result = await self.session.execute(stmt)
         return result.scalars().all()
 
+    async def stream_users(self, batch_size: int = 1000) -> AsyncIterator[Sequence[Row]]:
+        """All users newest first, in batches read through a server-side cursor.
+
+        Yields plain rows (attribute access by column name) rather than ORM objects,
+        so nothing piles up in the session's identity map however many users there are.
+        """
+        stmt = (
+            select(*User.__table__.columns)
+            .order_by(desc(User.created_at), desc(User.id))
+            .execution_options(yield_per=batch_size)
+        )
+        result = await self.session.stream(stmt)
+        async for batch in result.partitions():
+            yield batch
+
     # ------------------------------------------------------------------
     # Text content
     # ------------------------------------------------------------------
@@ -675,22 +824,12 @@ class StorageService:
         return result.scalars().all()
 
     async def create_text_content(self, data: dict) -> TextContent:
-        content = TextContent(**data)
-        self.session.add(content)
-        await self.session.flush()
-        await self.session.refresh(content)
-        return content
+        return await insert_returning(self.session, TextContent, data)
 
     async def update_text_content(self, content_id: int, data: dict) -> TextContent:
-        content = await self.session.get(TextContent, content_id)
+        content = await update_returning(self.session, TextContent, content_id, data)
         if not content:
             raise NoResultFound(f"Text content {content_id} not found")
-        for key, value in data.items():
-            if hasattr(content, key) and value is not None:
-                setattr(content, key, value)
-        content.updated_at = datetime.utcnow()
-        await self.session.flush()
-        await self.session.refresh(content)
         return content
 
     async def delete_text_content(self, content_id: int) -> None:
@@ -712,17 +851,42 @@ class StorageService:
         counter = result.scalar_one_or_none()
         if counter:
             return counter
-        counter = UserDailyCounter(user_id=user_id, date=date)
-        self.session.add(counter)
-        await self.session.flush()
-        await self.session.refresh(counter)
+        # A concurrent first reward of the day may create the row between the two
+        # statements; DO NOTHING keeps that race off the unique_user_date constraint.
+        counter = await self.session.scalar(
+            pg_insert(UserDailyCounter)
+            .values(user_id=user_id, date=date)
+            .on_conflict_do_nothing(index_elements=[UserDailyCounter.user_id, UserDailyCounter.date])
+            .returning(UserDailyCounter)
+        )
+        if counter is None:
+            result = await self.session.execute(
+                select(UserDailyCounter).where(
+                    UserDailyCounter.user_id == user_id,
+                    UserDailyCounter.date == date,
+                )
+            )
+            counter = result.scalar_one()
         return counter
 
-    async def record_reward(self, data: dict) -> UserReward:
-        reward = UserReward(**data)
-        self.session.add(reward)
-        await self.session.flush()
-        await self.session.refresh(reward)
+    async def count_daily_counters(self) -> int:
+        return await self.session.scalar(select(func.count()).select_from(UserDailyCounter))
+
+    async def record_reward(self, data: dict) -> UserReward | None:
+        """Insert a reward; return ``None`` if its idempotency key is already recorded.
+
+        The emission rollup is left to the caller (``add_reward_emission``), so a batch
+        can fold all of its rewards in with one sorted upsert.
+        """
+        # Key by Column objects: ``metadata`` is a reserved attribute on ORM entities.
+        table = UserReward.__table__
+        (row,) = self._sql_null_metadata([data])
+        reward = await self.session.scalar(
+            pg_insert(UserReward)
+            .values({table.c[name]: value for name, value in row.items()})
+            .on_conflict_do_nothing(index_elements=[UserReward.idempotency_key])
+            .returning(UserReward)
+        )
         return reward
 
     async def reward_exists(self, idempotency_key: str) -> bool:
@@ -741,15 +905,255 @@ class StorageService:
         courses: int = 0,
         subs: int = 0,
     ) -> UserDailyCounter:
-        counter = await self.get_daily_counter(user_id, date)
-        counter.steps_mind += steps
-        counter.books_mind += books
-        counter.courses_mind += courses
-        counter.subs_mind += subs
-        counter.updated_at = datetime.utcnow()
-        await self.session.flush()
-        await self.session.refresh(counter)
-        return counter
+        """Add to a daily counter with a single upsert and return the updated row."""
+        rows = [
+            {
+                "user_id": user_id,
+                "date": date,
+                "steps_mind": steps,
+                "books_mind": books,
+                "courses_mind": courses,
+                "subs_mind": subs,
+            }
+        ]
+        counters = await self.increment_daily_counters(rows)
+        return counters[0]
+
+    async def lock_users(self, user_ids: Iterable[str]) -> None:
+        """Serialise reward processing per user until the current transaction ends.
+
+        Takes transaction-scoped advisory locks, so requests for different users never
+        wait on each other. Keys are acquired in sorted order to rule out deadlocks
+        between multi-user batches; users already locked in this transaction are skipped.
+        """
+        transaction = self.session.sync_session.get_transaction()
+        held_by = self.session.info.get("locked_users")
+        if held_by is None or held_by[0] is not transaction:
+            held_by = (transaction, set())
+            self.session.info["locked_users"] = held_by
+        held = held_by[1]
+        keys = sorted({user_lock_key(user_id) for user_id in user_ids} - held)
+        if not keys:
+            return
+        locks = values(column("key", Integer), name="user_locks").data([(key,) for key in keys])
+        # ORDER BY makes Postgres take the locks in key order: a volatile select-list
+        # function is evaluated after the sort, row by row.
+        await self.session.execute(
+            select(func.pg_advisory_xact_lock(USER_LOCK_NAMESPACE, locks.c.key)).order_by(locks.c.key)
+        )
+        held.update(keys)
+
+    # ------------------------------------------------------------------
+    # Rewards (bulk helpers)
+    # ------------------------------------------------------------------
+    async def get_existing_reward_keys(self, idempotency_keys: Iterable[str]) -> set[str]:
+        keys = list(set(idempotency_keys))
+        if not keys:
+            return set()
+        result = await self.session.execute(
+            select(UserReward.idempotency_key).where(UserReward.idempotency_key.in_(keys))
+        )
+        return set(result.scalars().all())
+
+    async def get_daily_counter_values(
+        self,
+        keys: Iterable[tuple[str, str]],
+    ) -> dict[tuple[str, str], dict[str, int]]:
+        """Return counter columns for every existing ``(user_id, date)`` pair."""
+        pairs = list(set(keys))
+        if not pairs:
+            return {}
+        result = await self.session.execute(
+            select(
+                UserDailyCounter.user_id,
+                UserDailyCounter.date,
+                *(getattr(UserDailyCounter, name) for name in DAILY_COUNTER_COLUMNS),
+            ).where(tuple_(UserDailyCounter.user_id, UserDailyCounter.date).in_(pairs))
+        )
+        return {
+            (row.user_id, row.date): {name: getattr(row, name) or 0 for name in DAILY_COUNTER_COLUMNS}
+            for row in result
+        }
 
+    @staticmethod
+    def _sql_null_metadata(rows: Sequence[dict]) -> list[dict]:
+        # Core inserts store ``None`` as JSON ``null``; the ORM path writes SQL NULL.
+        return [row if row.get("metadata") is not None else {**row, "metadata": null()} for row in rows]
+
+    async def record_rewards(self, rows: Sequence[dict]) -> set[str]:
+        """Insert rewards in one statement; return the idempotency keys actually written."""
+        if not rows:
+            return set()
+        # Insert through the Table: ``metadata`` is a column here but a reserved ORM attribute.
+        stmt = (
+            pg_insert(UserReward.__table__)
+            .values(self._sql_null_metadata(rows))
+            .on_conflict_do_nothing(index_elements=[UserReward.idempotency_key])
+            .returning(UserReward.idempotency_key)
+        )
+        result = await self.session.execute(stmt)
+        inserted = set(result.scalars().all())
+        await self.add_reward_emission([row for row in rows if row["idempotency_key"] in inserted])
+        return inserted
+
+    async def add_reward_emission(self, rewards: Sequence[dict]) -> None:
+        """Fold newly recorded rewards into the ``reward_emission_daily`` rollup."""
+        totals: dict[tuple[date_type, str, int], list[int]] = defaultdict(lambda: [0, 0])
+        for reward in rewards:
+            day = (reward.get("timestamp") or datetime.utcnow()).date()
+            shard = user_lock_key(reward["user_id"]) % EMISSION_SHARDS
+            total = totals[(day, reward["action_id"], shard)]
+            total[0] += reward["mind_amount"]
+            total[1] += 1
+        if not totals:
+            return
+        # Sorted keys make concurrent upserts lock rollup rows in the same order.
+        stmt = pg_insert(RewardEmissionDaily).values(
+            [
+                {"date": day, "action_id": action_id, "shard": shard, "total_mind": mind, "reward_count": count}
+                for (day, action_id, shard), (mind, count) in sorted(totals.items())
+            ]
+        )
+        await self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[RewardEmissionDaily.date, RewardEmissionDaily.action_id, RewardEmissionDaily.shard],
+                set_={
+                    "total_mind": RewardEmissionDaily.total_mind + stmt.excluded.total_mind,
+                    "reward_count": RewardEmissionDaily.reward_count + stmt.excluded.reward_count,
+                    "updated_at": func.now(),
+                },
+            )
+        )
+
+    async def _emission_source(self, since: date_type | None) -> tuple[tuple, list]:
+        """``(date, action_id, mind, count)`` expressions to aggregate emission from, and the ``since`` filter.
+
+        The rollup once ``scripts/backfill_emission.py`` has reconciled it with
+        ``user_rewards``; until then it is missing history, so ``user_rewards`` itself.
+        """
+        if await self.session.scalar(select(RewardEmissionBackfill.id).limit(1)) is not None:
+            source = (
+                RewardEmissionDaily.date,
+                RewardEmissionDaily.action_id,
+                RewardEmissionDaily.total_mind,
+                RewardEmissionDaily.reward_count,
+            )
+            return source, [RewardEmissionDaily.date >= since] if since is not None else []
+        source = (cast(UserReward.timestamp, Date), UserReward.action_id, UserReward.mind_amount, literal(1))
+        return source, [UserReward.timestamp >= datetime.combine(since, time.min)] if since is not None else []
+
+    async def get_emission_total(self, since: date_type | None = None) -> int:
+        """Sum of MIND emitted on or after ``since`` (all time when omitted)."""
+        (_, _, mind, _), conditions = await self._emission_source(since)
+        return int(await self.session.scalar(select(func.coalesce(func.sum(mind), 0)).where(*conditions)))
+
+    async def get_emission_daily(self, since: date_type) -> Sequence[tuple[date_type, str, int, int]]:
+        """Per-day, per-action ``(date, action_id, total_mind, reward_count)`` since ``since``."""
+        (day, action_id, mind, count), conditions = await self._emission_source(since)
+        result = await self.session.execute(
+            select(day, action_id, func.sum(mind), func.sum(count))
+            .where(*conditions)
+            .group_by(day, action_id)
+            .order_by(day, action_id)
+        )
+        return [(day, action_id, int(mind), int(count)) for day, action_id, mind, count in result]
+
+    async def create_transactions(self, rows: Sequence[dict]) -> None:
+        if not rows:
+            return
+        await self.session.execute(pg_insert(Transaction.__table__).values(self._sql_null_metadata(rows)))
+
+    async def increment_daily_counters(self, rows: Sequence[dict]) -> Sequence[UserDailyCounter]:
+        """Upsert many ``(user_id, date)`` counter increments in one statement.
+
+        Every row must carry ``user_id``, ``date`` and all of ``DAILY_COUNTER_COLUMNS``.
+        Increments are added as given: daily caps are applied by the reward engine
+        while it holds the users' ``lock_users`` locks, not here.
+        """
+        if not rows:
+            return []
+        stmt = pg_insert(UserDailyCounter).values(list(rows))
+        set_ = {
+            name: getattr(UserDailyCounter, name) + getattr(stmt.excluded, name) for name in DAILY_COUNTER_COLUMNS
+        }
+        set_["updated_at"] = func.now()
+        result = await self.session.scalars(
+            stmt.on_conflict_do_update(
+                index_elements=[UserDailyCounter.user_id, UserDailyCounter.date],
+                set_=set_,
+            )
+            .returning(UserDailyCounter)
+            .execution_options(populate_existing=True)
+        )
+        return result.all()
+
+    # ------------------------------------------------------------------
+    # Reward outbox
+    # ------------------------------------------------------------------
+    async def enqueue_reward_events(self, rows: Sequence[dict]) -> None:
+        if not rows:
+            return
+        await self.session.execute(pg_insert(RewardOutbox.__table__).values(list(rows)))
+
+    async def try_lock_outbox_partition(self, partition: int) -> bool:
+        """Take the transaction-scoped advisory lock that serialises one outbox partition."""
+        return bool(
+            await self.session.scalar(select(func.pg_try_advisory_xact_lock(OUTBOX_LOCK_NAMESPACE, partition)))
+        )
+
+    async def claim_reward_outbox(self, partition: int, limit: int) -> Sequence[RewardOutbox]:
+        """Lock the oldest pending events of a partition that are due, in insertion order.
+
+        Claiming stops at the first event still waiting for a retry so a user's later
+        events never overtake an earlier one.
+        """
+        result = await self.session.execute(
+            select(RewardOutbox, RewardOutbox.available_at <= func.now())
+            .where(RewardOutbox.partition == partition, RewardOutbox.status == OUTBOX_PENDING)
+            .order_by(RewardOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        claimed = []
+        for row, due in result:
+            if not due:
+                break
+            claimed.append(row)
+        return claimed
+
+    async def delete_reward_outbox(self, ids: Sequence[int]) -> None:
+        if ids:
+            await self.session.execute(delete(RewardOutbox).where(RewardOutbox.id.in_(ids)))
+
+    async def reschedule_reward_outbox(
+        self,
+        ids: Sequence[int],
+        error: str,
+        *,
+        retry_delay: float,
+        max_attempts: int,
+    ) -> None:
+        """Push failed events back with exponential backoff; park them once out of attempts."""
+        if not ids:
+            return
+        attempts = RewardOutbox.attempts + 1
+        backoff = func.make_interval(0, 0, 0, 0, 0, 0, retry_delay * func.power(2, RewardOutbox.attempts))
+        await self.session.execute(
+            update(RewardOutbox)
+            .where(RewardOutbox.id.in_(ids))
+            .values(
+                attempts=attempts,
+                last_error=error,
+                available_at=func.now() + backoff,
+                status=case((attempts >= max_attempts, OUTBOX_FAILED), else_=OUTBOX_PENDING),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    async def count_pending_reward_outbox(self) -> int:
+        result = await self.session.execute(
+            select(func.count()).select_from(RewardOutbox).where(RewardOutbox.status == OUTBOX_PENDING)
+        )
+        return result.scalar_one()
 
-__all__ = ["StorageService"]
+__all__ = ["DAILY_COUNTER_COLUMNS", "StorageService"]
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import time
 from dataclasses import dataclass
 from decimal import Decimal
 from typing import Any
@@ -16,9 +17,15 @@ from telegram.constants import ParseMode
 from telegram.ext import Application, ApplicationBuilder
 
 from app.core.config import settings
+from app.core.metrics import REGISTRY
 from app.repositories.user import UserRepository
 
 
+TELEGRAM_UPDATE_LATENCY = REGISTRY.histogram(
+    "telegram_update_duration_seconds", "Time to handle a Telegram webhook update.", ("kind",)
+)
+
+
 class TelegramBotNotConfigured(RuntimeError):
     """Raised when bot operations are requested without a token."""
 
@@ -76,17 +83,26 @@ class TelegramBotManager:
         return {"ok": result}
 
     async def process_update(self, session: AsyncSession, payload: dict[str, Any]) -> None:
+        started = time.perf_counter()
+        kind = "error"
+        try:
+            kind = await self._dispatch_update(session, payload)
+        finally:
+            TELEGRAM_UPDATE_LATENCY.observe(time.perf_counter() - started, kind)
+
+    async def _dispatch_update(self, session: AsyncSession, payload: dict[str, Any]) -> str:
+        """Handle one update and return its kind for the latency metric."""
         app = await self.ensure_application()
         bot = app.bot
         update = Update.de_json(payload, bot)
 
         if update.message is None:
-            return
+            return "ignored"
 
         message = update.message
         from_user = message.from_user
         if from_user is None:
-            return
+            return "ignored"
 
         context = TelegramCommandContext(
             chat_id=message.chat_id,
@@ -99,18 +115,22 @@ class TelegramBotManager:
 
         if message.web_app_data:
             await self._handle_web_app_data(context, message.web_app_data.data, bot)
-            return
+            return "web_app_data"
 
         if message.text:
             text = message.text.strip()
             if text.startswith("/start"):
                 await self._handle_start(session, context, bot)
-            elif text.startswith("/profile"):
+                return "start"
+            if text.startswith("/profile"):
                 await self._handle_profile(session, context, bot)
-            elif text.startswith("/help"):
+                return "profile"
+            if text.startswith("/help"):
                 await self._handle_help(context, bot)
-            else:
-                await self._handle_unknown(context, bot)
+                return "help"
+            await self._handle_unknown(context, bot)
+            return "unknown"
+        return "ignored"
 
     async def _handle_start(self, session: AsyncSession, ctx: TelegramCommandContext, bot) -> None:
         user_repo = UserRepository(session)
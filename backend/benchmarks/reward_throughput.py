@@ -0,0 +1,259 @@
+"""Reward processing throughput benchmark.
+
+Drives ``RewardEngine.process_batch`` (bulk and per-event) and ``POST /api/rewards/batch``
+(through httpx's ASGI transport) with a synthetic event stream and reports events/sec,
+p50/p99 batch latency and SQL statements per event. Results are written as JSON under
+``benchmarks/results/`` so runs can be compared across commits.
+
+Run from ``backend/``::
+
+    python -m benchmarks.reward_throughput --events 20000 --users 2000 --batch-size 100
+    BENCH_DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.reward_throughput
+    python -m benchmarks.reward_throughput --storage memory   # no database at all
+
+Without ``BENCH_DATABASE_URL`` a Postgres container is started with Docker.
+
+``benchmarks/baseline_reward_throughput.json`` is a reference run of the default
+configuration (all three scenarios) against Postgres 16 on a local Unix socket,
+on a single-CPU host, written with ``--output``. Absolute numbers depend on the
+machine; compare against a baseline regenerated on the same host, and refresh
+the file when the write paths change.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from benchmarks.harness import RunResult, StatementCounter, local_postgres, write_results
+
+SCENARIOS = ("engine-bulk", "engine-event", "http-batch")
+HTTP_BATCH_LIMIT = 100
+
+
+@dataclass(slots=True)
+class BenchConfig:
+    events: int = 20_000
+    batch_size: int = 100
+    users: int = 2_000
+    duplicate_ratio: float = 0.1
+    mix: str = "steps=0.6,book_completion=0.3,referral_bonus=0.1"
+    concurrency: int = 4
+    seed: int = 42
+    storage: str = "postgres"
+    scenarios: tuple[str, ...] = SCENARIOS
+
+    def weights(self) -> tuple[list[str], list[float]]:
+        actions, weights = [], []
+        for part in self.mix.split(","):
+            action_id, _, weight = part.partition("=")
+            actions.append(action_id.strip())
+            weights.append(float(weight or 1))
+        return actions, weights
+
+
+def generate_batches(config: BenchConfig, prefix: str) -> list[list[dict[str, Any]]]:
+    """Deterministic event payloads; ``duplicate_ratio`` of events reuse an earlier key."""
+    rng = random.Random(config.seed)
+    actions, weights = config.weights()
+    issued: list[dict[str, Any]] = []
+    events: list[dict[str, Any]] = []
+    for index in range(config.events):
+        if issued and rng.random() < config.duplicate_ratio:
+            events.append(dict(rng.choice(issued)))
+            continue
+        action_id = rng.choices(actions, weights)[0]
+        value: float | None = None
+        if action_id == "steps":
+            value = rng.randrange(0, 15_000)
+        elif action_id == "book_completion":
+            value = round(rng.uniform(0.5, 1.0), 2)
+        event = {
+            "user_id": f"bench-user-{rng.randrange(config.users)}",
+            "action_id": action_id,
+            "value": value,
+            "idempotency_key": f"{prefix}-{index}",
+            "metadata": None,
+        }
+        issued.append(event)
+        events.append(event)
+    return [events[start : start + config.batch_size] for start in range(0, len(events), config.batch_size)]
+
+
+async def run_batches(name: str, batches: list[list[dict[str, Any]]], concurrency: int, handler) -> RunResult:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one(batch: list[dict[str, Any]]) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await handler(batch)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(batch) for batch in batches))
+    return RunResult(
+        scenario=name,
+        events=sum(len(batch) for batch in batches),
+        batches=len(batches),
+        seconds=time.perf_counter() - started,
+        statements=None,
+        latencies_ms=latencies,
+    )
+
+
+async def reset_database(config: BenchConfig) -> None:
+    from sqlalchemy import insert
+
+    from app.db.base import Base
+    from app.db.models import User
+    from app.db.session import engine
+
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(
+            insert(User), [{"id": f"bench-user-{index}"} for index in range(config.users)]
+        )
+
+
+async def reset_memory(config: BenchConfig) -> None:
+    import app.services.memory_storage as memory_storage
+
+    memory_storage._memory_store = memory_storage.MemoryStore()
+    storage = memory_storage.InMemoryStorageService(memory_storage.get_memory_store())
+    for index in range(config.users):
+        await storage.upsert_user({"id": f"bench-user-{index}"})
+
+
+async def run(config: BenchConfig) -> list[RunResult]:
+    import httpx
+
+    from app.core.config import settings
+    from app.db.session import SessionLocal, engine
+    from app.services.idempotency import IdempotencyFilter
+    from app.services.memory_storage import InMemoryStorageService, get_memory_store
+    from app.services.reward_engine import RewardEvent, get_reward_engine
+    from app.services.storage_service import StorageService
+
+    reward_engine = get_reward_engine()
+    counter = StatementCounter(engine) if config.storage == "postgres" else None
+    results = []
+
+    for scenario in config.scenarios:
+        if config.storage == "postgres":
+            await reset_database(config)
+        else:
+            await reset_memory(config)
+        reward_engine.idempotency_filter = IdempotencyFilter(settings.idempotency_cache_size)
+        batches = generate_batches(config, scenario)
+
+        if scenario.startswith("engine-"):
+            bulk = scenario == "engine-bulk"
+
+            async def handler(batch: list[dict[str, Any]], bulk: bool = bulk) -> None:
+                events = [RewardEvent(**payload) for payload in batch]
+                if config.storage == "memory":
+                    await reward_engine.process_batch(InMemoryStorageService(get_memory_store()), events, bulk=bulk)
+                    return
+                async with SessionLocal() as session:
+                    await reward_engine.process_batch(StorageService(session), events, bulk=bulk)
+                    await session.commit()
+
+            before = counter.count if counter else 0
+            result = await run_batches(scenario, batches, config.concurrency, handler)
+        elif scenario == "http-batch":
+            if config.batch_size > HTTP_BATCH_LIMIT:
+                raise SystemExit(f"http-batch needs --batch-size <= {HTTP_BATCH_LIMIT}")
+            from app.main import app
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+                async def handler(batch: list[dict[str, Any]]) -> None:
+                    response = await client.post("/api/rewards/batch", json={"events": batch})
+                    response.raise_for_status()
+
+                before = counter.count if counter else 0
+                result = await run_batches(scenario, batches, config.concurrency, handler)
+        else:
+            raise SystemExit(f"Unknown scenario {scenario!r}; choose from {', '.join(SCENARIOS)}")
+
+        if counter:
+            result.statements = counter.count - before
+        results.append(result)
+    return results
+
+
+def parse_args() -> tuple[BenchConfig, Path | None]:
+    defaults = BenchConfig()
+    parser = argparse.ArgumentParser(description="Reward processing throughput benchmark.")
+    parser.add_argument("--events", type=int, default=defaults.events)
+    parser.add_argument("--batch-size", type=int, default=defaults.batch_size)
+    parser.add_argument("--users", type=int, default=defaults.users, help="Distinct users events are spread over.")
+    parser.add_argument("--duplicate-ratio", type=float, default=defaults.duplicate_ratio)
+    parser.add_argument("--mix", default=defaults.mix, help="Comma-separated action_id=weight pairs.")
+    parser.add_argument("--concurrency", type=int, default=defaults.concurrency, help="Batches in flight at once.")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--storage", choices=("postgres", "memory"), default=defaults.storage)
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, dest="scenarios")
+    parser.add_argument("--output", type=Path, help="Result file (default: benchmarks/results/...).")
+    args = parser.parse_args()
+    config = BenchConfig(
+        events=args.events,
+        batch_size=args.batch_size,
+        users=args.users,
+        duplicate_ratio=args.duplicate_ratio,
+        mix=args.mix,
+        concurrency=args.concurrency,
+        seed=args.seed,
+        storage=args.storage,
+        scenarios=tuple(args.scenarios or SCENARIOS),
+    )
+    return config, args.output
+
+
+def print_table(results: list[RunResult]) -> None:
+    header = f"{'scenario':<14}{'events/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'stmts/event':>13}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        summary = result.summary()
+        statements = summary["statementsPerEvent"]
+        print(
+            f"{summary['scenario']:<14}{summary['eventsPerSecond']:>12,.0f}{summary['p50Ms']:>10.2f}"
+            f"{summary['p99Ms']:>10.2f}{statements if statements is not None else '-':>13}"
+        )
+
+
+async def main() -> None:
+    config, output = parse_args()
+    # Settings are read when app modules are first imported, so configure the
+    # environment before importing anything from ``app``.
+    os.environ.setdefault("REWARD_QUEUE_WORKERS", "0")
+    os.environ.setdefault("REWARDS_CONFIG_POLL_INTERVAL", "0")
+    if config.storage == "memory":
+        os.environ["STORAGE_BACKEND"] = "memory"
+        os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://bench@127.0.0.1/unused")
+        results = await run(config)
+    else:
+        async with local_postgres() as url:
+            os.environ["DATABASE_URL"] = url
+            results = await run(config)
+            from app.db.session import engine
+
+            await engine.dispose()
+
+    print_table(results)
+    path = write_results("reward_throughput", config, results, output)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
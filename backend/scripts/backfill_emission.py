@@ -0,0 +1,125 @@
+"""Reconcile the reward_emission_daily rollup with user_rewards.
+
+Both tables are read in one REPEATABLE READ snapshot, whose start is the cut-over.
+Every reward committed before it is in ``user_rewards``, and every increment from
+instances that maintain the rollup is committed together with its reward. The
+per-(day, action) difference is therefore exactly what the rollup is missing:
+history from before the rollup existed, plus rewards from instances that predate
+it. The differences are added to shard 0 in a second transaction. Nothing is
+locked, so rewards keep being recorded while this runs, and running it again adds
+nothing new.
+
+Run it after the rollout has replaced every instance that records rewards without
+updating the rollup (rerun it if some were still running). The first run marks the
+rollup as backfilled; until then emission is read from ``user_rewards``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import Date, cast, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.db.models import RewardEmissionBackfill, RewardEmissionDaily, UserReward
+from app.db.session import SessionLocal
+
+
+async def missing_totals(since: date | None, until: date | None) -> tuple[datetime, dict[tuple[date, str], list[int]]]:
+    """The snapshot's start and ``[mind, count]`` per (day, action) not yet in the rollup."""
+    day = cast(UserReward.timestamp, Date)
+    conditions = []
+    rollup_conditions = []
+    if since is not None:
+        conditions.append(day >= since)
+        rollup_conditions.append(RewardEmissionDaily.date >= since)
+    if until is not None:
+        conditions.append(day <= until)
+        rollup_conditions.append(RewardEmissionDaily.date <= until)
+
+    missing: dict[tuple[date, str], list[int]] = defaultdict(lambda: [0, 0])
+    async with SessionLocal() as session:
+        await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        # now() is the transaction start, which is when the snapshot is taken.
+        cutover = await session.scalar(select(func.timezone("UTC", func.now())))
+        rewards = await session.execute(
+            select(day, UserReward.action_id, func.sum(UserReward.mind_amount), func.count())
+            .where(*conditions)
+            .group_by(day, UserReward.action_id)
+        )
+        for reward_day, action_id, mind, count in rewards:
+            missing[(reward_day, action_id)] = [int(mind), int(count)]
+        rollup = await session.execute(
+            select(
+                RewardEmissionDaily.date,
+                RewardEmissionDaily.action_id,
+                func.sum(RewardEmissionDaily.total_mind),
+                func.sum(RewardEmissionDaily.reward_count),
+            )
+            .where(*rollup_conditions)
+            .group_by(RewardEmissionDaily.date, RewardEmissionDaily.action_id)
+        )
+        for rollup_day, action_id, mind, count in rollup:
+            total = missing[(rollup_day, action_id)]
+            total[0] -= int(mind)
+            total[1] -= int(count)
+        await session.rollback()
+    return cutover, {key: total for key, total in missing.items() if total != [0, 0]}
+
+
+async def backfill(since: date | None, until: date | None) -> int:
+    """Add what the rollup is missing in ``[since, until]``; the number of (day, action) pairs corrected."""
+    cutover, missing = await missing_totals(since, until)
+    async with SessionLocal() as session:
+        if missing:
+            # Backfilled totals all go to shard 0; shards only spread live write contention.
+            stmt = pg_insert(RewardEmissionDaily).values(
+                [
+                    {"date": day, "action_id": action_id, "shard": 0, "total_mind": mind, "reward_count": count}
+                    for (day, action_id), (mind, count) in sorted(missing.items())
+                ]
+            )
+            await session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[RewardEmissionDaily.date, RewardEmissionDaily.action_id, RewardEmissionDaily.shard],
+                    set_={
+                        "total_mind": RewardEmissionDaily.total_mind + stmt.excluded.total_mind,
+                        "reward_count": RewardEmissionDaily.reward_count + stmt.excluded.reward_count,
+                        "updated_at": func.now(),
+                    },
+                )
+            )
+        if since is None and until is None:
+            marker = pg_insert(RewardEmissionBackfill).values(id=1, cutover=cutover)
+            await session.execute(
+                marker.on_conflict_do_update(
+                    index_elements=[RewardEmissionBackfill.id],
+                    set_={"cutover": marker.excluded.cutover, "completed_at": func.now()},
+                )
+            )
+        await session.commit()
+    return len(missing)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--since",
+        type=date.fromisoformat,
+        help="First day to reconcile (YYYY-MM-DD). A partial range does not mark the rollup as backfilled.",
+    )
+    parser.add_argument("--until", type=date.fromisoformat, help="Last day to reconcile (YYYY-MM-DD).")
+    return parser.parse_args()
+
+
+async def main() -> None:
+    arguments = parse_args()
+    corrected = await backfill(arguments.since, arguments.until)
+    print(f"✅ Corrected {corrected} reward_emission_daily (day, action) totals")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,196 @@
+"""Flag StorageService queries that sequentially scan large tables.
+
+Runs the per-user and per-item StorageService calls against the configured
+(seeded) database, captures every statement they execute and EXPLAINs it with
+the same parameters. Sequential scans are disabled while explaining, so a Seq
+Scan left in a plan means no index can serve that query; it is reported when the
+table holds at least ``--min-rows`` rows. Everything runs in one transaction that
+is rolled back, so write paths are probed too. Whole-table admin listings and
+stats are left out: scanning is what they do.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import event, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Book, BookChapter, Course, CourseLesson, TextContent, User
+from app.db.session import SessionLocal
+from app.services.catalog_cache import CatalogCache
+from app.services.storage_service import StorageService
+
+EXPLAINED_PREFIXES = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+
+@dataclass(slots=True)
+class Sample:
+    """Existing ids to run the probes with (placeholders when a table is empty)."""
+
+    user_id: str = "explain-audit"
+    course_id: int = 0
+    book_id: int = 0
+    lesson_id: int = 0
+    chapter_id: int = 0
+    content_key: str = "explain-audit"
+    category: str = "general"
+
+
+Probe = Callable[[StorageService, Sample], Awaitable[Any]]
+
+PROBES: list[tuple[str, Probe]] = [
+    ("get_user", lambda storage, s: storage.get_user(s.user_id)),
+    ("get_users_page", lambda storage, s: storage.get_users_page(100)),
+    ("get_course", lambda storage, s: storage.get_course(s.course_id)),
+    ("get_course_lessons", lambda storage, s: storage.get_course_lessons(s.course_id)),
+    ("get_book", lambda storage, s: storage.get_book(s.book_id)),
+    ("get_book_chapters", lambda storage, s: storage.get_book_chapters(s.book_id)),
+    ("enroll_user", lambda storage, s: storage.enroll_user({"user_id": s.user_id, "course_id": s.course_id})),
+    ("get_user_enrollments", lambda storage, s: storage.get_user_enrollments(s.user_id)),
+    ("purchase_book", lambda storage, s: storage.purchase_book({"user_id": s.user_id, "book_id": s.book_id})),
+    ("get_user_books", lambda storage, s: storage.get_user_books(s.user_id)),
+    ("get_user_transactions", lambda storage, s: storage.get_user_transactions(s.user_id, 50)),
+    ("get_transaction_totals", lambda storage, s: storage.get_transaction_totals(s.user_id)),
+    ("get_user_subscriptions", lambda storage, s: storage.get_user_subscriptions(s.user_id)),
+    ("get_today_challenge", lambda storage, s: storage.get_today_challenge(s.user_id)),
+    ("get_book_reading_progress", lambda storage, s: storage.get_book_reading_progress(s.user_id, s.book_id)),
+    ("get_all_book_progress", lambda storage, s: storage.get_all_book_progress(s.user_id)),
+    ("get_course_reading_progress", lambda storage, s: storage.get_course_reading_progress(s.user_id, s.course_id)),
+    ("get_chapter_tests", lambda storage, s: storage.get_chapter_tests(s.chapter_id)),
+    ("get_lesson_tests", lambda storage, s: storage.get_lesson_tests(s.lesson_id)),
+    ("get_user_test_attempts", lambda storage, s: storage.get_user_test_attempts(s.user_id, "chapter", s.chapter_id)),
+    ("get_text_content_by_key", lambda storage, s: storage.get_text_content_by_key(s.content_key)),
+    ("get_text_content_by_category", lambda storage, s: storage.get_text_content_by_category(s.category)),
+    ("get_daily_counter", lambda storage, s: storage.get_daily_counter(s.user_id, datetime.utcnow().date().isoformat())),
+    ("reward_exists", lambda storage, s: storage.reward_exists("explain-audit")),
+    ("get_existing_reward_keys", lambda storage, s: storage.get_existing_reward_keys(["explain-audit"])),
+]
+
+
+@dataclass(slots=True)
+class Finding:
+    probe: str
+    table: str
+    table_rows: int
+    statement: str
+
+
+async def load_sample(session: AsyncSession) -> Sample:
+    sample = Sample()
+    for attr, column in (
+        ("user_id", User.id),
+        ("course_id", Course.id),
+        ("book_id", Book.id),
+        ("lesson_id", CourseLesson.id),
+        ("chapter_id", BookChapter.id),
+        ("content_key", TextContent.key),
+        ("category", TextContent.category),
+    ):
+        value = await session.scalar(select(column).limit(1))
+        if value is not None:
+            setattr(sample, attr, value)
+    return sample
+
+
+async def table_rows(session: AsyncSession) -> dict[str, int]:
+    """Row counts per table: planner estimates, or exact counts for never-analyzed tables."""
+    result = await session.execute(
+        text(
+            "SELECT relname, reltuples FROM pg_class "
+            "WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace"
+        )
+    )
+    rows: dict[str, int] = {}
+    for name, estimate in result:
+        if estimate < 0:
+            estimate = await session.scalar(text(f'SELECT count(*) FROM "{name}"'))
+        rows[name] = int(estimate)
+    return rows
+
+
+def seq_scans(plan: dict) -> list[str]:
+    tables = [plan["Relation Name"]] if plan.get("Node Type") == "Seq Scan" else []
+    for child in plan.get("Plans", ()):
+        tables.extend(seq_scans(child))
+    return tables
+
+
+async def run_probe(
+    session: AsyncSession, name: str, probe: Probe, sample: Sample, rows: dict[str, int], min_rows: int
+) -> list[Finding]:
+    captured: list[tuple[str, Any]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany) -> None:
+        if statement.lstrip().upper().startswith(EXPLAINED_PREFIXES):
+            captured.append((statement, parameters))
+
+    # A private cache so catalog reads reach the database on every run.
+    storage = StorageService(session, catalog_cache=CatalogCache(0, 0))
+    connection = await session.connection()
+    sync_engine = connection.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", capture)
+    try:
+        async with session.begin_nested():
+            await probe(storage, sample)
+    except Exception as exc:  # e.g. "already enrolled": the statements so far still count
+        print(f"  {name}: {type(exc).__name__}: {exc}", file=sys.stderr)
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", capture)
+
+    findings: list[Finding] = []
+    # One EXPLAIN per distinct statement; parameters may be lists, so key on the text.
+    for statement, parameters in {statement: parameters for statement, parameters in captured}.items():
+        explained = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        plan = explained.scalar_one()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        for table in seq_scans(plan[0]["Plan"]):
+            if rows.get(table, 0) >= min_rows:
+                findings.append(Finding(name, table, rows.get(table, 0), " ".join(statement.split())))
+    return findings
+
+
+async def audit(min_rows: int) -> list[Finding]:
+    async with SessionLocal() as session:
+        try:
+            sample = await load_sample(session)
+            rows = await table_rows(session)
+            await session.execute(text("SET LOCAL enable_seqscan = off"))
+            findings: list[Finding] = []
+            for name, probe in PROBES:
+                findings.extend(await run_probe(session, name, probe, sample, rows, min_rows))
+            return findings
+        finally:
+            await session.rollback()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--min-rows",
+        type=int,
+        default=1000,
+        help="Report sequential scans only on tables with at least this many rows (default 1000).",
+    )
+    return parser.parse_args()
+
+
+async def main() -> None:
+    arguments = parse_args()
+    findings = await audit(arguments.min_rows)
+    for finding in findings:
+        print(f"❌ {finding.probe}: Seq Scan on {finding.table} (~{finding.table_rows} rows)\n   {finding.statement[:300]}")
+    if findings:
+        sys.exit(1)
+    print(f"✅ {len(PROBES)} StorageService calls use indexes on every table with ≥{arguments.min_rows} rows")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
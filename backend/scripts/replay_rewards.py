@@ -0,0 +1,183 @@
+"""Project reward emission for a candidate rewards.yml without touching the live data.
+
+Replays either historical ``user_rewards`` rows (read-only) or a JSONL event file
+through the reward rules and prints emission per action and per day as JSON.
+
+``user_rewards`` only holds what was granted, after caps: events a cap blocked
+entirely are missing and capped ones are rebuilt at their capped value. A history
+replay therefore under-projects any candidate with looser caps or higher base
+rewards, and its report says so (``historicalReplayIsPostCap``). Replay the raw
+events from a JSONL file to evaluate such changes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator, Iterator
+
+import yaml
+from sqlalchemy import Date, cast, select
+
+from app.db.models import UserReward
+from app.db.session import SessionLocal
+from app.services.reward_engine import CONFIG_PATH, RuleTable, YamlLoader
+from app.services.reward_simulation import ReplayEvent, RewardSimulator, reconstruct_value
+
+# Epoch timestamps above this are milliseconds (1e11 seconds is the year 5138).
+_EPOCH_MS_THRESHOLD = 100_000_000_000
+
+POST_CAP_WARNING = (
+    "Replayed from user_rewards, which only holds granted, post-cap rewards: events a cap "
+    "blocked are missing and capped ones count at their capped value, so looser caps or "
+    "higher base rewards are under-projected. Replay a JSONL event file (--events) for those."
+)
+
+
+def load_rules(path: Path, coefficient: float | None = None) -> RuleTable:
+    with path.open("r", encoding="utf-8") as fh:
+        config = yaml.load(fh, Loader=YamlLoader) or {}
+    if coefficient is not None:
+        config["rebalance_coefficient"] = coefficient
+    return RuleTable.compile(config)
+
+
+def event_day(raw: dict) -> str:
+    """UTC day of an event line: its ``date``, else its ``timestamp``.
+
+    ``date`` is an ISO date; ``timestamp`` an ISO datetime (naive means UTC) or Unix
+    epoch seconds, with values past ``_EPOCH_MS_THRESHOLD`` read as milliseconds.
+    Raises ``ValueError`` when neither is usable.
+    """
+    if raw.get("date") is not None:
+        return date.fromisoformat(str(raw["date"])).isoformat()
+    timestamp = raw.get("timestamp")
+    if isinstance(timestamp, (int, float)) and not isinstance(timestamp, bool):
+        seconds = timestamp / 1000 if abs(timestamp) > _EPOCH_MS_THRESHOLD else timestamp
+        return datetime.fromtimestamp(seconds, tz=timezone.utc).date().isoformat()
+    if isinstance(timestamp, str):
+        parsed = datetime.fromisoformat(timestamp)
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc)
+        return parsed.date().isoformat()
+    raise ValueError(f"no usable date or timestamp: {timestamp!r}")
+
+
+def read_event_file(path: Path, rejected: list[int]) -> Iterator[ReplayEvent]:
+    """Yield events from JSONL lines with user_id, action_id, value, idempotency_key and date/timestamp.
+
+    Lines without a parseable day are reported on stderr and their line numbers
+    appended to ``rejected``.
+    """
+    with path.open("r", encoding="utf-8") as fh:
+        for number, line in enumerate(fh, 1):
+            if not line.strip():
+                continue
+            raw = json.loads(line)
+            try:
+                day = event_day(raw)
+            except (ValueError, OverflowError, OSError) as exc:
+                print(f"{path}:{number}: skipped: {exc}", file=sys.stderr)
+                rejected.append(number)
+                continue
+            yield ReplayEvent(day, raw["user_id"], raw["action_id"], raw.get("value"), raw.get("idempotency_key"))
+
+
+async def read_history(
+    baseline: RuleTable,
+    since: date | None,
+    until: date | None,
+    historical: dict[str, int],
+) -> AsyncIterator[ReplayEvent]:
+    """Stream ``user_rewards`` in time order, rebuilding each event under ``baseline`` rules."""
+    day = cast(UserReward.timestamp, Date)
+    stmt = select(
+        day, UserReward.user_id, UserReward.action_id, UserReward.mind_amount, UserReward.idempotency_key
+    ).order_by(UserReward.timestamp)
+    if since is not None:
+        stmt = stmt.where(day >= since)
+    if until is not None:
+        stmt = stmt.where(day <= until)
+
+    async with SessionLocal() as session:
+        result = await session.stream(stmt.execution_options(yield_per=20_000))
+        async for reward_day, user_id, action_id, mind_amount, key in result:
+            historical[action_id] = historical.get(action_id, 0) + mind_amount
+            value = reconstruct_value(
+                action_id, mind_amount, baseline.rules.get(action_id), baseline.rebalance_coefficient
+            )
+            yield ReplayEvent(reward_day.isoformat(), user_id, action_id, value, key)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", type=Path, default=CONFIG_PATH, help="Candidate rewards.yml to evaluate.")
+    parser.add_argument("--coefficient", type=float, help="Override the candidate rebalance_coefficient.")
+    parser.add_argument(
+        "--events",
+        type=Path,
+        help=(
+            "JSONL event file of raw (pre-cap) activity; the accurate mode for loosening caps or "
+            "raising base rewards. Replays the post-cap user_rewards history when omitted."
+        ),
+    )
+    parser.add_argument(
+        "--baseline-config",
+        type=Path,
+        default=CONFIG_PATH,
+        help="rewards.yml the historical rewards were granted under (used to rebuild step counts).",
+    )
+    parser.add_argument("--since", type=date.fromisoformat, help="First day of history to replay.")
+    parser.add_argument("--until", type=date.fromisoformat, help="Last day of history to replay.")
+    parser.add_argument("--output", type=Path, help="Write the JSON report here instead of stdout.")
+    return parser.parse_args()
+
+
+async def main() -> None:
+    arguments = parse_args()
+    simulator = RewardSimulator(load_rules(arguments.config, arguments.coefficient))
+    historical: dict[str, int] = {}
+    rejected: list[int] = []
+    started = time.perf_counter()
+
+    if arguments.events:
+        simulator.run(read_event_file(arguments.events, rejected))
+    else:
+        baseline = load_rules(arguments.baseline_config)
+        chunk: list[ReplayEvent] = []
+        async for event in read_history(baseline, arguments.since, arguments.until, historical):
+            chunk.append(event)
+            if len(chunk) >= 50_000:
+                simulator.run(chunk)
+                chunk = []
+        simulator.run(chunk)
+
+    elapsed = time.perf_counter() - started
+    report = simulator.result.to_dict()
+    report["generatedAt"] = datetime.utcnow().isoformat()
+    report["elapsedSeconds"] = round(elapsed, 3)
+    report["eventsPerSecond"] = round(simulator.result.events / elapsed) if elapsed else None
+    if rejected:
+        report["rejectedLines"] = len(rejected)
+    report["historicalReplayIsPostCap"] = not arguments.events
+    if not arguments.events:
+        report["warnings"] = [POST_CAP_WARNING]
+        print(f"warning: {POST_CAP_WARNING}", file=sys.stderr)
+    if historical:
+        report["historicalMindByAction"] = dict(sorted(historical.items()))
+        report["historicalTotalMind"] = sum(historical.values())
+
+    payload = json.dumps(report, indent=2, ensure_ascii=False)
+    if arguments.output:
+        arguments.output.write_text(payload + "\n", encoding="utf-8")
+    else:
+        sys.stdout.write(payload + "\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())